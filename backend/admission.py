@@ -0,0 +1,140 @@
+"""Admission control for expensive endpoints.
+
+Each ``AdmissionController`` lets ``limit`` requests run at once. Further
+requests wait in a short FIFO queue; a request is turned away with
+``Overloaded`` (a 503 with ``Retry-After``) instead of queueing when
+
+- the queue is full,
+- at the current service rate it could not start before its deadline
+  (``queue_timeout`` seconds after it arrived), or
+- it is still waiting when its deadline passes.
+
+Failing fast keeps the requests that are admitted quick, and because only
+the expensive routes pass through a controller, cheap ones such as
+``/api/items`` never queue behind them.
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+import asyncio
+import time
+
+from fastapi import Depends
+
+import config
+import metrics
+
+
+class Overloaded(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, name: str, limit: int, queue_size: int = config.admission_queue_size,
+                 queue_timeout: float = config.admission_queue_timeout):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        # (future, deadline) per waiting request, oldest first
+        self._waiters: deque[tuple[asyncio.Future, float]] = deque()
+        # Moving average of how long an admitted request holds its slot
+        self.service_time: float | None = None
+        self.admitted = 0
+        self.rejected = 0
+
+    def expected_wait(self, position: int) -> float:
+        """Seconds until the request at ``position`` in the queue would start"""
+        if self.service_time is None:
+            return 0.0
+        return (position + 1) * self.service_time / self.limit
+
+    def retry_after(self) -> float:
+        return max(1.0, self.expected_wait(len(self._waiters) + self.in_flight))
+
+    def _reject(self, reason: str) -> Overloaded:
+        self.rejected += 1
+        metrics.admission_rejected_total.inc(self.name, reason)
+        return Overloaded(f"Too many {self.name} requests ({reason}); try again later", self.retry_after())
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            metrics.admission_in_flight.set(self.in_flight, self.name)
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            raise self._reject("queue_full")
+        if self.expected_wait(len(self._waiters)) > self.queue_timeout:
+            raise self._reject("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, time.monotonic() + self.queue_timeout)
+        self._waiters.append(entry)
+        metrics.admission_queued.set(len(self._waiters), self.name)
+        started = time.monotonic()
+        try:
+            # release() hands its slot over by resolving the future, or fails it once the deadline has passed
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("deadline") from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just as the caller went away
+                self.release()
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            metrics.admission_queued.set(len(self._waiters), self.name)
+            metrics.admission_wait.observe(time.monotonic() - started, self.name)
+        self.admitted += 1
+
+    def release(self) -> None:
+        now = time.monotonic()
+        while self._waiters:
+            future, deadline = self._waiters.popleft()
+            if future.done():
+                continue
+            if deadline <= now:
+                future.set_exception(self._reject("deadline"))
+                continue
+            # The slot passes straight to the next waiter, so in_flight is unchanged
+            future.set_result(None)
+            return
+        self.in_flight -= 1
+        metrics.admission_in_flight.set(self.in_flight, self.name)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.service_time = elapsed if self.service_time is None else 0.8 * self.service_time + 0.2 * elapsed
+            self.release()
+
+    def dependency(self) -> Any:
+        """Route dependency holding a slot for the duration of the request: ``dependencies=[c.dependency()]``"""
+        async def admit() -> AsyncIterator[None]:
+            async with self.slot():
+                yield
+        return Depends(admit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "queue_size": self.queue_size,
+            "queue_timeout": self.queue_timeout,
+            "service_time": self.service_time,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
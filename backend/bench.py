@@ -0,0 +1,350 @@
+"""Load benchmarks for the backend endpoints.
+
+By default the app runs in-process against ``fake_data_api``, so no network
+or Learnosity account is needed and CPU per request can be measured::
+
+    python bench.py --concurrency 1,10,50 --requests 500 --latency 0.02
+    python bench.py --output after.json --compare before.json
+
+``--target http://localhost:8000`` benchmarks an already-running server
+instead (start it with ``LEARNOSITY_DATA_API_URL`` pointing at a standalone
+``fake_data_api.py``); CPU per request is then not reported. In-process
+runs keep the backend's SQLite stores in a fresh temporary directory.
+
+``--payloads N`` instead times only the CPU work of turning a body of N
+questions into signed Data API requests, via the ``Question`` models (as
+``/api/questions/add`` does) and via the ``/api/questions/add/bulk`` fast path.
+
+``--scoring N`` times scoring N response sets one response at a time in
+Python against scoring them together with ``scoring.ScoringTable``.
+"""
+from time import perf_counter, process_time
+from typing import Any, Awaitable, Callable, Dict, List
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+
+import httpx
+
+SCENARIOS = ["items", "tests_new", "items_add", "questions_add", "questions_add_bulk", "items_get", "items_get_multi"]
+
+SEEDED_ITEMS = 100
+# Warm pool size for in-process runs; provisioning into the fake item bank costs nothing
+BENCH_POOL_SIZE = 20
+
+
+def sample_question(reference: str) -> Dict[str, Any]:
+    return {
+        "reference": reference,
+        "type": "mcq",
+        "data": {
+            # Distinct per reference, so no two sample questions have the same content
+            "stimulus": f"What is the capital of Spain? ({reference})",
+            "type": "mcq",
+            "options": [
+                {"label": "Barcelona", "value": "A"},
+                {"label": "Madrid", "value": "B"},
+            ],
+            "validation": {"scoring_type": "exactMatch", "valid_response": {"score": 1, "value": ["B"]}},
+        },
+    }
+
+
+def sample_item(reference: str) -> Dict[str, Any]:
+    return {"name": f"Bench item {reference}", "reference": reference, "questions": [f"q_{reference}"]}
+
+
+def make_request(scenario: str, batch: int) -> Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]:
+    """Return a function that issues request number ``i`` of a scenario"""
+    if scenario == "items":
+        return lambda client, i: client.get("/api/items")
+    if scenario == "tests_new":
+        # Fresh tests, so the warm pool (or --no-pool provisioning) is what's measured
+        return lambda client, i: client.get("/api/tests/new", params={"dedupe": "false"})
+    if scenario == "items_add":
+        return lambda client, i: client.post("/api/items/add", json={
+            "items": [sample_item(f"bench_item_{i}_{n}") for n in range(batch)]
+        })
+    if scenario == "questions_add":
+        return lambda client, i: client.post("/api/questions/add", json={
+            "questions": [sample_question(f"bench_question_{i}_{n}") for n in range(batch)]
+        })
+    if scenario == "questions_add_bulk":
+        return lambda client, i: client.post("/api/questions/add/bulk", json={
+            "questions": [sample_question(f"bench_question_{i}_{n}") for n in range(batch)]
+        })
+    if scenario == "items_get":
+        return lambda client, i: client.get(f"/api/items/get/bench_seed_{i % SEEDED_ITEMS}")
+    if scenario == "items_get_multi":
+        return lambda client, i: client.get("/api/items/get", params={
+            "reference": [f"bench_seed_{(i * batch + n) % SEEDED_ITEMS}" for n in range(batch)]
+        })
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float | None:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, concurrency: int, total: int,
+                       batch: int, measure_cpu: bool) -> Dict[str, Any]:
+    send = make_request(scenario, batch)
+    latencies: List[float] = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < total:
+            i = issued
+            issued += 1
+            started = perf_counter()
+            try:
+                response = await send(client, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(perf_counter() - started)
+
+    cpu_started = process_time()
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - started
+    cpu = process_time() - cpu_started
+
+    latencies.sort()
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    records = batch if scenario.endswith("_add") or scenario.endswith("_add_bulk") else 1
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": to_ms(percentile(latencies, 0.50)),
+            "p95": to_ms(percentile(latencies, 0.95)),
+            "p99": to_ms(percentile(latencies, 0.99)),
+            "mean": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+            "max": to_ms(latencies[-1]) if latencies else None,
+        },
+        "cpu_ms_per_request": to_ms(cpu / total) if measure_cpu and total else None,
+        "cpu_ms_per_record": to_ms(cpu / (total * records)) if measure_cpu and total else None,
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+
+    async def run_all(client: httpx.AsyncClient, measure_cpu: bool):
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                result = await run_scenario(client, scenario, concurrency, args.requests, args.batch, measure_cpu)
+                results.append(result)
+                print(f"{scenario:>14} c={concurrency:<4} {result['throughput_rps']:>9} req/s  "
+                      f"p50={result['latency_ms']['p50']}ms p95={result['latency_ms']['p95']}ms "
+                      f"p99={result['latency_ms']['p99']}ms cpu={result['cpu_ms_per_request']}ms "
+                      f"cpu/record={result['cpu_ms_per_record']}ms "
+                      f"errors={result['errors']}", flush=True)
+
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    if args.target:
+        async with httpx.AsyncClient(base_url=args.target, limits=limits, timeout=60) as client:
+            if {"items_get", "items_get_multi"} & set(args.scenarios):
+                await client.post("/api/items/add", json={
+                    "items": [sample_item(f"bench_seed_{n}") for n in range(SEEDED_ITEMS)]
+                })
+            await run_all(client, measure_cpu=False)
+        return results
+
+    import fake_data_api
+    import main
+
+    # Local stores in a fresh directory per run, never the ones next to the code
+    state = tempfile.mkdtemp(prefix="bench-")
+    for store, name in ((main.content_index, "content"), (main.item_mirror, "mirror"),
+                        (main.idempotency_store, "idempotency"), (main.job_queue.store, "jobs")):
+        store.path = os.path.join(state, f"{name}.sqlite3")
+
+    fake = fake_data_api.FakeItemBank(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, rate_limit=args.rate_limit, seed=0
+    )
+    for n in range(SEEDED_ITEMS):
+        fake.records["items"][f"bench_seed_{n}"] = sample_item(f"bench_seed_{n}")
+    main.data_api.transport = httpx.ASGITransport(app=fake_data_api.create_app(fake))
+    main.test_pool.size = 0 if args.no_pool else BENCH_POOL_SIZE
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await run_all(client, measure_cpu=True)
+    return results
+
+
+def bench_payloads(count: int, repeat: int = 5) -> Dict[str, float]:
+    """Microseconds per question to validate, build, encode and sign a bulk body"""
+    from batch import chunked
+    from bulk_questions import parse_questions
+    from logs import Payload
+    import main
+
+    body = json.dumps({"questions": [sample_question(f"bench_question_{n}") for n in range(count)]}).encode()
+    data_api = main.data_api
+
+    def models():
+        # What /api/questions/add does: parse, validate into models, dump back to dicts, log, sign
+        request = main.AddQuestionRequest.model_validate(json.loads(body))
+        packet = {"questions": [main.build_question_payload(question) for question in request.questions]}
+        str(Payload(packet))
+        data_api.sign(packet, "set")
+
+    def bulk():
+        for chunk in chunked(parse_questions(body), main.question_writer.chunk_size):
+            data_api.sign_encoded(data_api.encode({"questions": chunk}), "set")
+
+    timings = {}
+    for name, run in (("models", models), ("bulk", bulk)):
+        run()
+        started = perf_counter()
+        for _ in range(repeat):
+            run()
+        timings[name] = round((perf_counter() - started) / (repeat * count) * 1e6, 2)
+    return timings
+
+
+def bench_scoring(count: int, questions: int = 20, repeat: int = 3) -> Dict[str, float]:
+    """Microseconds per response set to score ``count`` sets of ``questions`` MCQ responses"""
+    import random
+    from scoring import ScoringTable, score_response
+
+    rng = random.Random(0)
+    bank = [{
+        "reference": f"bench_question_{n}",
+        "data": {
+            "options": [{"label": value, "value": value} for value in "ABCD"],
+            "validation": {"scoring_type": "exactMatch", "valid_response": {"score": 1, "value": [rng.choice("ABCD")]},
+                           "alt_responses": [{"score": 0.5, "value": ["A", "B"]}]},
+        },
+    } for n in range(questions)]
+    choices = [["A"], ["B"], ["C"], ["D"], ["A", "B"], None]
+    response_sets = [{question["reference"]: rng.choice(choices) for question in bank} for _ in range(count)]
+
+    def python():
+        # One response at a time, as a per-session scorer would
+        return [[score_response(question["data"]["validation"], responses.get(question["reference"]))
+                 for question in bank] for responses in response_sets]
+
+    def vectorized():
+        return ScoringTable(bank).score(response_sets)
+
+    assert vectorized().tolist() == python()
+    table = ScoringTable(bank)
+    masks = table.encode(response_sets)
+    timings = {}
+    for name, run in (("python", python), ("numpy", vectorized), ("numpy_scoring_only", lambda: table.score_masks(masks))):
+        started = perf_counter()
+        for _ in range(repeat):
+            run()
+        timings[name] = round((perf_counter() - started) / (repeat * count) * 1e6, 2)
+    return timings
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        before = baseline.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+
+        def change(new, old):
+            if new is None or not old:
+                return "n/a"
+            return f"{(new - old) / old * 100:+.1f}%"
+
+        print(f"{result['scenario']:>14} c={result['concurrency']:<4} "
+              f"throughput {change(result['throughput_rps'], before['throughput_rps'])}  "
+              f"p95 {change(result['latency_ms']['p95'], before['latency_ms']['p95'])}  "
+              f"cpu/req {change(result['cpu_ms_per_request'], before['cpu_ms_per_request'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend endpoints")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: value.split(","), help=f"Comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,10,50",
+                        type=lambda value: [int(v) for v in value.split(",")], help="Comma-separated levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--batch", type=int, default=10, help="Questions/items per add request")
+    parser.add_argument("--target", help="Benchmark a running server at this URL instead of in-process")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake Data API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Fake Data API extra random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake Data API error rate")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Fake Data API requests per second")
+    parser.add_argument("--no-pool", action="store_true", help="Disable the /api/tests/new warm pool")
+    parser.add_argument("--output", default="bench-results.json", help="Where to save results as JSON")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--payloads", type=int, metavar="N",
+                        help="Only time building signed question payloads for a body of N questions")
+    parser.add_argument("--scoring", type=int, metavar="N",
+                        help="Only time scoring N response sets in Python and with the NumPy scoring tables")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    if args.payloads:
+        timings = bench_payloads(args.payloads)
+        print(f"{args.payloads} questions: models {timings['models']}us/question, "
+              f"bulk {timings['bulk']}us/question ({timings['models'] / timings['bulk']:.1f}x)")
+        return
+    if args.scoring:
+        timings = bench_scoring(args.scoring)
+        print(f"{args.scoring} response sets: python {timings['python']}us/set, numpy {timings['numpy']}us/set "
+              f"({timings['python'] / timings['numpy']:.1f}x; {timings['numpy_scoring_only']}us/set "
+              f"excluding compiling and encoding)")
+        return
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=args.log_level)
+    logging.getLogger().setLevel(args.log_level)
+
+    results = asyncio.run(run(args))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "meta": {
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "target": args.target or "in-process",
+                "fake_data_api": None if args.target else {
+                    "latency": args.latency, "jitter": args.jitter,
+                    "error_rate": args.error_rate, "rate_limit": args.rate_limit,
+                },
+                "pool": not args.no_pool,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
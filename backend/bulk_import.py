@@ -0,0 +1,148 @@
+"""Streaming NDJSON import into the item bank.
+
+Records are parsed and validated one line at a time as the request body
+arrives, written to the Data API in chunks as soon as a chunk fills, and
+each record's outcome is streamed back as an NDJSON line. At most
+``concurrency`` chunks are in flight and the result queue is bounded, so
+memory stays flat no matter how large the upload is.
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+import asyncio
+import json
+import logging
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Turns one decoded line into (kind, Data API payload); raises ValueError if invalid
+Parser = Callable[[Any], Tuple[str, Dict[str, Any]]]
+# Writes a chunk of payloads of one kind; returns one result per payload
+Writer = Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+
+_DONE = object()
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """Streams NDJSON without listening for disconnects on ``receive``
+
+    ``StreamingResponse`` normally consumes ``receive`` to watch for the
+    client going away, which would steal the request body chunks an import
+    is still reading. A disconnect instead surfaces as a failed ``send``.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes],
+                       max_line_bytes: int = config.import_max_line_bytes) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines without buffering more than one line"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"Line longer than {max_line_bytes} bytes")
+    if buffer:
+        yield buffer
+
+
+def _encode(result: Dict[str, Any]) -> bytes:
+    return json.dumps(result, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+async def stream_import(chunks: AsyncIterator[bytes], parse: Parser, writers: Dict[str, Writer],
+                        order: Tuple[str, ...] = (),
+                        chunk_size: int = config.data_api_set_chunk_size,
+                        concurrency: int = config.data_api_write_concurrency) -> AsyncIterator[bytes]:
+    """Import NDJSON records, yielding one NDJSON result line per record and a final summary
+
+    ``order`` lists kinds that must be written before later kinds, e.g.
+    ``("question", "item")`` makes each item chunk wait for the question
+    chunks sent before it, so items never reference questions not yet written.
+    """
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency * chunk_size * 2)
+    slots = asyncio.Semaphore(concurrency)
+    summary = {"records": 0, "written": 0, "failed": 0, "invalid": 0}
+    tasks: Dict[str, List[asyncio.Task]] = {kind: [] for kind in writers}
+
+    async def write_chunk(kind: str, chunk: List[Tuple[int, Dict[str, Any]]], after: List[asyncio.Task]):
+        try:
+            if after:
+                await asyncio.gather(*after, return_exceptions=True)
+            try:
+                written = await writers[kind]([payload for _, payload in chunk])
+            except Exception as e:
+                logger.error(f"Failed to import {len(chunk)} {kind}(s): {str(e)}")
+                written = [{"error": str(e)} for _ in chunk]
+            for (line, payload), result in zip(chunk, written):
+                ok = "error" not in result and result.get("status_code") == 200
+                summary["written" if ok else "failed"] += 1
+                outcome = {"line": line, "kind": kind, "reference": payload.get("reference")}
+                if "error" in result:
+                    outcome["error"] = result["error"]
+                else:
+                    outcome["status_code"] = result.get("status_code")
+                await results.put(_encode(outcome))
+        finally:
+            slots.release()
+
+    async def dispatch(kind: str, chunk: List[Tuple[int, Dict[str, Any]]]):
+        # Waiting for a free slot here is what applies backpressure to the upload
+        await slots.acquire()
+        after = []
+        if kind in order:
+            for earlier in order[:order.index(kind)]:
+                after.extend(task for task in tasks[earlier] if not task.done())
+        tasks[kind] = [task for task in tasks[kind] if not task.done()]
+        tasks[kind].append(asyncio.create_task(write_chunk(kind, chunk, after)))
+
+    async def read():
+        pending: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {kind: [] for kind in writers}
+        line_number = 0
+        try:
+            async for line in ndjson_lines(chunks):
+                line_number += 1
+                if not line.strip():
+                    continue
+                summary["records"] += 1
+                try:
+                    kind, payload = parse(json.loads(line))
+                except ValueError as e:
+                    summary["invalid"] += 1
+                    await results.put(_encode({"line": line_number, "error": str(e)}))
+                    continue
+                pending[kind].append((line_number, payload))
+                if len(pending[kind]) >= chunk_size:
+                    await dispatch(kind, pending[kind])
+                    pending[kind] = []
+            for kind in (*order, *writers):
+                if pending.get(kind):
+                    await dispatch(kind, pending.pop(kind))
+        except Exception as e:
+            logger.error(f"Import stopped at line {line_number}: {str(e)}")
+            await results.put(_encode({"line": line_number, "error": f"Import stopped: {str(e)}"}))
+        finally:
+            await asyncio.gather(*(task for kind_tasks in tasks.values() for task in kind_tasks))
+            await results.put(_encode({"summary": summary}))
+            await results.put(_DONE)
+
+    reader = asyncio.create_task(read())
+    try:
+        while (result := await results.get()) is not _DONE:
+            yield result
+    finally:
+        if not reader.done():
+            reader.cancel()
+            for kind_tasks in tasks.values():
+                for task in kind_tasks:
+                    task.cancel()
@@ -0,0 +1,65 @@
+"""Fast path for writing large batches of questions.
+
+``/api/questions/add`` validates every question into nested Pydantic models
+and then dumps them back into dicts. Here the raw request bytes are
+validated once, in Rust, against ``TypedDict`` schemas mirroring
+``Question``/``QuestionData``; the validated dicts already have the Data
+API's question shape, so they are sent as-is (each chunk is encoded once by
+``AsyncDataApi.encode``) with no intermediate model objects.
+"""
+from typing import Any, Dict, List
+
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+
+class QuestionDataPayload(TypedDict):
+    stimulus: str
+    type: str
+    options: List[Dict[str, str]]
+    validation: Dict[str, Any]
+
+
+class QuestionPayload(TypedDict):
+    reference: str
+    type: str
+    data: QuestionDataPayload
+
+
+class BulkQuestionsRequest(TypedDict):
+    questions: List[QuestionPayload]
+
+
+bulk_questions_request = TypeAdapter(BulkQuestionsRequest)
+
+
+def parse_questions(body: bytes) -> List[QuestionPayload]:
+    """Validate a ``{"questions": [...]}`` body; raises ``pydantic.ValidationError``"""
+    return bulk_questions_request.validate_json(body)["questions"]
+
+
+def item_payloads(questions: List[QuestionPayload],
+                  duplicates: Dict[str, str] | None = None) -> List[Dict[str, Any]]:
+    """One published item per question, as ``/api/questions/add`` creates them
+
+    The item of a question skipped as a duplicate (``duplicates`` maps its
+    reference to the existing one) wraps, and is named after, the existing
+    question, so it has the same content as that question's item.
+    """
+    duplicates = duplicates or {}
+    items = []
+    for question in questions:
+        source = duplicates.get(question["reference"], question["reference"])
+        items.append({
+            "reference": f"item_{question['reference']}",
+            "name": f"Item for {source}",
+            "description": f"Auto-generated item for question {source}",
+            "status": "published",
+            "questions": [source],
+            "definition": {
+                "template": "dynamic",
+                "instant_feedback": True,
+                "widgets": [{"reference": source, "widget_type": "response"}],
+            },
+        })
+    return items
@@ -0,0 +1,93 @@
+"""DataLoader-style coalescing of single-key lookups into batched loads.
+
+``BatchLoader.load(key)`` doesn't call upstream itself: it queues the key
+and waits. Keys queued within ``window`` seconds of the first one (or until
+``max_batch`` keys are waiting) go to ``load_many`` in one call, and each
+caller gets its own value back. Concurrent loads of the same key share one
+slot in the batch.
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+import asyncio
+
+import config
+import metrics
+
+# Loads every key in one upstream call; returns a value for each of them
+LoadMany = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class BatchLoader:
+    def __init__(self, load_many: LoadMany, window: float = config.item_batch_window,
+                 max_batch: int = config.item_batch_size, name: str = "items"):
+        self.load_many = load_many
+        self.window = window
+        self.max_batch = max_batch
+        self.name = name
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.loads = 0
+        self.batches = 0
+        self.keys = 0
+        self.largest_batch = 0
+
+    async def load(self, key: Hashable) -> Any:
+        """Return ``key``'s value from the next batch to be sent"""
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._dispatch)
+        # A cancelled caller must not cancel the result other callers are waiting on
+        return await asyncio.shield(future)
+
+    async def load_all(self, keys: List[Hashable]) -> List[Any]:
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        self.batches += 1
+        self.keys += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        metrics.batch_size.observe(len(batch), self.name)
+        try:
+            values = await self.load_many(list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+                # Mark the exception retrieved; waiters still receive it
+                future.exception()
+            return
+        for key, future in batch.items():
+            if key in values:
+                future.set_result(values[key])
+            else:
+                future.set_exception(KeyError(key))
+                future.exception()
+
+    def stats(self) -> Dict[str, float | int | None]:
+        return {
+            "window": self.window,
+            "max_batch": self.max_batch,
+            "loads": self.loads,
+            "batches": self.batches,
+            "mean_batch": (self.keys / self.batches) if self.batches else None,
+            "largest_batch": self.largest_batch,
+        }
@@ -1,3 +1,5 @@
+import os
+
 # The consumerKey and consumerSecret are the public & private
 # security keys required to access Learnosity APIs and
 # data. Learnosity will provide keys for your own private account.
@@ -6,4 +8,184 @@
 # The keys listed here grant access to Learnosity's public demos account.
 
 consumer_key = 'yis0TYCu7U9V4o7M'
-consumer_secret = '74c5fd430cf1242a527f6223aebd42d30464be22'
\ No newline at end of file
+consumer_secret = '74c5fd430cf1242a527f6223aebd42d30464be22'
+
+# Data API connection settings. One pooled keep-alive client is shared by
+# every request handler, so these bound how many item-bank calls a single
+# worker can have in flight at once. LEARNOSITY_DATA_API_URL can point the
+# backend at a local stand-in such as fake_data_api.py.
+data_api_url = os.environ.get('LEARNOSITY_DATA_API_URL', 'https://data.learnosity.com/latest')
+data_api_timeout = 30.0
+data_api_max_connections = 200
+data_api_max_keepalive_connections = 50
+
+# Tenants: institutions with their own Learnosity consumer, chosen per
+# request by the tenant_header header (see tenants.py for the file format).
+# Requests without the header use default_tenant_id, whose credentials are
+# the consumer_key/consumer_secret above. All tenants together make at most
+# tenant_total_concurrency concurrent Data API calls, shared by weighted
+# fair queuing.
+tenants_path = os.environ.get('LEARNOSITY_TENANTS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tenants.json'))
+tenant_header = 'X-Tenant-ID'
+default_tenant_id = 'default'
+tenant_total_concurrency = 200
+
+# Label bundles are loaded from the bundled <locale>/<api>.json files at
+# startup. Set label_bundle_refresh_interval (seconds) to also refresh them in
+# the background from the learnosity-i18n repository.
+default_label_locale = 'es'
+label_bundle_url = 'https://raw.githubusercontent.com/Learnosity/learnosity-i18n/master/languages/{language}/label_bundles/{api}.json'
+label_bundle_languages = {
+    'es': 'es-ES',
+}
+label_bundle_refresh_interval = None
+
+# Bulk item-bank writes are packed into chunks of this many records per Data
+# API "set" request, with up to data_api_write_concurrency chunks in flight.
+data_api_set_chunk_size = 50
+data_api_write_concurrency = 4
+
+# Warm pool of pre-created question/item pairs for /api/tests/new. The pool
+# is refilled in the background when it drops to the low watermark. It
+# writes test_pool_size questions and items to the item bank at startup, so
+# it is off (0) unless LEARNOSITY_TEST_POOL_SIZE opts in. With
+# deduplication every test reuses one question/item, so the pool only
+# serves ?dedupe=false requests (or every request if dedup_enabled is off).
+test_pool_size = int(os.environ.get('LEARNOSITY_TEST_POOL_SIZE', '0'))
+test_pool_low_watermark = 5
+test_pool_retry_delay = 5.0
+
+# Most questions in a test assembled by POST /api/tests/new
+test_spec_max_questions = 100
+
+# Responses smaller than this many bytes are sent uncompressed
+gzip_minimum_size = 1000
+
+# Read-through cache for /api/items/get/{item_reference}: at most
+# item_cache_size items, each kept for item_cache_ttl seconds
+item_cache_size = 1024
+item_cache_ttl = 60.0
+
+# Item reads that miss the cache within item_batch_window seconds of each
+# other are fetched with one Data API get of up to item_batch_size references
+item_batch_window = 0.002
+item_batch_size = 50
+
+# Most references accepted by one /api/items/get?reference=... call
+item_multi_get_max = 200
+
+# Largest single NDJSON record accepted by the streaming /api/import endpoint
+import_max_line_bytes = 1_000_000
+
+# Admission control for the expensive endpoints: at most *_max_in_flight
+# requests of each class run at once and up to admission_queue_size more
+# wait, each for at most admission_queue_timeout seconds. Anything beyond
+# that gets a 503 with Retry-After straight away.
+tests_new_max_in_flight = 64
+writes_max_in_flight = 16
+admission_queue_size = 128
+admission_queue_timeout = 2.0
+
+# Idempotency-Key support for /api/tests/new and the item/question writes.
+# Responses are kept in this SQLite file, shared by all worker processes,
+# for idempotency_ttl seconds (at most idempotency_max_entries of them). A
+# retry of a request still running waits up to idempotency_wait_timeout
+# seconds for it; a key left running idempotency_lock_timeout seconds (its
+# process died) can be claimed again.
+idempotency_db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'idempotency.sqlite3')
+idempotency_ttl = 24 * 60 * 60
+idempotency_max_entries = 100_000
+idempotency_wait_timeout = 30.0
+idempotency_lock_timeout = 120.0
+
+# Item bank export (/api/export and export.py): items per Data API page,
+# and how many pages are fetched ahead of the one being written
+export_page_size = 50
+export_prefetch = 2
+
+# How long a write to one of the local SQLite files (jobs, dedup index,
+# mirror, idempotency keys) waits for another process holding its lock
+sqlite_busy_timeout = 5.0
+
+# Background job mode for /api/items/add and /api/questions/add
+# (?background=true). Jobs persist in this SQLite file so queued work
+# survives a restart; finished jobs are kept for job_retention_seconds.
+# A running job's progress is written to the file at most once every
+# job_progress_interval seconds (this process serves it live). Workers
+# sharing the file lease the jobs they run for job_lease_seconds and renew
+# the lease while alive; a job whose lease runs out is resumed by another.
+job_db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.sqlite3')
+job_workers = 4
+job_retention_seconds = 7 * 24 * 3600
+job_progress_interval = 1.0
+job_lease_seconds = 30.0
+
+# Upstream control for all Data API traffic. The concurrency limit starts at
+# data_api_concurrency_initial and adapts (AIMD) between the min and max:
+# it grows while calls come back under data_api_latency_target seconds and
+# halves on a 429, a 5xx, a transport error or a slow call. Gets (and any
+# call answered with 429) are retried up to data_api_retry_attempts times
+# with jittered exponential backoff, honouring Retry-After up to
+# data_api_retry_max_delay. After data_api_breaker_threshold consecutive
+# failures the circuit opens and calls fail fast for data_api_breaker_reset
+# seconds before one probe call is let through.
+data_api_concurrency_initial = 20
+data_api_concurrency_min = 2
+data_api_concurrency_max = 200
+data_api_latency_target = 2.0
+data_api_retry_attempts = 3
+data_api_retry_base_delay = 0.1
+data_api_retry_max_delay = 5.0
+data_api_breaker_threshold = 5
+data_api_breaker_reset = 10.0
+
+# Content-addressed deduplication: with dedup_enabled, a question or item
+# whose content was already written through this backend reuses that
+# reference instead of creating a copy (pass ?dedupe=false to always
+# create). The index lives in this SQLite file.
+dedup_enabled = True
+dedup_db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content.sqlite3')
+
+# Local SQLite mirror of the item bank behind the /api/mirror endpoints.
+# Every mirror_sync_interval seconds a background task fetches the items
+# and questions updated since the last sync, mirror_page_size per Data API
+# request. Leave the interval as None to sync only on POST /api/mirror/sync.
+mirror_db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mirror.sqlite3')
+mirror_sync_interval = None
+mirror_page_size = 100
+
+# Local exactMatch scoring behind POST /api/scoring/score: at most
+# scoring_max_response_sets response sets per request, compared against the
+# compiled answers in chunks of at most scoring_chunk_cells array cells.
+scoring_max_response_sets = 10000
+scoring_chunk_cells = 4_000_000
+
+# On-demand profiling: a request is profiled when it sends profile_header
+# with profile_token (LEARNOSITY_PROFILE_TOKEN; unset disables the header),
+# or at random at profile_sample_rate. Its stacks are sampled every
+# profile_interval seconds for at most profile_max_seconds and saved in
+# profile_dir, which keeps the newest profile_max_files profiles within
+# profile_max_bytes.
+profile_token = os.environ.get('LEARNOSITY_PROFILE_TOKEN')
+profile_header = 'X-Profile-Token'
+profile_sample_rate = 0.0
+profile_interval = 0.005
+profile_max_seconds = 30.0
+profile_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+profile_max_files = 200
+profile_max_bytes = 50 * 1024 * 1024
+
+# Logging goes through a queue of log_queue_size records to a writer thread
+# (records are dropped when it is full), as text or, with log_format 'json',
+# one JSON object per line. Logged request and response bodies are cut to
+# log_payload_max_chars. INFO records are kept for log_sample_rates[route]
+# of each route's requests (log_sample_default for other routes); warnings
+# and errors always.
+log_format = os.environ.get('LEARNOSITY_LOG_FORMAT', 'text')
+log_queue_size = 10000
+log_payload_max_chars = 2048
+log_sample_default = 1.0
+log_sample_rates = {
+    "/api/questions/add/bulk": 0.05,
+    "/api/import": 0.05,
+}
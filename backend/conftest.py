@@ -0,0 +1,70 @@
+import httpx
+import pytest
+
+import config
+import main
+from fake_data_api import FakeItemBank, create_app
+
+
+@pytest.fixture(autouse=True)
+def upstream(monkeypatch):
+    """No warm pool writes at startup, and any Data API transport a test installs is removed afterwards
+
+    Every test also gets fresh Data API clients, so a circuit breaker opened
+    or a concurrency limit cut by one test's failures doesn't carry over.
+    """
+    monkeypatch.setattr(main.test_pool, "size", 0)
+    monkeypatch.setattr(main.data_api, "_clients", {})
+    yield
+    main.data_api.transport = None
+
+
+@pytest.fixture
+def fake_item_bank():
+    """An empty FakeItemBank answering the app's Data API calls"""
+    item_bank = FakeItemBank()
+    main.data_api.transport = httpx.ASGITransport(app=create_app(item_bank))
+    return item_bank
+
+
+@pytest.fixture(autouse=True)
+def content_index(monkeypatch, tmp_path):
+    """Write through as before unless a test asks for deduplication, into an empty index"""
+    monkeypatch.setattr(config, "dedup_enabled", False)
+    main.content_index.close()
+    monkeypatch.setattr(main.content_index, "path", tmp_path / "content.sqlite3")
+    yield main.content_index
+    main.content_index.close()
+
+
+@pytest.fixture
+def dedup(monkeypatch, content_index):
+    monkeypatch.setattr(config, "dedup_enabled", True)
+    return content_index
+
+
+@pytest.fixture(autouse=True)
+def item_mirror(monkeypatch, tmp_path):
+    """An empty mirror database per test"""
+    main.item_mirror.close()
+    monkeypatch.setattr(main.item_mirror, "path", tmp_path / "mirror.sqlite3")
+    yield main.item_mirror
+    main.item_mirror.close()
+
+
+@pytest.fixture(autouse=True)
+def idempotency_store(monkeypatch, tmp_path):
+    """No idempotency keys carried over between tests"""
+    main.idempotency_store.close()
+    monkeypatch.setattr(main.idempotency_store, "path", tmp_path / "idempotency.sqlite3")
+    yield main.idempotency_store
+    main.idempotency_store.close()
+
+
+@pytest.fixture(autouse=True)
+def job_store(monkeypatch, tmp_path):
+    """Background jobs recorded in a fresh database, never the one next to the code"""
+    main.job_queue.store.close()
+    monkeypatch.setattr(main.job_queue.store, "path", tmp_path / "jobs.sqlite3")
+    yield main.job_queue.store
+    main.job_queue.store.close()
@@ -0,0 +1,130 @@
+"""Async Learnosity Data API client.
+
+Requests are signed exactly the way ``learnosity_sdk.request.DataApi`` signs
+them, but are sent over a shared, pooled ``httpx.AsyncClient`` so a Data API
+round trip never blocks the event loop. Every call goes through an
+``upstream.UpstreamControl`` for concurrency limiting, retries and circuit
+breaking.
+
+Bulk writers can encode a request once with ``encode`` (orjson when it is
+installed) and pass the resulting string to ``request``, which then signs
+that exact string instead of serializing the packet again.
+"""
+from learnosity_sdk.request import Init, DataApi
+from learnosity_sdk.request.init import format_utc_time
+from learnosity_sdk._version import __version__
+from time import perf_counter
+from typing import Dict, Any
+import config
+import httpx
+import json
+import metrics
+from upstream import UpstreamControl
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder gives the same JSON, just slower
+    orjson = None
+
+
+def parse_response(response: httpx.Response) -> Any:
+    """Return the JSON body of a Data API response, or its text if it isn't JSON"""
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+class AsyncDataApi:
+    """Signed Data API requests over one keep-alive connection pool.
+
+    Call ``open()`` at application startup and ``await close()`` at shutdown.
+    A request made before ``open()`` opens the pool lazily.
+    """
+
+    def __init__(self, security: Dict[str, str], secret: str,
+                 base_url: str = config.data_api_url,
+                 transport: httpx.AsyncBaseTransport | None = None,
+                 upstream: UpstreamControl | None = None):
+        self.security = security
+        self.secret = secret
+        self.base_url = base_url.rstrip("/")
+        self.transport = transport
+        self.upstream = upstream or UpstreamControl()
+        self._client: httpx.AsyncClient | None = None
+        # Only used for its endpoint -> action header derivation
+        self._sdk = DataApi()
+        self._sdk_header = f"Python:{__version__.lstrip('v')}"
+        # Signs pre-encoded requests; also the source of the SDK's telemetry metadata
+        self._signer = Init("data", security, secret)
+        self._sdk_meta = self._signer.get_sdk_meta()
+
+    def open(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self.transport,
+                timeout=config.data_api_timeout,
+                limits=httpx.Limits(
+                    max_connections=config.data_api_max_connections,
+                    max_keepalive_connections=config.data_api_max_keepalive_connections,
+                ),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def sign(self, request_packet: Dict[str, Any], action: str) -> Dict[str, str]:
+        """Build the signed form fields for a Data API request"""
+        return Init("data", self.security, self.secret, request_packet, action).generate()
+
+    def encode(self, request_packet: Dict[str, Any]) -> str:
+        """Serialize a request packet, with the SDK's telemetry metadata, for ``request``"""
+        packet = {**request_packet, "meta": {**request_packet.get("meta", {}), "sdk": self._sdk_meta}}
+        if orjson is not None:
+            return orjson.dumps(packet).decode("utf-8")
+        return json.dumps(packet, separators=(",", ":"), ensure_ascii=False)
+
+    def sign_encoded(self, request_string: str, action: str) -> Dict[str, str]:
+        """Build the signed form fields for an already-serialized request, as ``sign`` would"""
+        security = {**self.security, "timestamp": format_utc_time()}
+        signed = [security[key] for key in Init.security_keys if key in security]
+        security["signature"] = self._signer.hash_list([*signed, request_string, action])
+        return {"security": json.dumps(security), "request": request_string, "action": action}
+
+    async def request(self, endpoint: str, request_packet: Dict[str, Any] | str,
+                      action: str = "get") -> httpx.Response:
+        """Make a signed request to a Data API endpoint such as ``itembank/items``
+
+        ``request_packet`` may be a string from ``encode``, which is signed
+        and sent as-is. Raises ``upstream.UpstreamUnavailable`` without calling the Data API
+        while its circuit breaker is open.
+        """
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        headers = {
+            "X-Learnosity-Consumer": self.security.get("consumer_key", ""),
+            "X-Learnosity-Action": self._sdk._derive_action(url, action),
+            "X-Learnosity-SDK": self._sdk_header,
+        }
+        with metrics.span("data_api_signing"):
+            if isinstance(request_packet, str):
+                data = self.sign_encoded(request_packet, action)
+            else:
+                data = self.sign(request_packet, action)
+
+        client = self._client or self.open()
+
+        async def send() -> httpx.Response:
+            started = perf_counter()
+            status = "error"
+            try:
+                response = await client.post(url, data=data, headers=headers)
+                status = str(response.status_code)
+                return response
+            finally:
+                metrics.upstream_duration.observe(perf_counter() - started, endpoint, action)
+                metrics.upstream_responses_total.inc(endpoint, action, status)
+
+        return await self.upstream.call(send, endpoint, action)
@@ -0,0 +1,214 @@
+"""Content-addressed deduplication of item-bank writes.
+
+Questions and items are hashed on everything but their reference (for
+items that includes the name, status and description as well as the question
+list and definition). ``ContentIndex`` keeps the hash of what each reference
+currently holds, so writing the same content under a new reference reuses
+the reference it was first written under instead of creating a copy in the
+item bank. Writes to a reference the index already knows are updates: they
+always go through and replace its hash. The reference that was skipped is
+recorded as an alias of the existing one: items that list an aliased
+question are rewritten to point at the existing question, and reads of an
+aliased item can be redirected.
+
+The index is a local SQLite file; it only knows about content written
+through this backend. ``namespace`` keeps the content of separate item banks
+(one per tenant) apart in the one file.
+"""
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+
+import config
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS written (
+    kind TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (kind, reference)
+);
+CREATE INDEX IF NOT EXISTS written_digest ON written (kind, digest, created_at);
+CREATE TABLE IF NOT EXISTS aliases (
+    kind TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    canonical TEXT NOT NULL,
+    PRIMARY KEY (kind, reference)
+);
+"""
+
+# Indexes created before ``written`` kept one reference per digest, never updated on rewrites
+MIGRATE_CONTENT = """
+INSERT OR IGNORE INTO written (kind, reference, digest, created_at)
+    SELECT kind, reference, digest, created_at FROM content;
+DROP TABLE content;
+"""
+
+# SQLite's default limit on host parameters is 999
+_LOOKUP_BATCH = 500
+
+
+def content_digest(kind: str, record: Dict[str, Any]) -> str:
+    """Hash of a Data API question or item payload, ignoring only its reference"""
+    content = {key: value for key, value in record.items() if key != "reference"}
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ContentIndex(SQLiteStore):
+    """SQLite map of reference -> content hash; every method is blocking and thread-safe"""
+
+    schema = SCHEMA
+
+    def __init__(self, path: Path | str = config.dedup_db_path, namespace: Callable[[], str] = lambda: ""):
+        super().__init__(path)
+        # Prefix for the kind of every row, called on each lookup and write
+        self.namespace = namespace
+
+    def migrate(self, db: sqlite3.Connection) -> None:
+        if db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'content'").fetchone():
+            db.executescript(MIGRATE_CONTENT)
+
+    def _lookup(self, sql: str, kind: str, keys: List[str]) -> Dict[str, str]:
+        self.open()
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self._db.execute(sql.format(placeholders), (self.namespace() + kind, *batch)).fetchall())
+        return found
+
+    def aliases(self, kind: str, references: Iterable[str]) -> Dict[str, str]:
+        """The existing reference for each of ``references`` that was deduplicated"""
+        return self._lookup("SELECT reference, canonical FROM aliases WHERE kind = ? AND reference IN ({})",
+                            kind, list(set(references)))
+
+    def resolve(self, kind: str, reference: str) -> str:
+        return self.aliases(kind, [reference]).get(reference, reference)
+
+    def canonicalize(self, kind: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Point items at the existing copies of any deduplicated questions they list"""
+        if kind != "items":
+            return records
+        aliases = self.aliases("questions", (ref for record in records for ref in record.get("questions") or []))
+        if not aliases:
+            return records
+        remapped = []
+        for record in records:
+            record = {**record, "questions": [aliases.get(ref, ref) for ref in record.get("questions") or []]}
+            definition = record.get("definition")
+            if isinstance(definition, dict) and isinstance(definition.get("widgets"), list):
+                record["definition"] = {**definition, "widgets": [
+                    {**widget, "reference": aliases.get(widget.get("reference"), widget.get("reference"))}
+                    if isinstance(widget, dict) else widget
+                    for widget in definition["widgets"]
+                ]}
+            remapped.append(record)
+        return remapped
+
+    def partition(self, kind: str, records: List[Dict[str, Any]]) -> Tuple[List[str], Dict[int, str]]:
+        """Hash ``records``; return their digests and, by position, the existing reference of each duplicate
+
+        A record repeating the content of an earlier record in the same batch
+        is a duplicate of that earlier record. A record whose reference was
+        written before is an update, never a duplicate.
+        """
+        digests = [content_digest(kind, record) for record in records]
+        # Newest first, so the reference a digest was first written under wins
+        known = self._lookup("SELECT digest, reference FROM written WHERE kind = ? AND digest IN ({}) "
+                             "ORDER BY created_at DESC", kind, list(set(digests)))
+        written = self._lookup("SELECT reference, digest FROM written WHERE kind = ? AND reference IN ({})",
+                               kind, list({record["reference"] for record in records}))
+        duplicates = {}
+        for i, (record, digest) in enumerate(zip(records, digests)):
+            if record["reference"] in written or known.get(digest) == record["reference"]:
+                continue
+            if digest in known:
+                duplicates[i] = known[digest]
+            else:
+                known[digest] = record["reference"]
+        return digests, duplicates
+
+    def remember(self, kind: str, written: List[Tuple[str, str]], aliases: List[Tuple[str, str]]) -> None:
+        """Record (digest, reference) pairs that were written and (reference, existing) pairs that were skipped
+
+        A written reference's previous digest is replaced, and it stops being
+        an alias.
+        """
+        self.open()
+        now = time.time()
+        kind = self.namespace() + kind
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO written (kind, reference, digest, created_at) VALUES (?, ?, ?, ?)",
+                [(kind, reference, digest, now) for digest, reference in written],
+            )
+            self._db.executemany(
+                "DELETE FROM aliases WHERE kind = ? AND reference = ?",
+                [(kind, reference) for _, reference in written],
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO aliases (kind, reference, canonical) VALUES (?, ?, ?)",
+                [(kind, reference, canonical) for reference, canonical in aliases if reference != canonical],
+            )
+
+
+def written_ok(result: Dict[str, Any]) -> bool:
+    return "error" not in result and result.get("status_code") == 200
+
+
+# Writes records (calling on_chunk with counts as they land); returns one result per record
+Writer = Callable[..., Awaitable[List[Dict[str, Any]]]]
+
+
+class DedupWriter:
+    """Wraps a writer such as ``BatchWriter.write`` to skip records whose content is already written
+
+    Skipped records get ``{"reference", "status_code": 200, "data": None,
+    "duplicate_of"}`` results, so callers see one result per record as before.
+    With ``dedupe=False`` every record is written, and the index still
+    learns what each reference now holds.
+    """
+
+    def __init__(self, write: Writer, index: ContentIndex, kind: str):
+        self.write_fresh = write
+        self.index = index
+        self.kind = kind
+
+    async def write(self, records: List[Dict[str, Any]],
+                    on_chunk: Callable[[int], None] | None = None, dedupe: bool = True) -> List[Dict[str, Any]]:
+        if dedupe:
+            records = await asyncio.to_thread(self.index.canonicalize, self.kind, records)
+            digests, duplicates = await asyncio.to_thread(self.index.partition, self.kind, records)
+        else:
+            digests, duplicates = [content_digest(self.kind, record) for record in records], {}
+        fresh = [i for i in range(len(records)) if i not in duplicates]
+        if on_chunk and duplicates:
+            on_chunk(len(duplicates))
+
+        written = await self.write_fresh([records[i] for i in fresh], on_chunk) if fresh else []
+        results: List[Dict[str, Any]] = [{}] * len(records)
+        by_reference = {}
+        for i, result in zip(fresh, written):
+            results[i] = by_reference[records[i]["reference"]] = result
+
+        aliases = []
+        for i, canonical in duplicates.items():
+            reference = records[i]["reference"]
+            if canonical in by_reference and not written_ok(by_reference[canonical]):
+                # Its twin earlier in this batch failed, so this one wasn't written either
+                results[i] = {**by_reference[canonical], "reference": reference}
+                continue
+            results[i] = {"reference": reference, "status_code": 200, "data": None, "duplicate_of": canonical}
+            aliases.append((reference, canonical))
+
+        written_digests = [(digests[i], records[i]["reference"]) for i in fresh if written_ok(results[i])]
+        await asyncio.to_thread(self.index.remember, self.kind, written_digests, aliases)
+        return results
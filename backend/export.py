@@ -0,0 +1,210 @@
+"""Streaming export of the item bank as NDJSON.
+
+Items are paged through with Data API ``get`` and its ``next`` tokens; for
+each page of items the questions they use are fetched too. Each page is
+emitted as the questions it uses (records with ``data``) followed by its
+items (records with ``questions``), the two shapes ``/api/import`` reads.
+A question used by items on several pages is emitted once per page.
+
+Page requests are sequential (each needs the previous page's token), but up
+to ``prefetch`` pages are fetched ahead while earlier ones are still being
+written out, and each page's question fetches run alongside the next item
+page. At most ``prefetch`` pages are held in memory.
+
+Resuming: every page carries the token that fetches the page after it.
+``/api/export`` can interleave those as checkpoint lines and starts from
+``?after=<token>``. The CLI writes them to a checkpoint file next to its
+output and picks up from there with ``--resume``::
+
+    python export.py --output bank.ndjson.gz
+    python export.py --output bank.ndjson.gz --resume
+"""
+from typing import Any, AsyncIterator, Dict, List
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+
+from data_api import AsyncDataApi, parse_response
+import config
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class ExportError(Exception):
+    def __init__(self, message: str, resume_from: str | None):
+        super().__init__(message)
+        # Token of the first page that was not exported
+        self.resume_from = resume_from
+
+
+def question_references(item: Dict[str, Any]) -> List[str]:
+    # Items list question references, or question objects carrying a reference
+    return [ref if isinstance(ref, str) else ref.get("reference") for ref in item.get("questions") or []
+            if isinstance(ref, str) or (isinstance(ref, dict) and ref.get("reference"))]
+
+
+def encode_page(questions: List[Dict[str, Any]], items: List[Dict[str, Any]]) -> bytes:
+    return b"".join(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+                    for record in (*questions, *items))
+
+
+async def _get(data_api: AsyncDataApi, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+    response = await data_api.request(f"itembank/{kind}", request, "get")
+    body = parse_response(response)
+    if response.status_code != 200 or not isinstance(body, dict):
+        raise RuntimeError(f"Fetching {kind} failed with status {response.status_code}")
+    return body
+
+
+async def fetch_questions(data_api: AsyncDataApi, references: List[str], page_size: int) -> List[Dict[str, Any]]:
+    chunks = [references[i:i + page_size] for i in range(0, len(references), page_size)]
+    bodies = await asyncio.gather(*(
+        _get(data_api, "questions", {"references": chunk, "limit": len(chunk)}) for chunk in chunks
+    ))
+    return [record for body in bodies for record in body.get("data") or [] if isinstance(record, dict)]
+
+
+async def export_pages(data_api: AsyncDataApi, after: str | None = None,
+                       page_size: int = config.export_page_size,
+                       prefetch: int = config.export_prefetch) -> AsyncIterator[tuple[bytes, int, str | None]]:
+    """Yield ``(ndjson, records, next_token)`` per page of items, starting at token ``after``
+
+    ``next_token`` is None after the last page. A failure raises
+    ``ExportError`` carrying the token to resume from.
+    """
+    pages: asyncio.Queue = asyncio.Queue(maxsize=max(1, prefetch))
+
+    async def fetch():
+        token = after
+        while True:
+            request: Dict[str, Any] = {"limit": page_size}
+            if token:
+                request["next"] = token
+            try:
+                body = await _get(data_api, "items", request)
+            except Exception as e:
+                await pages.put(ExportError(str(e), token))
+                return
+            items = [record for record in body.get("data") or [] if isinstance(record, dict)]
+            references = list(dict.fromkeys(ref for item in items for ref in question_references(item)))
+            questions = asyncio.create_task(fetch_questions(data_api, references, page_size))
+            following = (body.get("meta") or {}).get("next") if items else None
+            await pages.put((token, items, questions, following))
+            if not following:
+                await pages.put(_DONE)
+                return
+            token = following
+
+    fetcher = asyncio.create_task(fetch())
+    page = None
+    try:
+        while (page := await pages.get()) is not _DONE:
+            if isinstance(page, ExportError):
+                raise page
+            token, items, questions, following = page
+            try:
+                page_questions = await questions
+            except Exception as e:
+                raise ExportError(str(e), token) from e
+            yield encode_page(page_questions, items), len(page_questions) + len(items), following
+    finally:
+        fetcher.cancel()
+        # Pages fetched ahead but never written still have question fetches running
+        while not pages.empty():
+            page = pages.get_nowait()
+            if isinstance(page, tuple):
+                page[2].cancel()
+
+
+async def stream_export(data_api: AsyncDataApi, after: str | None = None, checkpoints: bool = False,
+                        page_size: int = config.export_page_size,
+                        prefetch: int = config.export_prefetch) -> AsyncIterator[bytes]:
+    """NDJSON for ``/api/export``; a failure ends the stream with an ``error`` line saying where to resume"""
+    try:
+        async for ndjson, _, following in export_pages(data_api, after, page_size, prefetch):
+            yield ndjson
+            if checkpoints and following:
+                yield json.dumps({"checkpoint": following}).encode("utf-8") + b"\n"
+    except ExportError as e:
+        logger.error(f"Export stopped: {str(e)}")
+        yield json.dumps({"error": str(e), "resume_from": e.resume_from}).encode("utf-8") + b"\n"
+
+
+def read_checkpoint(path: str) -> Dict[str, Any] | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
+
+
+async def export_to_file(data_api: AsyncDataApi, output: str, compress: bool = False, resume: bool = False,
+                         page_size: int = config.export_page_size,
+                         prefetch: int = config.export_prefetch) -> Dict[str, Any]:
+    """Export to ``output``, checkpointing after every page; return the final checkpoint
+
+    With ``compress`` every page is written as its own gzip member, so the
+    file is valid gzip at every checkpoint and resuming appends members.
+    """
+    checkpoint_path = f"{output}.checkpoint"
+    checkpoint = read_checkpoint(checkpoint_path) if resume else None
+    if checkpoint is None:
+        checkpoint = {"next": None, "offset": 0, "records": 0, "pages": 0}
+
+    with open(output, "r+b" if checkpoint["offset"] else "wb") as f:
+        # Drop anything written after the last checkpoint
+        f.truncate(checkpoint["offset"])
+        f.seek(checkpoint["offset"])
+        async for ndjson, records, following in export_pages(data_api, checkpoint["next"], page_size, prefetch):
+            f.write(gzip.compress(ndjson, mtime=0) if compress else ndjson)
+            f.flush()
+            os.fsync(f.fileno())
+            checkpoint = {"next": following, "offset": f.tell(),
+                          "records": checkpoint["records"] + records, "pages": checkpoint["pages"] + 1}
+            write_checkpoint(checkpoint_path, checkpoint)
+    os.remove(checkpoint_path)
+    return checkpoint
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Export the item bank as NDJSON")
+    parser.add_argument("--output", required=True, help="File to write; a .gz suffix compresses it")
+    parser.add_argument("--gzip", action="store_true", help="Compress even without a .gz suffix")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the checkpoint left by an interrupted export to the same file")
+    parser.add_argument("--page-size", type=int, default=config.export_page_size)
+    parser.add_argument("--prefetch", type=int, default=config.export_prefetch,
+                        help="Pages to fetch ahead of the one being written")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    import main
+
+    async def run():
+        try:
+            return await export_to_file(main.data_api, args.output, args.gzip or args.output.endswith(".gz"),
+                                        args.resume, args.page_size, args.prefetch)
+        finally:
+            await main.data_api.close()
+
+    try:
+        checkpoint = asyncio.run(run())
+    except ExportError as e:
+        raise SystemExit(f"Export stopped: {e}. Run again with --resume to continue.")
+    print(f"Exported {checkpoint['records']} records in {checkpoint['pages']} pages to {args.output}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,164 @@
+"""Local stand-in for the Learnosity Data API item bank.
+
+Implements ``get`` and ``set`` on ``itembank/items`` and
+``itembank/questions`` in memory, with configurable latency, error rate and
+rate limit, so throughput can be measured and regression-tested offline.
+``set`` stamps records with ``dt_updated``; paged ``get`` supports the
+``updated.from`` filter and ``sort_field: "updated"``.
+
+Run it standalone and point the backend at it::
+
+    python fake_data_api.py --port 9000 --latency 0.05 --rate-limit 200
+    LEARNOSITY_DATA_API_URL=http://localhost:9000/latest python main.py
+
+or mount it in-process with ``httpx.ASGITransport(app=create_app(...))``.
+"""
+from typing import Any, Dict, List
+from urllib.parse import parse_qs
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import time
+
+from learnosity_sdk.request import Init
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import config
+
+
+class FakeItemBank:
+    """In-memory item bank with injectable latency, errors and rate limiting"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: float | None = None, secret: str | None = None, seed: int | None = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        # When set, requests whose signature doesn't verify against it are rejected
+        self.secret = secret
+        self.random = random.Random(seed)
+        self.records: Dict[str, Dict[str, Dict[str, Any]]] = {"items": {}, "questions": {}}
+        self.requests = 0
+        self._tokens = rate_limit or 0.0
+        self._refilled = time.monotonic()
+
+    def _take_token(self) -> bool:
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _verify(self, security: Dict[str, Any], request_string: str, action: str) -> bool:
+        signed = {key: value for key, value in security.items() if key != "signature"}
+        # Sign the request string exactly as received rather than a re-serialization of it
+        vals = [signed[key] for key in Init.security_keys if key in signed] + [request_string, action]
+        return security.get("signature") == Init("data", signed, self.secret).hash_list(vals)
+
+    def get(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        references = request.get("references") or request.get(kind)
+        if references:
+            found = [self.records[kind][ref] for ref in references if ref in self.records[kind]]
+            return {"meta": {"status": True, "records": len(found)}, "data": found}
+
+        records = list(self.records[kind].values())
+        updated_from = (request.get("updated") or {}).get("from")
+        if updated_from:
+            records = [record for record in records if record.get("dt_updated", "") >= updated_from]
+        if request.get("sort_field") == "updated":
+            records.sort(key=lambda record: (record.get("dt_updated", ""), record["reference"]))
+        start = int(request.get("next") or 0)
+        limit = int(request.get("limit") or 50)
+        page = records[start:start + limit]
+        meta = {"status": True, "records": len(records)}
+        if start + limit < len(records):
+            meta["next"] = str(start + limit)
+        return {"meta": meta, "data": page}
+
+    def set(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        written: List[Dict[str, Any]] = request.get(kind, [])
+        now = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        for record in written:
+            self.records[kind][record["reference"]] = {**record, "dt_updated": now}
+        return {
+            "meta": {"status": True, "records": len(written)},
+            "data": [{"reference": record["reference"]} for record in written],
+        }
+
+    async def handle(self, request: Request) -> JSONResponse:
+        self.requests += 1
+        kind = request.path_params["kind"]
+        form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+        action = form.get("action", "get")
+
+        if not self._take_token():
+            return JSONResponse({"meta": {"status": False, "message": "Rate limit exceeded"}},
+                                status_code=429, headers={"Retry-After": "1"})
+
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            return JSONResponse({"meta": {"status": False, "message": "Injected error"}}, status_code=500)
+
+        try:
+            security = json.loads(form["security"])
+            request_string = form.get("request", "{}")
+            body = json.loads(request_string)
+        except (KeyError, ValueError):
+            return JSONResponse({"meta": {"status": False, "message": "Malformed request"}}, status_code=400)
+
+        if self.secret is not None and not self._verify(security, request_string, action):
+            return JSONResponse({"meta": {"status": False, "message": "Signature mismatch"}}, status_code=403)
+
+        if action == "get":
+            return JSONResponse(self.get(kind, body))
+        if action == "set":
+            return JSONResponse(self.set(kind, body))
+        return JSONResponse({"meta": {"status": False, "message": f"Unsupported action {action}"}},
+                            status_code=400)
+
+
+def create_app(item_bank: FakeItemBank | None = None, **options: Any) -> Starlette:
+    """ASGI app serving ``/{version}/itembank/{items,questions}``"""
+    item_bank = item_bank or FakeItemBank(**options)
+    app = Starlette(routes=[
+        Route("/{version}/itembank/{kind:str}", item_bank.handle, methods=["POST"]),
+    ])
+    app.state.item_bank = item_bank
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Learnosity Data API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before answering 429")
+    parser.add_argument("--verify", action="store_true", help="Reject requests not signed with config.consumer_secret")
+    args = parser.parse_args()
+
+    app = create_app(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, secret=config.consumer_secret if args.verify else None,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""``Idempotency-Key`` support for endpoints that write to the item bank.
+
+A client that may retry a request sends the same ``Idempotency-Key`` header
+with every attempt. ``IdempotencyMiddleware`` runs the first attempt and
+stores its response; an attempt arriving while the first is still running
+waits for it and an attempt arriving later gets the stored response back
+(marked ``Idempotent-Replayed: true``), so retries never repeat the writes.
+
+- Keys are scoped to the method and path (and ``namespace``, e.g. the
+  tenant). Reusing a key for a different
+  request (another body or query string) is a 422.
+- Responses with a 5xx status are not stored; the key is released so a
+  retry runs the request again.
+- ``IdempotencyStore`` keeps keys in SQLite, so every worker process of
+  ``serve.py`` sees the same keys. Completed responses expire after
+  ``ttl`` seconds and at most ``max_entries`` are kept. A key left running
+  by a process that died is claimable again after ``lock_timeout``.
+"""
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from sqlite_store import SQLiteStore
+import config
+import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner INTEGER NOT NULL,
+    status_code INTEGER,
+    headers TEXT,
+    body BLOB,
+    created_at REAL NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS responses_expiry ON responses (status, expires_at);
+"""
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# status code, headers, body
+Stored = Tuple[int, List[Tuple[str, str]], bytes]
+
+
+class IdempotencyStore(SQLiteStore):
+    """SQLite record of idempotency keys and their responses; every method is blocking and thread-safe"""
+
+    schema = SCHEMA
+
+    def __init__(self, path: Path | str = config.idempotency_db_path, ttl: float = config.idempotency_ttl,
+                 max_entries: int = config.idempotency_max_entries,
+                 lock_timeout: float = config.idempotency_lock_timeout):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock_timeout = lock_timeout
+        self._next_purge = 0.0
+
+    def claim(self, key: str, fingerprint: str) -> Tuple[str, Stored | None]:
+        """Claim ``key`` for a new run, or report what holds it
+
+        Returns ``("claimed", None)``, ``("running", None)``,
+        ``("done", stored response)`` or ``("mismatch", None)``.
+        """
+        self.open()
+        now = time.time()
+        with self._lock, self._db:
+            # An immediate transaction, so two processes can't both claim the key
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute("SELECT * FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                expired = row["expires_at"] is not None and row["expires_at"] <= now
+                abandoned = row["status"] == "running" and row["created_at"] <= now - self.lock_timeout
+                if expired or abandoned:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+            if row is None:
+                self._db.execute(
+                    "INSERT INTO responses (key, fingerprint, status, owner, created_at) VALUES (?, ?, 'running', ?, ?)",
+                    (key, fingerprint, os.getpid(), now),
+                )
+                return "claimed", None
+            if row["fingerprint"] != fingerprint:
+                return "mismatch", None
+            if row["status"] == "running":
+                return "running", None
+            return "done", (row["status_code"], [tuple(pair) for pair in json.loads(row["headers"])], row["body"])
+
+    def complete(self, key: str, response: Stored) -> None:
+        self.open()
+        status_code, headers, body = response
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE responses SET status = 'done', status_code = ?, headers = ?, body = ?, expires_at = ? "
+                "WHERE key = ?",
+                (status_code, json.dumps(headers), body, now + self.ttl, key),
+            )
+        if now >= self._next_purge:
+            self._next_purge = now + min(self.ttl, 60.0)
+            self.purge()
+
+    def release(self, key: str) -> None:
+        """Forget a running key without storing a response, so the next attempt runs again"""
+        self.open()
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses WHERE key = ? AND status = 'running'", (key,))
+
+    def purge(self) -> int:
+        """Delete expired responses, then the oldest ones beyond ``max_entries``"""
+        self.open()
+        with self._lock, self._db:
+            deleted = self._db.execute("DELETE FROM responses WHERE status = 'done' AND expires_at <= ?",
+                                       (time.time(),)).rowcount
+            deleted += self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses WHERE status = 'done' "
+                "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        return deleted
+
+
+class IdempotencyMiddleware:
+    """Applies ``Idempotency-Key`` semantics to the ``(method, path)`` pairs in ``routes``"""
+
+    def __init__(self, app: ASGIApp, store: IdempotencyStore, routes: Iterable[Tuple[str, str]],
+                 wait_timeout: float = config.idempotency_wait_timeout, poll_interval: float = 0.05,
+                 namespace: Callable[[], str] = lambda: ""):
+        self.app = app
+        self.namespace = namespace
+        self.store = store
+        self.routes = set(routes)
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        # Runs in this process, so local waiters needn't poll the store
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        key = next((value.decode("latin-1") for name, value in scope["headers"] if name == HEADER.encode()), None)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        route = scope["path"]
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await JSONResponse({"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"},
+                               status_code=400)(scope, receive, send)
+            return
+
+        # The body is part of the fingerprint, so read it all and replay it to the app
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        fingerprint = hashlib.sha256(
+            b"\n".join([scope["method"].encode(), route.encode(), scope.get("query_string", b""), body])
+        ).hexdigest()
+        scoped_key = f"{self.namespace()}{scope['method']} {route} {key}"
+
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            state, stored = await asyncio.to_thread(self.store.claim, scoped_key, fingerprint)
+            if state == "claimed":
+                metrics.idempotency_requests_total.inc(route, "new")
+                await self._run(scoped_key, scope, body, send)
+                return
+            if state == "mismatch":
+                metrics.idempotency_requests_total.inc(route, "mismatch")
+                await JSONResponse({"detail": "Idempotency-Key was already used for a different request"},
+                                   status_code=422)(scope, receive, send)
+                return
+            if state == "done":
+                metrics.idempotency_requests_total.inc(route, "replayed")
+                await self._replay(stored, send)
+                return
+
+            # Running: wait for the original attempt, here or in another worker, then look again
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                metrics.idempotency_requests_total.inc(route, "timeout")
+                await JSONResponse({"detail": "A request with this Idempotency-Key is still in progress"},
+                                   status_code=409, headers={"Retry-After": "1"})(scope, receive, send)
+                return
+            running = self._inflight.get(scoped_key)
+            if running is not None:
+                try:
+                    stored = await asyncio.wait_for(asyncio.shield(running), remaining)
+                except asyncio.TimeoutError:
+                    continue
+                if stored is not None:
+                    metrics.idempotency_requests_total.inc(route, "joined")
+                    await self._replay(stored, send)
+                    return
+            else:
+                await asyncio.sleep(min(self.poll_interval, remaining))
+
+    async def _run(self, key: str, scope: Scope, body: bytes, send: Send) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        start: Message = {}
+        chunks: List[bytes] = []
+        replayed_body = False
+
+        async def receive_body() -> Message:
+            nonlocal replayed_body
+            if not replayed_body:
+                replayed_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Nothing more to read; wait like a client that stays connected
+            await asyncio.Event().wait()
+            return {"type": "http.disconnect"}
+
+        async def send_recording(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        stored: Stored | None = None
+        try:
+            await self.app(scope, receive_body, send_recording)
+            if start and start["status"] < 500:
+                headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in start["headers"]]
+                stored = (start["status"], headers, b"".join(chunks))
+        finally:
+            saved: Stored | None = None
+            try:
+                if stored is not None:
+                    await asyncio.to_thread(self.store.complete, key, stored)
+                    saved = stored
+                else:
+                    await asyncio.to_thread(self.store.release, key)
+            finally:
+                # Even if the store write failed or was cancelled: waiters get the saved response,
+                # or None to go and claim the key themselves
+                future.set_result(saved)
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+    async def _replay(self, stored: Stored, send: Send) -> None:
+        status_code, headers, body = stored
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+            + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,113 @@
+"""Read-through LRU + TTL cache with single-flight loading.
+
+Used in front of Data API item reads: hot items are served from memory,
+memory use is bounded by ``maxsize`` entries, and concurrent misses for the
+same key share one upstream call instead of each making their own. That
+call runs as a task owned by the cache, so a caller that is cancelled (a
+client disconnecting, a timeout) stops waiting without cancelling it for
+the callers sharing it.
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set, Tuple
+import asyncio
+import time
+
+import config
+
+
+class ItemCache:
+    """LRU cache whose entries expire ``ttl`` seconds after they are stored"""
+
+    def __init__(self, maxsize: int = config.item_cache_size, ttl: float = config.item_cache_ttl,
+                 cacheable: Callable[[Any], bool] = lambda value: True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cacheable = cacheable
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Strong references to running loads, including ones invalidated out of _inflight
+        self._loads: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return ``(True, value)`` for a live entry, ``(False, None)`` otherwise"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop ``key``; a load already in flight for it will not be cached"""
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+        self._inflight.pop(key, None)
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for ``key``, calling ``load`` at most once per concurrent miss"""
+        found, value = self.lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._load(key, load))
+            self._inflight[key] = task
+            self._loads.add(task)
+            task.add_done_callback(self._finished)
+        # Cancelling this caller only stops it waiting; the load carries on for the others
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await load()
+            # An invalidation during the load means the value may already be stale
+            if self._inflight.get(key) is task and self.cacheable(value):
+                self.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._loads.discard(task)
+        if not task.cancelled():
+            # Mark the exception retrieved; waiters (if any) still receive it
+            task.exception()
+
+    def stats(self) -> Dict[str, float | int | None]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
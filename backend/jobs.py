@@ -0,0 +1,288 @@
+"""Background jobs for long-running item-bank writes.
+
+A POST can hand its work to ``JobQueue.submit`` and return a job id straight
+away; a bounded pool of worker tasks runs the job and records its progress
+and result. Jobs are persisted in SQLite, so work that was queued or running
+when the process stopped is picked up again (Data API ``set`` writes are
+upserts, so re-running a partly finished job is safe).
+
+Several processes can share one store. Each unfinished job is leased to the
+queue that will run it for ``config.job_lease_seconds``, and the queue keeps
+renewing its leases while it is alive. Every queue periodically claims jobs
+whose lease has run out, those of a process that crashed or was killed,
+and a queue that stops cleanly gives its leases up so they are claimed
+straight away. A job a live worker is still running is never picked up
+twice.
+Progress is kept in memory as chunks land and saved every
+``config.job_progress_interval`` seconds, so a job of many small chunks
+doesn't make a blocking SQLite write per chunk.
+"""
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+import config
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Reports (done, total) as a job makes progress
+Progress = Callable[[int, int], None]
+# Runs a job's payload and returns its result
+Handler = Callable[[Dict[str, Any], Progress], Awaitable[Dict[str, Any]]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_expires REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+# Columns added since the first schema, for databases created before them
+MIGRATIONS = {"owner": "ALTER TABLE jobs ADD COLUMN owner TEXT",
+              "lease_expires": "ALTER TABLE jobs ADD COLUMN lease_expires REAL"}
+
+
+class JobStore(SQLiteStore):
+    """SQLite-backed job records; every method is blocking and thread-safe"""
+
+    schema = SCHEMA
+
+    def __init__(self, path: Path | str = config.job_db_path):
+        super().__init__(path)
+
+    def migrate(self, db: sqlite3.Connection) -> None:
+        columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+        for column, sql in MIGRATIONS.items():
+            if column not in columns:
+                db.execute(sql)
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        """Run a write in its own transaction; return the number of rows changed"""
+        self.open()
+        with self._lock, self._db:
+            return self._db.execute(sql, params).rowcount
+
+    def _query(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        self.open()
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def create(self, kind: str, payload: Dict[str, Any], owner: str | None = None, lease: float = 0.0) -> str:
+        """Record a queued job, leased to ``owner`` if given (otherwise any queue may claim it)"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at, owner, lease_expires) "
+            "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), now, now, owner, now + lease if owner else None),
+        )
+        return job_id
+
+    def claim(self, job_id: str, owner: str, lease: float) -> bool:
+        """Lease an unfinished job to ``owner`` if nobody holds a live lease on it"""
+        now = time.time()
+        return self._execute(
+            "UPDATE jobs SET owner = ?, lease_expires = ? WHERE id = ? AND status IN ('queued', 'running') "
+            "AND (lease_expires IS NULL OR lease_expires < ?)",
+            (owner, now + lease, job_id, now),
+        ) == 1
+
+    def start(self, job_id: str, owner: str | None) -> bool:
+        """Mark a job running if ``owner`` still holds it"""
+        return self._execute(
+            "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND owner IS ?",
+            (time.time(), job_id, owner),
+        ) == 1
+
+    def renew(self, owner: str, lease: float) -> int:
+        return self._execute(
+            "UPDATE jobs SET lease_expires = ? WHERE owner = ? AND status IN ('queued', 'running')",
+            (time.time() + lease, owner),
+        )
+
+    def release(self, owner: str) -> int:
+        """Give up ``owner``'s unfinished jobs so another queue claims them straight away"""
+        return self._execute(
+            "UPDATE jobs SET owner = NULL, lease_expires = NULL WHERE owner = ? AND status IN ('queued', 'running')",
+            (owner,),
+        )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Dict[str, Any] | None:
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": {"done": row["done"], "total": row["total"]},
+            "result": json.loads(row["result"]) if row["result"] is not None else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def payload(self, job_id: str) -> tuple[str, Dict[str, Any]]:
+        row = self._query("SELECT kind, payload FROM jobs WHERE id = ?", (job_id,))[0]
+        return row["kind"], json.loads(row["payload"])
+
+    def unclaimed(self) -> list[str]:
+        """Unfinished jobs nobody holds a live lease on, oldest first"""
+        rows = self._query(
+            "SELECT id FROM jobs WHERE status IN ('queued', 'running') "
+            "AND (lease_expires IS NULL OR lease_expires < ?) ORDER BY created_at",
+            (time.time(),),
+        )
+        return [row["id"] for row in rows]
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs last updated more than ``older_than`` seconds ago"""
+        return self._execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+            (time.time() - older_than,),
+        )
+
+
+class JobQueue:
+    """Runs persisted jobs on a bounded pool of worker tasks"""
+
+    def __init__(self, handlers: Dict[str, Handler], store: JobStore | None = None,
+                 workers: int = config.job_workers, lease: float = config.job_lease_seconds):
+        self.handlers = handlers
+        self.store = store or JobStore()
+        self.workers = workers
+        self.lease = lease
+        # Set on start, so each forked worker process holds its leases under its own name
+        self.owner: str | None = None
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        # (done, total) of the jobs running here, newer than what the store has
+        self._progress: Dict[str, Tuple[int, int]] = {}
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        purged = await asyncio.to_thread(self.store.purge, config.job_retention_seconds)
+        if purged:
+            logger.info(f"Purged {purged} finished job(s)")
+        # Resume anything left unleased by a clean stop, now and whenever another process's lease runs out
+        await self._resume()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._keep_leases()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        # Jobs still queued or interrupted mid-run here are picked up by the next queue to look
+        await asyncio.to_thread(self.store.release, self.owner)
+        self.owner = None
+        self.store.close()
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Persist a job and queue it; return its id"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind {kind}")
+        if self._queue is None:
+            # Nothing runs here: leave it for whichever queue claims it
+            return await asyncio.to_thread(self.store.create, kind, payload)
+        job_id = await asyncio.to_thread(self.store.create, kind, payload, self.owner, self.lease)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> Dict[str, Any] | None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        progress = self._progress.get(job_id)
+        if job is not None and progress is not None:
+            job["progress"] = {"done": progress[0], "total": progress[1]}
+        return job
+
+    def _claim_unclaimed(self) -> list[str]:
+        return [job_id for job_id in self.store.unclaimed() if self.store.claim(job_id, self.owner, self.lease)]
+
+    async def _resume(self) -> None:
+        for job_id in await asyncio.to_thread(self._claim_unclaimed):
+            logger.info(f"Resuming job {job_id}")
+            self._queue.put_nowait(job_id)
+
+    async def _keep_leases(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await asyncio.to_thread(self.store.renew, self.owner, self.lease)
+            await self._resume()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            await self._run(job_id)
+
+    async def _run(self, job_id: str) -> None:
+        if not await asyncio.to_thread(self.store.start, job_id, self.owner):
+            # Our lease ran out (the loop was blocked for longer than it) and another queue took the job
+            logger.warning(f"Job {job_id} was claimed by another worker; not running it here")
+            return
+        kind, payload = await asyncio.to_thread(self.store.payload, job_id)
+
+        def progress(done: int, total: int) -> None:
+            # Called on the event loop for every chunk: no I/O here, _save_progress writes it out
+            self._progress[job_id] = (done, total)
+
+        saver = asyncio.create_task(self._save_progress(job_id))
+        try:
+            result = await self.handlers[kind](payload, progress)
+        except asyncio.CancelledError:
+            # Shutting down: leave the job "running" so it is resumed on restart
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            await asyncio.to_thread(self.store.update, job_id, status="failed", error=str(e),
+                                    **self._progress_fields(job_id))
+        else:
+            await asyncio.to_thread(self.store.update, job_id, status="succeeded", result=result,
+                                    **self._progress_fields(job_id))
+            logger.info(f"Job {job_id} succeeded")
+        finally:
+            saver.cancel()
+            self._progress.pop(job_id, None)
+
+    def _progress_fields(self, job_id: str) -> Dict[str, int]:
+        progress = self._progress.get(job_id)
+        return {} if progress is None else {"done": progress[0], "total": progress[1]}
+
+    async def _save_progress(self, job_id: str) -> None:
+        saved = None
+        while True:
+            await asyncio.sleep(config.job_progress_interval)
+            progress = self._progress.get(job_id)
+            if progress is not None and progress != saved:
+                await asyncio.to_thread(self.store.update, job_id, done=progress[0], total=progress[1])
+                saved = progress
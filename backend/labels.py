@@ -0,0 +1,193 @@
+"""Learnosity label bundles, keyed by locale and API.
+
+Bundles ship with the backend as ``<locale>/<api>.json`` (e.g.
+``es/assess-api.json``) and are loaded from disk at startup, so serving them
+costs no network round trip. Refreshing them from the learnosity-i18n
+repository is optional and runs in the background using conditional
+requests (ETag / If-Modified-Since).
+
+Each bundle is also kept as a content-addressed asset: compact JSON bytes,
+their hash, and precompressed gzip (and brotli, if installed) variants, so
+clients can fetch a bundle once from an immutable URL instead of receiving
+it inline in every init payload.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Tuple
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+
+import httpx
+
+import config
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_DIR = Path(__file__).parent
+
+
+@dataclass(frozen=True)
+class LabelAsset:
+    """A label bundle serialized once, named by its content hash"""
+    locale: str
+    api: str
+    digest: str
+    body: bytes
+    gzip: bytes
+    br: bytes | None
+
+    @classmethod
+    def build(cls, locale: str, api: str, bundle: Dict[str, Any]) -> "LabelAsset":
+        body = json.dumps(bundle, separators=(",", ":"), ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return cls(
+            locale=locale,
+            api=api,
+            digest=hashlib.sha256(body).hexdigest()[:16],
+            body=body,
+            gzip=gzip.compress(body, compresslevel=9, mtime=0),
+            br=brotli.compress(body) if brotli is not None else None,
+        )
+
+    @property
+    def path(self) -> str:
+        return f"/api/labels/{self.locale}/{self.api}.{self.digest}.json"
+
+    def reference(self) -> Dict[str, str]:
+        return {"locale": self.locale, "api": self.api, "hash": self.digest, "href": self.path}
+
+    def negotiate(self, accept_encoding: str) -> Tuple[bytes, str | None]:
+        """Pick the smallest variant the client accepts; return (body, content encoding)"""
+        accepted = set()
+        for token in accept_encoding.lower().split(","):
+            coding, _, params = token.strip().partition(";")
+            if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(coding.strip())
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.body, None
+
+
+class LabelBundles:
+    """In-memory cache of label bundles, keyed by ``(locale, api)``"""
+
+    def __init__(self, root: Path = BUNDLE_DIR, transport: httpx.AsyncBaseTransport | None = None):
+        self.root = Path(root)
+        self.transport = transport
+        self.bundles: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.assets: Dict[Tuple[str, str], LabelAsset] = {}
+        # Bumped whenever any bundle changes, so callers can cheaply detect staleness
+        self.version = 0
+        self._validators: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self._refresh_task: asyncio.Task | None = None
+
+    def load(self) -> None:
+        """Load every bundled ``<locale>/<api>.json`` file under the root directory"""
+        for path in sorted(self.root.glob("*/*-api.json")):
+            locale, api = path.parent.name, path.stem
+            with open(path, encoding="utf-8") as f:
+                self._store((locale, api), json.load(f))
+            logger.info(f"Loaded {api} label bundle for locale {locale}")
+        self.version += 1
+
+    def _store(self, key: Tuple[str, str], bundle: Dict[str, Any]) -> None:
+        self.bundles[key] = bundle
+        self.assets[key] = LabelAsset.build(*key, bundle)
+
+    @property
+    def locales(self) -> list[str]:
+        return sorted({locale for locale, _ in self.bundles})
+
+    def resolve_locale(self, locale: str) -> str | None:
+        """Map a requested locale (``es``, ``es-ES``, ``es_es``) onto a loaded one"""
+        if not self.version:
+            self.load()
+        locale = locale.replace("_", "-").lower()
+        available = {known.lower(): known for known in self.locales}
+        if locale in available:
+            return available[locale]
+        return available.get(locale.split("-")[0])
+
+    def get(self, locale: str, api: str = "assess-api") -> Dict[str, Any] | None:
+        """Return the bundle for ``locale``, or None if Learnosity's defaults should be used"""
+        resolved = self.resolve_locale(locale)
+        if resolved is None:
+            return None
+        return self.bundles.get((resolved, api))
+
+    def asset(self, locale: str, api: str = "assess-api") -> LabelAsset | None:
+        """Return the content-addressed asset for ``locale``, resolved like ``get``"""
+        resolved = self.resolve_locale(locale)
+        if resolved is None:
+            return None
+        return self.assets.get((resolved, api))
+
+    async def refresh(self) -> int:
+        """Re-fetch every loaded bundle that has a remote source; return how many changed"""
+        changed = 0
+        async with httpx.AsyncClient(transport=self.transport, timeout=config.data_api_timeout) as client:
+            for key in list(self.bundles):
+                try:
+                    changed += await self._refresh_one(client, key)
+                except (httpx.HTTPError, ValueError) as e:
+                    logger.warning(f"Failed to refresh {key[1]} label bundle for {key[0]}: {str(e)}")
+        if changed:
+            self.version += 1
+        return changed
+
+    async def _refresh_one(self, client: httpx.AsyncClient, key: Tuple[str, str]) -> int:
+        locale, api = key
+        language = config.label_bundle_languages.get(locale)
+        if language is None:
+            return 0
+
+        url = config.label_bundle_url.format(language=language, api=api)
+        validators = self._validators.get(key, {})
+        headers = {}
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last-modified" in validators:
+            headers["If-Modified-Since"] = validators["last-modified"]
+
+        response = await client.get(url, headers=headers)
+        if response.status_code == 304:
+            return 0
+        response.raise_for_status()
+
+        self._validators[key] = {
+            name: response.headers[name] for name in ("etag", "last-modified") if name in response.headers
+        }
+        bundle = response.json()
+        if bundle == self.bundles.get(key):
+            return 0
+        self._store(key, bundle)
+        logger.info(f"Refreshed {api} label bundle for locale {locale}")
+        return 1
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh()
+
+    def start_refresh(self, interval: float | None = config.label_bundle_refresh_interval) -> None:
+        """Start periodic background refresh; a falsy interval leaves it disabled"""
+        if interval and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop(interval))
+
+    async def stop_refresh(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
@@ -0,0 +1,177 @@
+"""Logging that stays off the request hot path.
+
+- ``Payload`` wraps a request or response body passed as a logging
+  argument (``logger.info("Request data: %s", Payload(data))``). It is only
+  rendered if the record is emitted, as compact JSON, and bodies longer
+  than ``config.log_payload_max_chars`` are cut short and tagged with their
+  length and a SHA-256 of the whole body.
+- ``RequestSampling`` keeps a random share of each route's requests, set
+  per route template in ``config.log_sample_rates``: a request is kept or
+  dropped as a whole, on its first record, so the records of a kept
+  request tell the full story. Warnings and errors are always kept.
+  ``LogContextMiddleware`` gives each request its own decision.
+- ``configure`` sends records through a bounded queue to a listener thread
+  that formats and writes them (as text, or JSON lines with
+  ``config.log_format = "json"``), so a request never waits on log I/O.
+  When the queue is full, records are dropped and counted in
+  ``log_records_dropped_total`` instead.
+"""
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List
+import atexit
+import datetime
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+import config
+import metrics
+
+
+class Payload:
+    """A body to log, rendered only when the record is formatted"""
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Any, max_chars: int | None = None):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        max_chars = config.log_payload_max_chars if self.max_chars is None else self.max_chars
+        if isinstance(self.value, (str, bytes)):
+            text = self.value.decode("utf-8", "replace") if isinstance(self.value, bytes) else self.value
+        else:
+            try:
+                text = json.dumps(self.value, separators=(",", ":"), ensure_ascii=False, default=str)
+            except (TypeError, ValueError):
+                text = repr(self.value)
+        if len(text) <= max_chars:
+            return text
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        return f"{text[:max_chars]}... [{len(text)} chars, sha256:{digest}]"
+
+
+# Per request: [keep?], decided on the request's first record; a list so threads it starts share the decision
+_decision: ContextVar[List[bool | None] | None] = ContextVar("log_decision", default=None)
+
+
+def sample_rate(route: str) -> float:
+    return config.log_sample_rates.get(route, config.log_sample_default)
+
+
+class RequestSampling(logging.Filter):
+    """Keeps a sampled share of each route's requests, and stamps records with their route"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        route = metrics.current_route.get()
+        record.route = route
+        if record.levelno >= logging.WARNING:
+            return True
+        decision = _decision.get()
+        if decision is None:
+            # Outside a request (startup, background jobs and refills)
+            return True
+        if decision[0] is None:
+            rate = sample_rate(route)
+            decision[0] = rate >= 1 or random.random() < rate
+        return decision[0]
+
+
+class LogContextMiddleware:
+    """Starts a fresh sampling decision for each request"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _decision.set([None])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _decision.reset(token)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "route", ""):
+            entry["route"] = record.route
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueues without blocking; a full queue drops the record"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.log_records_dropped_total.inc()
+
+
+_handler: DroppingQueueHandler | None = None
+_listener: QueueListener | None = None
+
+
+def _formatter() -> logging.Formatter:
+    if config.log_format == "json":
+        return JsonFormatter()
+    return logging.Formatter(logging.BASIC_FORMAT)
+
+
+def _start_listener() -> None:
+    global _listener
+    output = logging.StreamHandler()
+    output.setFormatter(_formatter())
+    _handler.queue = queue.Queue(maxsize=config.log_queue_size)
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork() -> None:
+    # The listener thread doesn't survive fork (and its queue may have been locked mid-put): start afresh
+    if _handler is not None:
+        _start_listener()
+
+
+def configure(level: int | str = logging.INFO) -> None:
+    """Route the root logger through the queue, unless logging is already set up (like ``basicConfig``)"""
+    global _handler
+    root = logging.getLogger()
+    if _handler is not None or root.handlers:
+        return
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=config.log_queue_size))
+    _handler.addFilter(RequestSampling())
+    _start_listener()
+    root.addHandler(_handler)
+    root.setLevel(level)
+    atexit.register(shutdown)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def shutdown() -> None:
+    """Write out anything still queued"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
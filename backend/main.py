@@ -1,19 +1,135 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from functools import lru_cache, partial
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from learnosity_sdk.request import Init, DataApi
+from fastapi.middleware.gzip import GZipMiddleware
 from learnosity_sdk.utils import Uuid
+from data_api import parse_response
+from batch import BatchWriter
+from admission import AdmissionController, Overloaded
+from bulk_import import NDJSONStreamingResponse, stream_import
+from bulk_questions import item_payloads, parse_questions
+from dedup import ContentIndex, DedupWriter, Writer, written_ok
+from idempotency import IdempotencyMiddleware, IdempotencyStore
+from tenants import Tenant, TenantDataApi, TenantMiddleware, TenantRegistry, current_tenant, use_tenant
+import tenants
+from provisioning import WarmPool
+from templates import InitTemplate
+from coalesce import BatchLoader
+from export import stream_export
+from item_cache import ItemCache
+from mirror import ItemBankMirror
+from scoring import ScoringTable, UnsupportedQuestion
+from upstream import UpstreamUnavailable
+from jobs import JobQueue, Progress
+from metrics import MetricsMiddleware, TimedRoute
+from profiling import ProfileStore, ProfilingMiddleware, Sampler, authorized
+from logs import LogContextMiddleware, Payload
+import logs
+import metrics
+from labels import LabelBundles
+import asyncio
 import config
-import json
-import requests
 import logging
-from pydantic import BaseModel
-from typing import Dict, Any, List
+import math
+import random
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import Callable, Dict, Any, List, Literal, Tuple
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: queued off the request path, sampled per route (see logs.py)
+logs.configure(logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Set variables for the web server
+host = "localhost"
+port = 8000
+
+# Learnosity consumers we serve; the X-Tenant-ID header picks one per request
+tenant_registry = TenantRegistry()
+
+# Shared Data API client; each tenant gets its own connection pool, which
+# lives for the lifetime of the app
+data_api = TenantDataApi(tenant_registry, domain=host)
+
+# Chunked, concurrent writers for bulk question and item creation; each
+# chunk is serialized once and that string is what gets signed and sent
+item_writer = BatchWriter(data_api, "itembank/items", "items", pre_encode=True)
+question_writer = BatchWriter(data_api, "itembank/questions", "questions", pre_encode=True)
+
+# Content-hash index of what has been written, so identical questions and
+# items reuse the existing reference instead of being written again
+content_index = ContentIndex(namespace=tenants.namespace)
+deduped_item_writer = DedupWriter(item_writer.write, content_index, "items")
+deduped_question_writer = DedupWriter(question_writer.write, content_index, "questions")
+
+
+def use_dedup(dedupe: bool) -> bool:
+    return dedupe and config.dedup_enabled
+
+
+def content_writer(writer: DedupWriter, dedupe: bool) -> Writer:
+    """``writer``, skipping known content if ``dedupe``; the plain writer while dedup is disabled"""
+    if not config.dedup_enabled:
+        return writer.write_fresh
+    # Writes with dedupe off still go through the index, so it never keeps a reference's old content
+    return partial(writer.write, dedupe=dedupe)
+
+# Local copy of the item bank for listing and lookups, synced in the background
+item_mirror = ItemBankMirror(data_api)
+
+# Label bundles, loaded from the bundled JSON files at startup
+label_bundles = LabelBundles()
+
+
+def preload() -> None:
+    """Load label bundles and precompile init templates
+
+    serve.py calls this once in the parent process so forked workers share
+    the result copy-on-write instead of each building their own.
+    """
+    label_bundles.load()
+    # Serialize the static parts of every init request once, up front
+    for locale in label_bundles.locales:
+        items_template(locale, label_bundles.version)
+    new_test_template()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not label_bundles.version:
+        preload()
+    label_bundles.start_refresh()
+    data_api.open()
+    # Only ?dedupe=false requests take from the pool while deduplication is on
+    test_pool.start()
+    await job_queue.start()
+    item_mirror.start_sync()
+    yield
+    await item_mirror.stop_sync()
+    await job_queue.stop()
+    await test_pool.stop()
+    await data_api.close()
+    content_index.close()
+    idempotency_store.close()
+    await label_bundles.stop_refresh()
+
+
+app = FastAPI(lifespan=lifespan)
+# Time request validation, the endpoint and response encoding separately for /metrics
+app.router.route_class = TimedRoute
+
+# Retries carrying the same Idempotency-Key get the first attempt's response
+# instead of repeating its writes. Inside CORS, so replays get CORS headers too.
+idempotency_store = IdempotencyStore()
+app.add_middleware(IdempotencyMiddleware, store=idempotency_store, namespace=tenants.namespace, routes=[
+    ("GET", "/api/tests/new"),
+    ("POST", "/api/tests/new"),
+    ("POST", "/api/items/add"),
+    ("POST", "/api/questions/add"),
+    ("POST", "/api/questions/add/bulk"),
+])
+app.add_middleware(TenantMiddleware, registry=tenant_registry)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,16 +137,90 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend honour the backoff in 503 responses
+    expose_headers=["Retry-After", "Idempotent-Replayed", "X-Profile-Id"],
 )
 
-# Set variables for the web server
-host = "localhost"
-port = 8000
+# Compress JSON responses; label bundles are served precompressed and pass through untouched
+app.add_middleware(GZipMiddleware, minimum_size=config.gzip_minimum_size)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(LogContextMiddleware)
+
+# Opt-in sampling profiler around whole requests (see profiling.py); a
+# pass-through unless profile_token or profile_sample_rate is configured
+profile_store = ProfileStore()
+app.add_middleware(ProfilingMiddleware, store=profile_store, sampler=Sampler())
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable(request: Request, exc: UpstreamUnavailable):
+    """The Data API circuit is open: tell the client when to try again"""
+    return JSONResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    """Admission control turned the request away: tell the client when to try again"""
+    return JSONResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+# Bounded concurrency for the endpoints that write to the Data API; the
+# others are never queued behind them
+tests_admission = AdmissionController("tests_new", config.tests_new_max_in_flight)
+writes_admission = AdmissionController("writes", config.writes_max_in_flight)
+
+
+@app.get("/api/admission")
+async def admission_stats():
+    """In-flight, queued and rejected counts per admission-controlled endpoint class"""
+    return {controller.name: controller.stats() for controller in (tests_admission, writes_admission)}
+
+
+@app.get("/api/tenants")
+async def tenant_stats():
+    """Configured tenants and each one's share of the Data API; no credentials"""
+    stats = data_api.stats()
+    return {
+        "fair_queue": stats["fair_queue"],
+        "tenants": {
+            tenant.id: {"weight": tenant.weight, "max_concurrency": tenant.max_concurrency,
+                        **stats["tenants"].get(tenant.id, {})}
+            for tenant in tenant_registry
+        },
+    }
+
+
+def require_profile_token(request: Request) -> None:
+    # Profiles show code paths and timings; with a token configured, only its holders may read them
+    if config.profile_token is not None and not authorized(config.profile_token,
+                                                           request.headers.get(config.profile_header)):
+        raise HTTPException(status_code=403, detail=f"Send {config.profile_header} to read profiles")
+
+
+@app.get("/api/profiles")
+async def list_profiles(request: Request, limit: int = Query(default=50, ge=1, le=500)):
+    """Recently saved request profiles, newest first"""
+    require_profile_token(request)
+    return {"profiles": await asyncio.to_thread(profile_store.list, limit)}
+
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str):
+    """A saved profile as collapsed stacks, ready for flamegraph.pl or speedscope"""
+    require_profile_token(request)
+    folded = await asyncio.to_thread(profile_store.folded, profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return Response(content=folded, media_type="text/plain")
 
-# Fetch Spanish labels from Learnosity i18n
-url = "https://raw.githubusercontent.com/Learnosity/learnosity-i18n/master/languages/es-ES/label_bundles/assess-api.json"
-response = requests.get(url)
-spanish_labels = response.json()
 
 # Pydantic models for request validation
 class QuestionData(BaseModel):
@@ -58,27 +248,65 @@ class ItemData(BaseModel):
 class AddItemRequest(BaseModel):
     items: List[ItemData]
 
-# Public & private security keys required to access Learnosity APIs
-security = {
-    "user_id": "abc", # what is this used for?
-    "consumer_key": config.consumer_key,
-    "domain": host,
-}
+class ScoringQuestion(BaseModel):
+    reference: str
+    type: str = "mcq"
+    data: Dict[str, Any]  # options and validation
+
+class ResponseSet(BaseModel):
+    id: str | None = None
+    responses: Dict[str, Any]  # question reference -> response value
 
+class ScoreRequest(BaseModel):
+    questions: List[ScoringQuestion] = []
+    question_references: List[str] = []  # Looked up in the item bank mirror
+    responses: List[ResponseSet] = Field(max_length=config.scoring_max_response_sets)
 
-@app.get("/api/items")
-async def items_assessment():
-    # Generate the user ID and session ID as UUIDs
-    user_id = Uuid.generate()
-    session_id = Uuid.generate()
+class QuestionTemplate(BaseModel):
+    type: str
+    data: QuestionData
+
+class TestSpec(BaseModel):
+    """Body of POST /api/tests/new"""
+    # Number of questions (one item each) in the test
+    count: int = Field(default=1, ge=1, le=config.test_spec_max_questions)
+    # Definitions for new questions, used in turn until count are made; the sample MCQ if empty
+    templates: List[QuestionTemplate] = []
+    # Existing item references to draw the test from instead of writing new ones
+    pool: List[str] = []
+    # Randomize item order, the pool draw and each new question's option order
+    shuffle: bool = False
+    # Makes the shuffling repeatable
+    seed: int | None = None
+
+    @model_validator(mode="after")
+    def check_source(self) -> "TestSpec":
+        if self.templates and self.pool:
+            raise ValueError("Give either templates or pool, not both")
+        if self.pool and self.count > len(set(self.pool)):
+            raise ValueError(f"count is {self.count} but the pool has {len(set(self.pool))} distinct items")
+        return self
+
+def items_security(tenant: Tenant) -> Dict[str, str]:
+    """Public security keys for signing a tenant's Items API requests"""
+    return {
+        "user_id": "abc", # what is this used for?
+        "consumer_key": tenant.consumer_key,
+        "domain": host,
+    }
+
+
+@lru_cache(maxsize=128)
+def items_template(locale: str | None, labels_version: int, tenant: Tenant = tenants.DEFAULT_TENANT) -> InitTemplate:
+    """Quickstart activity init request, compiled once per locale, label bundle version and tenant"""
     # template_id = "NY-activity"
     template_id = "react_sdk_primer_activity"
     activity_id = "quickstart_examples_activity_001"
 
-    # Items API configuration parameters
+    # Items API configuration parameters; user_id and session_id are filled in per request
     assessment_config = {
-        "user_id": user_id,
-        "session_id": session_id,
+        "user_id": None,
+        "session_id": None,
         "activity_template_id": template_id,
         "activity_id": activity_id,
         "rendering_type": "assess",
@@ -90,256 +318,661 @@ async def items_assessment():
                 "fontsize": "large",
             },
             "regions": "horizontal",
-            "labelBundle": spanish_labels,
         },
     }
-    
-    # Set up Learnosity initialization data
-    init_items = Init(
-        "items", security, config.consumer_secret,
-        request=assessment_config
+
+    # Fall back to Learnosity's built-in (English) labels if we don't have the locale
+    if locale is not None:
+        assessment_config["config"]["labelBundle"] = label_bundles.get(locale, "assess-api")
+
+    return InitTemplate(assessment_config, ("user_id", "session_id"), items_security(tenant), tenant.consumer_secret)
+
+
+@lru_cache(maxsize=32)
+def new_test_template(tenant: Tenant = tenants.DEFAULT_TENANT) -> InitTemplate:
+    """Dynamic test init request; everything but the ids and item list is compiled once per tenant"""
+    # Items API configuration parameters; the ids and items are filled in per request
+    assessment_config = {
+        "user_id": None,
+        "session_id": None,
+        "activity_id": None,
+        "rendering_type": "assess",
+        "type": "submit_practice",
+        "name": "Dynamic Test - Items API",
+        "state": "initial",
+        "items": None,
+        "config": {
+            "configuration": {
+                "fontsize": "large",
+            },
+            "regions": "horizontal",
+        },
+    }
+
+    return InitTemplate(
+        assessment_config, ("user_id", "session_id", "activity_id", "items"),
+        items_security(tenant), tenant.consumer_secret
     )
-    
-    generated_request = init_items.generate()
-    
-    # The Learnosity SDK returns a JSON string, so we need to parse it
-    if isinstance(generated_request, str):
-        generated_request = json.loads(generated_request)
-    
-    return generated_request
-
-
-@app.get("/api/tests/new")
-async def new_test():
-    try:
-        logger.info("Creating new test with fresh question and item")
 
-        # Generate unique references for this test
-        test_id = Uuid.generate()
-        question_reference = f"test_question_{test_id}"
-        item_reference = f"test_item_{test_id}"
 
-        logger.info(f"Generated question reference: {question_reference}")
-        logger.info(f"Generated item reference: {item_reference}")
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
 
-        # Create a sample question
-        sample_question = Question(
-            reference=question_reference,
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Request, stage and upstream metrics in the Prometheus text format"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/items")
+async def items_assessment(locale: str = config.default_label_locale,
+                           labels: Literal["ref", "inline"] = "ref"):
+    """Items API configuration for the quickstart activity
+
+    By default the label bundle is left out of the signed request: the
+    response carries a top-level ``labelBundle`` reference to its immutable,
+    hash-named URL, which the client fetches (and caches) and sets as
+    ``config.labelBundle`` before calling ``LearnosityItems.init``. Pass
+    ``labels=inline`` for a client that needs the bundle embedded instead.
+    """
+    # Generate the user ID and session ID as UUIDs and sign the precompiled request
+    user_id = Uuid.generate()
+    session_id = Uuid.generate()
+
+    if labels == "inline":
+        template = items_template(label_bundles.resolve_locale(locale), label_bundles.version, current_tenant.get())
+        envelope = None
+    else:
+        template = items_template(None, label_bundles.version, current_tenant.get())
+        asset = label_bundles.asset(locale, "assess-api")
+        envelope = {"labelBundle": asset.reference()} if asset is not None else None
+
+    with metrics.span("items_signing"):
+        body = template.render(envelope=envelope, user_id=user_id, session_id=session_id)
+    return json_response(body)
+
+
+@app.get("/api/labels/{locale}/{api}.{digest}.json")
+async def label_bundle(locale: str, api: str, digest: str, request: Request):
+    """Serve a label bundle from its content-addressed URL, precompressed when accepted"""
+    asset = label_bundles.assets.get((locale, api))
+    if asset is None or asset.digest != digest:
+        raise HTTPException(status_code=404, detail="Label bundle not found")
+
+    headers = {
+        # The URL changes whenever the content does, so it can be cached forever
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": f'"{asset.digest}"',
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    body, encoding = asset.negotiate(request.headers.get("accept-encoding", ""))
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def sample_test_question(question_reference: str) -> Question:
+    """The sample MCQ used for dynamically created tests"""
+    return Question(
+        reference=question_reference,
+        type="mcq",
+        data=QuestionData(
+            stimulus="What is the capital of Spain?",
             type="mcq",
-            data=QuestionData(
-                stimulus="What is the capital of Spain?",
-                type="mcq",
-                options=[
-                    {"label": "Barcelona", "value": "A"},
-                    {"label": "Madrid", "value": "B"},
-                    {"label": "Valencia", "value": "C"},
-                    {"label": "Seville", "value": "D"}
-                ],
-                validation={
-                    "scoring_type": "exactMatch",
-                    "valid_response": {
-                        "score": 1,
-                        "value": ["B"]
-                    }
+            options=[
+                {"label": "Barcelona", "value": "A"},
+                {"label": "Madrid", "value": "B"},
+                {"label": "Valencia", "value": "C"},
+                {"label": "Seville", "value": "D"}
+            ],
+            validation={
+                "scoring_type": "exactMatch",
+                "valid_response": {
+                    "score": 1,
+                    "value": ["B"]
                 }
-            )
+            }
         )
+    )
 
-        # Create the question using our existing function
-        question_request = AddQuestionRequest(questions=[sample_question])
 
-        logger.info("Creating question in Learnosity...")
-        question_result = await add_question(question_request, create_item=False)  # Don't auto-create item
+def sample_test_item(test_id: str, question_reference: str, item_reference: str) -> ItemData:
+    """The item wrapping a dynamically created test's question"""
+    return ItemData(
+        name=f"Test Item {test_id}",
+        reference=item_reference,
+        description=f"Auto-generated test item for question {question_reference}",
+        status="published",
+        questions=[question_reference]
+    )
 
-        if not question_result["success"]:
-            raise HTTPException(status_code=500, detail="Failed to create question")
 
-        # Create the item manually with our custom reference
-        item_data = ItemData(
-            name=f"Test Item {test_id}",
-            reference=item_reference,
-            description=f"Auto-generated test item for question {question_reference}",
-            status="published",
-            questions=[question_reference]
-        )
+def new_test_references() -> Dict[str, str]:
+    # Generate unique references for a test
+    test_id = Uuid.generate()
+    return {
+        "test_id": test_id,
+        "question_reference": f"test_question_{test_id}",
+        "item_reference": f"test_item_{test_id}",
+    }
+
+
+async def provision_tests(count: int) -> List[Dict[str, str]]:
+    """Create ``count`` test questions and items; return the tests that were fully created"""
+    tests = [new_test_references() for _ in range(count)]
+
+    question_request = AddQuestionRequest(
+        questions=[sample_test_question(test["question_reference"]) for test in tests]
+    )
+    question_results = (await add_question(question_request, create_item=False, dedupe=False))["results"]
+    # An item is only written, and pooled, for a test whose question was written
+    written = {result["reference"] for result in question_results if written_ok(result)}
+    tests = [test for test in tests if test["question_reference"] in written]
+    if not tests:
+        return []
+
+    item_results = await write_items([sample_test_item(**test) for test in tests], dedupe=False)
+    return [test for test, result in zip(tests, item_results) if written_ok(result)]
 
-        logger.info("Creating item in Learnosity...")
-        item_result = await create_learnosity_item(item_data)
-
-        if item_result["status_code"] != 200:
-            raise HTTPException(status_code=500, detail="Failed to create item")
-
-        logger.info(f"Successfully created question and item. Item reference: {item_reference}")
-
-        # Generate the user ID and session ID as UUIDs
-        user_id = Uuid.generate()
-        session_id = Uuid.generate()
-        # Activity ID must be <= 36 characters, so we'll use just the first 8 chars of test_id
-        activity_id = f"test_{str(test_id)[:8]}"
-
-        # Items API configuration parameters with our created item
-        assessment_config = {
-            "user_id": user_id,
-            "session_id": session_id,
-            "activity_id": activity_id,
-            "rendering_type": "assess",
-            "type": "submit_practice",
-            "name": "Dynamic Test - Items API",
-            "state": "initial",
-            "items": [
-                item_reference  # Include our created item reference
-            ],
-            "config": {
-                "configuration": {
-                    "fontsize": "large",
-                },
-                "regions": "horizontal",
-            },
-        }
 
-        logger.info(f"Assessment config prepared with item: {item_reference}")
+# Pre-provisioned tests for /api/tests/new, refilled in the background
+test_pool = WarmPool(provision_tests)
 
-        # Set up Learnosity initialization data
-        init_items = Init(
-            "items", security, config.consumer_secret,
-            request=assessment_config
+
+@app.get("/api/tests/pool")
+async def test_pool_stats():
+    """Size, hit rate and refill latency of the pre-provisioned test pool"""
+    return test_pool.stats()
+
+
+async def reuse_or_create_test() -> Dict[str, str]:
+    """The sample test's question and item, written the first time and reused by content after that"""
+    test = new_test_references()
+
+    [question_result] = await deduped_question_writer.write(
+        [build_question_payload(sample_test_question(test["question_reference"]))]
+    )
+    if not written_ok(question_result):
+        raise HTTPException(status_code=500, detail="Failed to create question")
+    question_reference = question_result.get("duplicate_of", test["question_reference"])
+
+    [item_result] = await write_item_payloads(
+        # Named after the question rather than the test, so every request writes the same item content
+        [build_item_payload(sample_test_item("sample", question_reference, test["item_reference"]))]
+    )
+    if not written_ok(item_result):
+        raise HTTPException(status_code=500, detail="Failed to create item")
+    item_reference = item_result.get("duplicate_of", test["item_reference"])
+
+    logger.info(f"Using test item {item_reference} (question {question_reference})")
+    return {**test, "question_reference": question_reference, "item_reference": item_reference}
+
+
+def render_test(test_id: str, item_references: List[str]) -> Response:
+    """Signed Items API init request for a test made of ``item_references``"""
+    # Activity ID must be <= 36 characters, so we'll use just the first 8 chars of test_id
+    activity_id = f"test_{str(test_id)[:8]}"
+
+    # Generate the user ID and session ID as UUIDs and sign the precompiled request
+    with metrics.span("items_signing"):
+        generated_request = new_test_template(current_tenant.get()).render(
+            user_id=Uuid.generate(),
+            session_id=Uuid.generate(),
+            activity_id=activity_id,
+            items=item_references,
         )
 
-        generated_request = init_items.generate()
+    logger.info("Successfully generated Learnosity initialization data")
 
-        # The Learnosity SDK returns a JSON string, so we need to parse it
-        if isinstance(generated_request, str):
-            generated_request = json.loads(generated_request)
+    return json_response(generated_request)
 
-        logger.info("Successfully generated Learnosity initialization data")
 
-        return generated_request
+@app.get("/api/tests/new", dependencies=[tests_admission.dependency()])
+async def new_test(dedupe: bool = True):
+    try:
+        # Reuse the existing sample question/item, or take a pre-provisioned one from the warm pool
+        if use_dedup(dedupe):
+            test = await reuse_or_create_test()
+        else:
+            # The warm pool is provisioned in the default tenant's item bank
+            test = test_pool.take() if current_tenant.get() == tenant_registry.default else None
+
+        if test is not None:
+            logger.info(f"Using pre-provisioned test item: {test['item_reference']}")
+        else:
+            logger.info("Creating new test with fresh question and item")
+
+            test = new_test_references()
+
+            logger.info(f"Generated question reference: {test['question_reference']}")
+            logger.info(f"Generated item reference: {test['item_reference']}")
+
+            # Create the question using our existing function
+            question_request = AddQuestionRequest(questions=[sample_test_question(test["question_reference"])])
 
+            logger.info("Creating question in Learnosity...")
+            question_result = await add_question(question_request, create_item=False, dedupe=False)  # Don't auto-create item
+
+            if not question_result["success"]:
+                raise HTTPException(status_code=500, detail="Failed to create question")
+
+            # Create the item manually with our custom reference
+            logger.info("Creating item in Learnosity...")
+            item_result = await create_learnosity_item(sample_test_item(**test))
+
+            if item_result["status_code"] != 200:
+                raise HTTPException(status_code=500, detail="Failed to create item")
+
+            logger.info(f"Successfully created question and item. Item reference: {test['item_reference']}")
+
+        logger.info(f"Assessment config prepared with item: {test['item_reference']}")
+        return render_test(test["test_id"], [test["item_reference"]])
+
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Failed to create new test: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create new test: {str(e)}")
 
 
-@app.get("/api/items/get/{item_reference}")
-async def get_item(item_reference: str):
-    """Get an item from Learnosity Item Bank to verify it exists"""
+def assemble_test(spec: TestSpec, test_id: str) -> Tuple[List[Question], List[ItemData], List[str]]:
+    """Questions and items to write for ``spec``, and the test's item references in delivery order"""
+    rng = random.Random(spec.seed)
+    if spec.pool:
+        pool = list(dict.fromkeys(spec.pool))
+        references = rng.sample(pool, spec.count) if spec.shuffle else pool[:spec.count]
+        return [], [], references
+
+    templates = spec.templates or [
+        QuestionTemplate(type=question.type, data=question.data) for question in [sample_test_question("")]
+    ]
+    questions, items = [], []
+    for n in range(spec.count):
+        template = templates[n % len(templates)]
+        data = template.data
+        if spec.shuffle:
+            # Validation refers to option values, not positions, so reordering keeps it correct
+            data = data.model_copy(update={"options": rng.sample(data.options, len(data.options))})
+        question = Question(reference=f"test_question_{test_id}_{n}", type=template.type, data=data)
+        questions.append(question)
+        items.append(sample_test_item(f"{test_id} #{n + 1}", question.reference, f"test_item_{test_id}_{n}"))
+    if spec.shuffle:
+        rng.shuffle(items)
+    return questions, items, [item.reference for item in items]
+
+
+@app.post("/api/tests/new", dependencies=[tests_admission.dependency()])
+async def new_test_from_spec(spec: TestSpec):
+    """Build a test of ``spec.count`` questions and return one signed init request listing every item
+
+    New questions are written in concurrent chunks, then their items the
+    same way, so the Data API sees two rounds of writes however long the
+    test is. Generated questions share their template's content, so they
+    are never deduplicated: the test always gets ``spec.count`` items.
+    """
     try:
-        logger.info(f"Retrieving item: {item_reference}")
+        test_id = Uuid.generate()
+        questions, items, references = assemble_test(spec, test_id)
+        logger.info(f"Assembling test {test_id}: {len(references)} item(s), {len(questions)} new question(s)")
 
-        # Data API endpoint for getting items
-        endpoint = "https://data.learnosity.com/latest/itembank/items"
+        if questions:
+            question_results = await question_writer.write([build_question_payload(q) for q in questions])
+            if not all(written_ok(result) for result in question_results):
+                raise HTTPException(status_code=500, detail="Failed to create questions")
 
-        # Create security configuration for Data API
-        data_api_security = {
-            "consumer_key": config.consumer_key,
-            "domain": host
-        }
+            item_results = await write_items(items, dedupe=False)
+            if not all(written_ok(result) for result in item_results):
+                raise HTTPException(status_code=500, detail="Failed to create items")
 
-        # Prepare the request data for getting a specific item
-        data_request = {
-            "items": [item_reference]
-        }
+        return render_test(test_id, references)
+
+    except HTTPException:
+        raise
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to assemble test: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to assemble test: {str(e)}")
 
-        logger.info(f"Get item request data: {json.dumps(data_request, indent=2)}")
 
-        # Create Data API client and make the request
-        client = DataApi()
-        response = client.request(
-            endpoint,
-            data_api_security,
-            config.consumer_secret,
-            data_request,
-            "get"  # Use "get" action instead of "set"
-        )
+async def fetch_items(references: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch items from the Learnosity Item Bank in one get, bypassing the cache
 
-        logger.info(f"Get item response status: {response.status_code}")
+    Returns a result per reference, shaped as if it had been fetched on its
+    own: the response with only that item in ``data``.
+    """
+    logger.info("Retrieving %d items: %s", len(references), Payload(references))
 
-        # Parse the response properly
-        if hasattr(response, 'json'):
-            try:
-                response_data = response.json()
-            except:
-                response_data = response.text if hasattr(response, 'text') else str(response)
-        else:
-            response_data = str(response)
+    data_request = {
+        "items": references,
+        "limit": len(references)
+    }
+
+    response = await data_api.request(
+        "itembank/items",
+        data_request,
+        "get"
+    )
+
+    logger.info(f"Get items response status: {response.status_code}")
 
-        logger.info(f"Get item response data: {json.dumps(response_data, indent=2) if isinstance(response_data, dict) else response_data}")
+    response_data = parse_response(response)
 
+    if response.status_code != 200 or not isinstance(response_data, dict) or not isinstance(response_data.get("data"), list):
+        logger.info("Get items response data: %s", Payload(response_data))
+        # Nothing to split: every reference gets the same failure
         return {
-            "item_reference": item_reference,
+            reference: {"item_reference": reference, "status_code": response.status_code, "data": response_data}
+            for reference in references
+        }
+
+    found = {record.get("reference"): record for record in response_data["data"] if isinstance(record, dict)}
+    results = {}
+    for reference in references:
+        records = [found[reference]] if reference in found else []
+        results[reference] = {
+            "item_reference": reference,
             "status_code": response.status_code,
-            "data": response_data
+            "data": {**response_data, "meta": {**(response_data.get("meta") or {}), "records": len(records)},
+                     "data": records},
         }
+    return results
+
+
+async def fetch_tenant_items(keys: List[Tuple[Tenant, str]]) -> Dict[Tuple[Tenant, str], Dict[str, Any]]:
+    """``fetch_items`` for (tenant, reference) keys: one get per tenant in the batch, on that tenant's behalf"""
+    by_tenant: Dict[Tenant, List[str]] = {}
+    for tenant, reference in keys:
+        by_tenant.setdefault(tenant, []).append(reference)
+
+    async def fetch_for(tenant: Tenant, references: List[str]) -> Dict[Tuple[Tenant, str], Dict[str, Any]]:
+        with use_tenant(tenant):
+            results = await fetch_items(references)
+        return {(tenant, reference): result for reference, result in results.items()}
+
+    fetched = await asyncio.gather(*(fetch_for(tenant, refs) for tenant, refs in by_tenant.items()))
+    return {key: result for results in fetched for key, result in results.items()}
+
+
+# Item reads coalesced into batched gets
+item_loader = BatchLoader(fetch_tenant_items)
+
+# Successful item reads, shared by concurrent and repeated lookups
+item_cache = ItemCache(cacheable=lambda result: result["status_code"] == 200)
+
+
+@app.get("/api/items/cache")
+async def item_cache_stats():
+    """Hit, miss and eviction counters for the item read cache, and how reads were batched"""
+    return {**item_cache.stats(), "batching": item_loader.stats()}
+
+
+async def load_item(item_reference: str) -> Dict[str, Any]:
+    """Read one item through the cache and the batching loader"""
+    async def load() -> Dict[str, Any]:
+        # A deduplicated item reference reads the item it was deduplicated to
+        reference = item_reference
+        if config.dedup_enabled:
+            reference = await asyncio.to_thread(content_index.resolve, "items", item_reference)
+        return await item_loader.load((current_tenant.get(), reference))
+
+    return await item_cache.get(tenants.namespace() + item_reference, load)
 
+
+@app.get("/api/items/get")
+async def get_items(reference: List[str] = Query(min_length=1, max_length=config.item_multi_get_max)):
+    """Get several items by reference (?reference=a&reference=b); results are in request order"""
+    try:
+        return {"items": await asyncio.gather(*(load_item(item_reference) for item_reference in reference))}
+
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get items {reference}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get items: {str(e)}")
+
+
+@app.get("/api/items/get/{item_reference}")
+async def get_item(item_reference: str):
+    """Get an item from Learnosity Item Bank to verify it exists"""
+    try:
+        return await load_item(item_reference)
+
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Failed to get item {item_reference}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get item: {str(e)}")
 
 
+def require_default_tenant() -> None:
+    # The mirror is a copy of the default tenant's item bank; other tenants must not read or sync into it
+    if current_tenant.get() != tenant_registry.default:
+        raise HTTPException(status_code=404, detail="The item bank mirror serves the default tenant only")
 
 
-async def create_learnosity_item(item_data: ItemData):
-    """Create an item in Learnosity Item Bank"""
+@app.get("/api/mirror/status", dependencies=[Depends(require_default_tenant)])
+async def mirror_status():
+    """Record counts and last sync of the local item bank mirror"""
+    return await asyncio.to_thread(item_mirror.stats)
+
+
+@app.post("/api/mirror/sync", dependencies=[Depends(require_default_tenant)])
+async def mirror_sync():
+    """Fetch everything updated since the last sync into the mirror now"""
     try:
-        logger.info(f"Creating item with reference: {item_data.reference}")
+        return {"fetched": await item_mirror.sync()}
 
-        # Data API endpoint for setting items
-        endpoint = "https://data.learnosity.com/latest/itembank/items"
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Mirror sync failed: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Mirror sync failed: {str(e)}")
+
+
+@app.get("/api/mirror/items", dependencies=[Depends(require_default_tenant)])
+async def mirror_items(status: str | None = None,
+                       tag: List[str] = Query(default=[], description="Tag as type:name; repeat to require several"),
+                       reference_prefix: str | None = None,
+                       limit: int = Query(default=50, ge=1, le=500),
+                       after: str | None = Query(default=None, description="Reference to continue after")):
+    """List mirrored items matching every given filter, in reference order"""
+    tags = []
+    for value in tag:
+        tag_type, separator, name = value.partition(":")
+        if not separator:
+            raise HTTPException(status_code=422, detail=f"Tag {value!r} is not type:name")
+        tags.append((tag_type, name))
+
+    items = await asyncio.to_thread(item_mirror.list_items, status, tags, reference_prefix, limit, after)
+    return {"items": items, "next": items[-1]["reference"] if len(items) == limit else None}
+
+
+@app.get("/api/mirror/items/{reference}", dependencies=[Depends(require_default_tenant)])
+async def mirror_item(reference: str):
+    item = await asyncio.to_thread(item_mirror.get, "items", reference)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Item {reference} is not in the mirror")
+    return item
+
+
+@app.get("/api/mirror/questions/{reference}", dependencies=[Depends(require_default_tenant)])
+async def mirror_question(reference: str):
+    question = await asyncio.to_thread(item_mirror.get, "questions", reference)
+    if question is None:
+        raise HTTPException(status_code=404, detail=f"Question {reference} is not in the mirror")
+    return question
+
+
+def score_response_sets(questions: List[Dict[str, Any]], response_sets: List[ResponseSet]) -> Dict[str, Any]:
+    table = ScoringTable(questions)
+    scores = table.score([response_set.responses for response_set in response_sets])
+    totals = scores.sum(axis=1).tolist()
+    max_score = float(table.max_scores.sum())
+    return {
+        "results": [
+            {"id": response_set.id, "score": total, "max_score": max_score,
+             "questions": dict(zip(table.references, row))}
+            for response_set, total, row in zip(response_sets, totals, scores.tolist())
+        ],
+        "questions": table.summarize(scores),
+    }
 
-        # Create security configuration for Data API
-        data_api_security = {
-            "consumer_key": config.consumer_key,
-            "domain": host
-        }
 
-        # Prepare the request data
-        item_payload = {
-            "reference": item_data.reference,
-            "name": item_data.name,
-            "description": item_data.description,
-            "status": item_data.status,
-            "questions": item_data.questions
+@app.post("/api/scoring/score")
+async def score_responses(request: ScoreRequest):
+    """Score a batch of MCQ response sets locally against the questions' exactMatch validation"""
+    questions = [question.model_dump() for question in request.questions]
+    if request.question_references:
+        require_default_tenant()
+        mirrored = await asyncio.to_thread(
+            lambda: [(reference, item_mirror.get("questions", reference)) for reference in request.question_references]
+        )
+        missing = [reference for reference, question in mirrored if question is None]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Questions not in the mirror: {missing}")
+        questions += [question for _, question in mirrored]
+    if not questions:
+        raise HTTPException(status_code=422, detail="Give questions or question_references to score against")
+
+    logger.info(f"Scoring {len(request.responses)} response sets against {len(questions)} questions")
+    try:
+        return await asyncio.to_thread(score_response_sets, questions, request.responses)
+    except UnsupportedQuestion as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def build_item_payload(item_data: ItemData) -> Dict[str, Any]:
+    """Convert an ItemData model to the item format expected by the Data API"""
+    item_payload = {
+        "reference": item_data.reference,
+        "name": item_data.name,
+        "description": item_data.description,
+        "status": item_data.status,
+        "questions": item_data.questions
+    }
+
+    # Add definition if provided, or create a basic one
+    if item_data.definition:
+        item_payload["definition"] = item_data.definition
+    else:
+        # Create a basic definition with widgets (which reference the questions)
+        item_payload["definition"] = {
+            "template": "dynamic",
+            "instant_feedback": True,
+            "widgets": [{"reference": q, "widget_type": "response"} for q in item_data.questions]
         }
 
-        # Add definition if provided, or create a basic one
-        if item_data.definition:
-            item_payload["definition"] = item_data.definition
-        else:
-            # Create a basic definition with widgets (which reference the questions)
-            item_payload["definition"] = {
-                "template": "dynamic",
-                "instant_feedback": True,
-                "widgets": [{"reference": q, "widget_type": "response"} for q in item_data.questions]
-            }
+    return item_payload
+
+
+async def write_item_payloads(payloads: List[Dict[str, Any]],
+                              on_chunk: Callable[[int], None] | None = None,
+                              dedupe: bool = True) -> List[Dict[str, Any]]:
+    """Write item payloads in concurrent chunks, dropping any cached copies of them"""
+    results = await content_writer(deduped_item_writer, dedupe)(payloads, on_chunk)
+    for payload in payloads:
+        item_cache.invalidate(tenants.namespace() + payload["reference"])
+    return results
+
+
+async def write_items(items: List[ItemData],
+                      on_chunk: Callable[[int], None] | None = None,
+                      dedupe: bool = True) -> List[Dict[str, Any]]:
+    """Write items in concurrent chunks, dropping any cached copies of them"""
+    return await write_item_payloads([build_item_payload(item) for item in items], on_chunk, dedupe)
+
+
+def build_question_payload(question: Question) -> Dict[str, Any]:
+    """Convert a Question model to the question format expected by the Data API"""
+    return {
+        "reference": question.reference,
+        "type": question.type,
+        "data": question.data.model_dump()
+    }
+
+
+def parse_import_record(record: Any) -> Tuple[str, Dict[str, Any]]:
+    """Validate one NDJSON import record as a Question or an ItemData"""
+    if not isinstance(record, dict):
+        raise ValueError("Each line must be a JSON object")
+    # Questions carry their definition in "data"; items list question references
+    if "data" in record:
+        return "question", build_question_payload(Question.model_validate(record))
+    if "questions" in record:
+        return "item", build_item_payload(ItemData.model_validate(record))
+    raise ValueError('Record is neither a question (has "data") nor an item (has "questions")')
+
+
+@app.post(
+    "/api/import",
+    response_class=NDJSONStreamingResponse,
+    # Held until the stream ends, since that is when the records are written
+    dependencies=[writes_admission.dependency()],
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+    }},
+)
+async def import_records(request: Request, dedupe: bool = True):
+    """Stream questions and items into the Item Bank
+
+    The body is NDJSON, one Question or ItemData per line. Records are
+    validated as they arrive and written in chunks; one result line per
+    record is streamed back as each chunk completes, then a summary line.
+    """
+    logger.info("Starting streaming import")
+    return NDJSONStreamingResponse(stream_import(
+        request.stream(),
+        parse_import_record,
+        {
+            "question": content_writer(deduped_question_writer, dedupe),
+            "item": lambda payloads: write_item_payloads(payloads, dedupe=dedupe),
+        },
+        order=("question", "item"),
+    ))
+
+
+@app.get("/api/export", response_class=NDJSONStreamingResponse)
+async def export_item_bank(after: str | None = Query(default=None, description="Checkpoint token to resume from"),
+                           checkpoints: bool = False):
+    """Stream the item bank as NDJSON: each page's questions, then its items
+
+    Pages are written out as they arrive from the Data API; send
+    ``Accept-Encoding: gzip`` for a compressed stream. With ``checkpoints``
+    a ``{"checkpoint": token}`` line follows each page; pass the last one as
+    ``after`` to continue an interrupted export. A failure ends the stream
+    with an ``{"error", "resume_from"}`` line.
+    """
+    logger.info(f"Starting item bank export after {after}")
+    return NDJSONStreamingResponse(stream_export(data_api, after, checkpoints,
+                                                 config.export_page_size, config.export_prefetch))
+
+
+async def create_learnosity_item(item_data: ItemData):
+    """Create an item in Learnosity Item Bank"""
+    try:
+        logger.info(f"Creating item with reference: {item_data.reference}")
 
+        # Prepare the request data
         data_request = {
-            "items": [item_payload]
+            "items": [build_item_payload(item_data)]
         }
 
-        logger.info(f"Item creation request data: {json.dumps(data_request, indent=2)}")
+        logger.info("Item creation request data: %s", Payload(data_request))
 
-        # Create Data API client and make the request
-        client = DataApi()
-        response = client.request(
-            endpoint,
-            data_api_security,
-            config.consumer_secret,
-            data_request,
-            "set"
-        )
+        response = await data_api.request("itembank/items", data_request, "set")
+        item_cache.invalidate(tenants.namespace() + item_data.reference)
 
         logger.info(f"Item creation response status: {response.status_code}")
 
-        # Parse the response properly
-        if hasattr(response, 'json'):
-            try:
-                response_data = response.json()
-            except:
-                response_data = response.text if hasattr(response, 'text') else str(response)
-        else:
-            response_data = str(response)
+        response_data = parse_response(response)
 
-        logger.info(f"Item creation response data: {response_data}")
+        logger.info("Item creation response data: %s", Payload(response_data))
 
         return {
             "status_code": response.status_code,
@@ -351,128 +984,189 @@ async def create_learnosity_item(item_data: ItemData):
         raise e
 
 
-@app.post("/api/items/add")
-async def add_item(request: AddItemRequest):
-    """Add items to Learnosity Item Bank"""
-    try:
-        logger.info(f"Adding {len(request.items)} item(s)")
+def progress_counter(total: int, progress: Progress | None) -> Callable[[int], None] | None:
+    """Turn per-chunk record counts into running (done, total) progress reports"""
+    if progress is None:
+        return None
+    done = 0
 
-        results = []
-        for item in request.items:
-            response = await create_learnosity_item(item)
-            results.append(response)
+    def on_chunk(count: int) -> None:
+        nonlocal done
+        done += count
+        progress(done, total)
 
-        return {
-            "success": True,
-            "message": f"Successfully processed {len(request.items)} item(s)",
-            "results": results
-        }
+    progress(0, total)
+    return on_chunk
 
-    except Exception as e:
-        logger.error(f"Failed to add items: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to add items: {str(e)}")
 
+async def add_items(request: AddItemRequest, progress: Progress | None = None,
+                    dedupe: bool = True) -> Dict[str, Any]:
+    logger.info(f"Adding {len(request.items)} item(s)")
 
-@app.post("/api/questions/add")
-async def add_question(request: AddQuestionRequest, create_item: bool = True):
-    """Add questions to Learnosity Item Bank and optionally create items"""
-    try:
-        logger.info(f"Adding {len(request.questions)} question(s)")
+    # Items are written in concurrent chunks; each result maps back to one item
+    results = await write_items(request.items, progress_counter(len(request.items), progress), dedupe)
 
-        # Data API endpoint for setting questions
-        endpoint = "https://data.learnosity.com/latest/itembank/questions"
+    return {
+        "success": all(written_ok(result) for result in results),
+        "message": f"Successfully processed {len(request.items)} item(s)",
+        "results": results
+    }
 
-        # Create security configuration for Data API
-        data_api_security = {
-            "consumer_key": config.consumer_key,
-            "domain": host
-        }
 
-        # Prepare the request data
-        data_request = {
-            "questions": []
-        }
+async def add_questions(request: AddQuestionRequest, create_item: bool = True,
+                        progress: Progress | None = None, dedupe: bool = True) -> Dict[str, Any]:
+    logger.info(f"Adding {len(request.questions)} question(s)")
+    on_chunk = progress_counter(len(request.questions) * (2 if create_item else 1), progress)
+
+    # Convert Pydantic models to dictionary format expected by Learnosity
+    payloads = [build_question_payload(question) for question in request.questions]
+    # Written in concurrent chunks, like items; questions already in the item bank are skipped and
+    # answered with their existing reference. Failed chunks come back as {"error", "reference"}
+    results = await content_writer(deduped_question_writer, dedupe)(payloads, on_chunk)
+
+    result = {
+        "success": all(written_ok(r) for r in results),
+        "message": f"Successfully added {len(request.questions)} question(s)",
+        # The Data API's answer for the first question written (None if every question was a duplicate)
+        "question_response": next((r["data"] for r in results if r.get("data") is not None), None),
+        "results": results
+    }
+    duplicates = {r["reference"]: r["duplicate_of"] for r in results if "duplicate_of" in r}
+    if duplicates:
+        result["duplicates"] = duplicates
+
+    # If create_item is True, also create items that reference these questions
+    if create_item:
+        logger.info("Creating items for the added questions")
 
-        # Convert Pydantic models to dictionary format expected by Learnosity
-        question_references = []
+        items_to_create = []
         for question in request.questions:
-            question_data = {
-                "reference": question.reference,
-                "type": question.type,
-                "data": question.data.model_dump()
-            }
-            data_request["questions"].append(question_data)
-            question_references.append(question.reference)
-
-        logger.info(f"Question creation request data: {json.dumps(data_request, indent=2)}")
-
-        # Create Data API client and make the request
-        client = DataApi()
-        response = client.request(
-            endpoint,
-            data_api_security,
-            config.consumer_secret,
-            data_request,
-            "set"
-        )
+            # A skipped duplicate's item is the existing question's item under a new reference
+            source = duplicates.get(question.reference, question.reference)
+            item_data = ItemData(
+                name=f"Item for {source}",
+                reference=f"item_{question.reference}",
+                description=f"Auto-generated item for question {source}",
+                status="published",
+                questions=[source]
+            )
+            items_to_create.append(item_data)
 
-        logger.info(f"Question creation response status: {response.status_code}")
+        # Create items in concurrent chunks; failed chunks come back as {"error", "reference"}
+        item_results = await write_items(items_to_create, on_chunk, dedupe)
 
-        # Convert response to JSON if it's not already
-        if hasattr(response, 'json'):
-            try:
-                response_data = response.json()
-            except:
-                response_data = response.text if hasattr(response, 'text') else str(response)
-        elif hasattr(response, 'text'):
-            response_data = response.text
-        else:
-            response_data = str(response)
+        result["success"] = result["success"] and all(written_ok(r) for r in item_results)
+        result["item_results"] = item_results
+        result["message"] += f" and {len(items_to_create)} item(s)"
 
-        logger.info(f"Question creation response data: {response_data}")
+    return result
 
-        result = {
-            "success": True,
-            "message": f"Successfully added {len(request.questions)} question(s)",
-            "question_response": response_data
-        }
 
-        # If create_item is True, also create items that reference these questions
-        if create_item:
-            logger.info("Creating items for the added questions")
-
-            items_to_create = []
-            for question in request.questions:
-                item_data = ItemData(
-                    name=f"Item for {question.reference}",
-                    reference=f"item_{question.reference}",
-                    description=f"Auto-generated item for question {question.reference}",
-                    status="published",
-                    questions=[question.reference]
-                )
-                items_to_create.append(item_data)
-
-            # Create items
-            item_results = []
-            for item in items_to_create:
-                try:
-                    item_response = await create_learnosity_item(item)
-                    item_results.append(item_response)
-                    logger.info(f"Successfully created item {item.reference}")
-                except Exception as item_error:
-                    logger.error(f"Failed to create item {item.reference}: {str(item_error)}")
-                    item_results.append({"error": str(item_error), "reference": item.reference})
-
-            result["item_results"] = item_results
-            result["message"] += f" and {len(items_to_create)} item(s)"
-
-        return result
+async def run_items_job(payload: Dict[str, Any], progress: Progress) -> Dict[str, Any]:
+    with use_tenant(tenant_registry.get(payload.get("tenant"))):
+        return await add_items(AddItemRequest(**payload["request"]), progress, payload.get("dedupe", True))
 
+
+async def run_questions_job(payload: Dict[str, Any], progress: Progress) -> Dict[str, Any]:
+    with use_tenant(tenant_registry.get(payload.get("tenant"))):
+        return await add_questions(AddQuestionRequest(**payload["request"]), payload["create_item"], progress,
+                                   payload.get("dedupe", True))
+
+
+# Background writes: persisted in SQLite and resumed after a restart
+job_queue = JobQueue({"items_add": run_items_job, "questions_add": run_questions_job})
+
+
+async def enqueue(kind: str, payload: Dict[str, Any]) -> JSONResponse:
+    # Jobs run outside the request, so they carry the tenant with them
+    job_id = await job_queue.submit(kind, {**payload, "tenant": current_tenant.get().id})
+    logger.info(f"Queued {kind} job {job_id}")
+    return JSONResponse(
+        {"job_id": job_id, "status": "queued", "status_url": f"/api/jobs/{job_id}"},
+        status_code=202,
+    )
+
+
+@app.post("/api/items/add", dependencies=[writes_admission.dependency()])
+async def add_item(request: AddItemRequest, background: bool = False, dedupe: bool = True):
+    """Add items to Learnosity Item Bank, or queue them as a background job"""
+    if background:
+        return await enqueue("items_add", {"request": request.model_dump(), "dedupe": dedupe})
+    try:
+        return await add_items(request, dedupe=dedupe)
+
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to add items: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to add items: {str(e)}")
+
+
+@app.post("/api/questions/add", dependencies=[writes_admission.dependency()])
+async def add_question(request: AddQuestionRequest, create_item: bool = True, background: bool = False,
+                       dedupe: bool = True):
+    """Add questions to Learnosity Item Bank and optionally create items"""
+    if background:
+        return await enqueue("questions_add", {
+            "request": request.model_dump(), "create_item": create_item, "dedupe": dedupe,
+        })
+    try:
+        return await add_questions(request, create_item, dedupe=dedupe)
+
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Failed to add questions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to add question: {str(e)}")
 
 
+@app.post(
+    "/api/questions/add/bulk",
+    dependencies=[writes_admission.dependency()],
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": AddQuestionRequest.model_json_schema()}},
+    }},
+)
+async def add_questions_bulk(request: Request, create_item: bool = True, dedupe: bool = True):
+    """Add many questions (and optionally their items) with one validation pass over the raw body
+
+    Takes the same body as /api/questions/add; returns one result per
+    question in ``results`` (and per item in ``item_results``).
+    """
+    try:
+        questions = parse_questions(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False,
+                                                             include_input=False))
+    logger.info(f"Adding {len(questions)} question(s) in bulk")
+
+    results = await content_writer(deduped_question_writer, dedupe)(questions)
+    result = {
+        "success": all(written_ok(r) for r in results),
+        "message": f"Successfully processed {len(questions)} question(s)",
+        "results": results
+    }
+
+    if create_item:
+        duplicates = {r["reference"]: r["duplicate_of"] for r in results if "duplicate_of" in r}
+        item_results = await write_item_payloads(item_payloads(questions, duplicates), dedupe=dedupe)
+        result["success"] = result["success"] and all(written_ok(r) for r in item_results)
+        result["item_results"] = item_results
+        result["message"] += f" and {len(item_results)} item(s)"
+
+    return result
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, progress and (once finished) the result of a background write"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
 
 def main():
     import uvicorn
@@ -0,0 +1,251 @@
+"""Request and stage latency metrics in the Prometheus text format.
+
+``MetricsMiddleware`` counts and times every HTTP request, ``TimedRoute``
+splits each route's time into request validation, the endpoint itself and
+response encoding, and ``span`` times any other stage (signing, upstream
+calls). Recording is a dict lookup and a few additions, so it is cheap
+enough to leave on in production; ``render`` produces the ``/metrics`` body.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Tuple
+import inspect
+
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: [count in each bucket (non-cumulative) + overflow, sum]
+        self.values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total[0]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+requests_total = Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+request_errors_total = Counter(
+    "http_request_errors_total", "HTTP requests that failed with a 5xx or an exception", ("method", "route"))
+request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled")
+stage_duration = Histogram(
+    "stage_duration_seconds", "Time spent in each stage of request handling", ("stage", "route"))
+upstream_duration = Histogram(
+    "upstream_request_duration_seconds", "Data API call latency", ("endpoint", "action"))
+upstream_responses_total = Counter(
+    "upstream_responses_total", "Data API responses by status code", ("endpoint", "action", "status"))
+
+upstream_retries_total = Counter(
+    "upstream_retries_total", "Data API calls retried after a 429, 5xx or transport error", ("endpoint", "action"))
+upstream_rejected_total = Counter(
+    "upstream_rejected_total", "Data API calls failed fast while the circuit was open", ("endpoint", "action"))
+upstream_concurrency_limit = Gauge(
+    "upstream_concurrency_limit", "Current adaptive limit on concurrent Data API calls", ("tenant",))
+upstream_circuit_open = Gauge(
+    "upstream_circuit_open", "1 while the Data API circuit breaker is open", ("tenant",))
+batch_size = Histogram(
+    "upstream_batch_size", "Lookups coalesced into one batched Data API get", ("loader",),
+    buckets=(1, 2, 5, 10, 20, 50, 100))
+admission_in_flight = Gauge(
+    "admission_in_flight", "Requests holding an admission slot", ("endpoint_class",))
+admission_queued = Gauge(
+    "admission_queued", "Requests waiting for an admission slot", ("endpoint_class",))
+admission_rejected_total = Counter(
+    "admission_rejected_total", "Requests turned away with a 503 by admission control", ("endpoint_class", "reason"))
+admission_wait = Histogram(
+    "admission_wait_seconds", "Time queued requests waited for an admission slot", ("endpoint_class",))
+idempotency_requests_total = Counter(
+    "idempotency_requests_total", "Requests carrying an Idempotency-Key, by outcome", ("route", "outcome"))
+log_records_dropped_total = Counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full")
+
+registry = [
+    requests_total, request_errors_total, request_duration, requests_in_flight,
+    stage_duration, upstream_duration, upstream_responses_total,
+    upstream_retries_total, upstream_rejected_total, upstream_concurrency_limit, upstream_circuit_open,
+    batch_size, admission_in_flight, admission_queued, admission_rejected_total, admission_wait,
+    idempotency_requests_total, log_records_dropped_total,
+]
+
+# Route template of the request being handled, used to label stage spans
+current_route: ContextVar[str] = ContextVar("current_route", default="")
+
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a stage of the current request into ``stage_duration_seconds``"""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(perf_counter() - started, stage, current_route.get())
+
+
+def _route_of(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """Counts, times and tracks in-flight HTTP requests"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = perf_counter()
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            requests_in_flight.dec()
+            method, route = scope["method"], _route_of(scope)
+            request_duration.observe(perf_counter() - started, method, route)
+            requests_total.inc(method, route, str(status))
+            if status >= 500:
+                request_errors_total.inc(method, route)
+
+
+# Timestamps taken when the endpoint function starts and returns
+_endpoint_marks: ContextVar[List[float] | None] = ContextVar("endpoint_marks", default=None)
+
+
+def _mark_endpoint(endpoint: Callable) -> Callable:
+    if not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @wraps(endpoint)
+    async def timed_endpoint(*args, **kwargs):
+        marks = _endpoint_marks.get()
+        if marks is not None:
+            marks.append(perf_counter())
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if marks is not None:
+                marks.append(perf_counter())
+
+    return timed_endpoint
+
+
+class TimedRoute(APIRoute):
+    """Route that records validation, endpoint and encoding time separately
+
+    Everything before the endpoint function runs (reading the body, Pydantic
+    validation, dependencies) is recorded as ``validation``; everything after
+    it returns (response model validation, JSON encoding) as ``encoding``.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _mark_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def timed_handler(request):
+            marks: List[float] = []
+            marks_token = _endpoint_marks.set(marks)
+            route_token = current_route.set(route)
+            started = perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                finished = perf_counter()
+                _endpoint_marks.reset(marks_token)
+                current_route.reset(route_token)
+                if len(marks) == 2:
+                    stage_duration.observe(marks[0] - started, "validation", route)
+                    stage_duration.observe(marks[1] - marks[0], "endpoint", route)
+                    stage_duration.observe(finished - marks[1], "encoding", route)
+
+        return timed_handler
@@ -0,0 +1,231 @@
+"""Local SQLite mirror of the item bank.
+
+``ItemBankMirror.sync`` pages through Data API ``get`` results for items and
+questions, oldest update first, following each page's ``next`` token, and
+upserts every record into SQLite. It remembers the newest ``dt_updated`` it
+has stored per kind, so the next sync asks only for records updated since
+then. Listing, filtering and lookups are then answered from the local
+database, using indexes on reference, status and tags.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+
+from data_api import AsyncDataApi, parse_response
+from sqlite_store import SQLiteStore
+import config
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("items", "questions")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    reference TEXT PRIMARY KEY,
+    status TEXT,
+    dt_updated TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, reference);
+CREATE TABLE IF NOT EXISTS item_tags (
+    reference TEXT NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (reference, type, name)
+);
+CREATE INDEX IF NOT EXISTS item_tags_tag ON item_tags (type, name, reference);
+CREATE TABLE IF NOT EXISTS questions (
+    reference TEXT PRIMARY KEY,
+    type TEXT,
+    dt_updated TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    kind TEXT PRIMARY KEY,
+    updated_from TEXT,
+    synced_at REAL
+);
+"""
+
+
+class SyncError(Exception):
+    pass
+
+
+def item_tags(item: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(type, name) pairs from an item's ``{"type": ["name", ...]}`` tags"""
+    tags = item.get("tags")
+    if not isinstance(tags, dict):
+        return []
+    return [(str(tag_type), str(name)) for tag_type, names in tags.items()
+            for name in (names if isinstance(names, list) else [names])]
+
+
+class ItemBankMirror(SQLiteStore):
+    """Items and questions copied from the Data API into SQLite"""
+
+    schema = SCHEMA
+
+    def __init__(self, data_api: AsyncDataApi, path: Path | str = config.mirror_db_path,
+                 page_size: int = config.mirror_page_size):
+        super().__init__(path)
+        self.data_api = data_api
+        self.page_size = page_size
+        self._sync_lock: asyncio.Lock | None = None
+        self._sync_task: asyncio.Task | None = None
+        self.last_error: str | None = None
+
+    def _query(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        self.open()
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def store(self, kind: str, records: List[Dict[str, Any]]) -> str | None:
+        """Upsert a page of records; return the newest ``dt_updated`` among them"""
+        self.open()
+        newest = max((record.get("dt_updated") or "" for record in records), default="") or None
+        with self._lock, self._db:
+            if kind == "items":
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO items (reference, status, dt_updated, data) VALUES (?, ?, ?, ?)",
+                    [(r["reference"], r.get("status"), r.get("dt_updated"), json.dumps(r)) for r in records],
+                )
+                references = [(r["reference"],) for r in records]
+                self._db.executemany("DELETE FROM item_tags WHERE reference = ?", references)
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO item_tags (reference, type, name) VALUES (?, ?, ?)",
+                    [(r["reference"], tag_type, name) for r in records for tag_type, name in item_tags(r)],
+                )
+            else:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO questions (reference, type, dt_updated, data) VALUES (?, ?, ?, ?)",
+                    [(r["reference"], r.get("type"), r.get("dt_updated"), json.dumps(r)) for r in records],
+                )
+            if newest:
+                # Pages come oldest first, so everything up to here is stored: resume from it
+                self._db.execute(
+                    "INSERT INTO sync_state (kind, updated_from) VALUES (?, ?) "
+                    "ON CONFLICT (kind) DO UPDATE SET updated_from = excluded.updated_from",
+                    (kind, newest),
+                )
+        return newest
+
+    def updated_from(self, kind: str) -> str | None:
+        rows = self._query("SELECT updated_from FROM sync_state WHERE kind = ?", (kind,))
+        return rows[0]["updated_from"] if rows else None
+
+    def _finish(self, kind: str) -> None:
+        self.open()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sync_state (kind, synced_at) VALUES (?, ?) "
+                "ON CONFLICT (kind) DO UPDATE SET synced_at = excluded.synced_at",
+                (kind, time.time()),
+            )
+
+    async def sync_kind(self, kind: str) -> int:
+        """Fetch and store every ``kind`` record updated since the last sync; return how many"""
+        since = await asyncio.to_thread(self.updated_from, kind)
+        request: Dict[str, Any] = {"limit": self.page_size, "sort_field": "updated", "order": "asc"}
+        if since:
+            # Inclusive, so records sharing the last timestamp are fetched again rather than missed
+            request["updated"] = {"from": since}
+
+        fetched = 0
+        while True:
+            response = await self.data_api.request(f"itembank/{kind}", request, "get")
+            body = parse_response(response)
+            if response.status_code != 200 or not isinstance(body, dict):
+                raise SyncError(f"Fetching {kind} failed with status {response.status_code}")
+            records = [record for record in body.get("data") or [] if isinstance(record, dict)]
+            if records:
+                await asyncio.to_thread(self.store, kind, records)
+                fetched += len(records)
+            token = (body.get("meta") or {}).get("next")
+            if not token or not records:
+                break
+            request = {**request, "next": token}
+
+        await asyncio.to_thread(self._finish, kind)
+        logger.info(f"Mirror sync fetched {fetched} {kind}")
+        return fetched
+
+    async def sync(self) -> Dict[str, int]:
+        """Sync items and questions; concurrent calls wait for the sync already running"""
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            try:
+                counts = {kind: await self.sync_kind(kind) for kind in KINDS}
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            self.last_error = None
+            return counts
+
+    async def _sync_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Mirror sync failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def start_sync(self, interval: float | None = config.mirror_sync_interval) -> None:
+        """Start periodic background sync; a falsy interval leaves it disabled"""
+        self._sync_lock = asyncio.Lock()
+        if interval and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_loop(interval))
+
+    async def stop_sync(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        self.close()
+
+    def list_items(self, status: str | None = None, tags: List[Tuple[str, str]] = (),
+                   reference_prefix: str | None = None, limit: int = 50,
+                   after: str | None = None) -> List[Dict[str, Any]]:
+        """Items matching every given filter, in reference order, starting after ``after``"""
+        sql = "SELECT data FROM items WHERE 1 = 1"
+        params: list = []
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        if reference_prefix:
+            # A range rather than LIKE, so the primary key index is used
+            sql += " AND reference >= ? AND reference < ?"
+            params += [reference_prefix, reference_prefix + "\U0010ffff"]
+        if after:
+            sql += " AND reference > ?"
+            params.append(after)
+        for tag_type, name in tags:
+            sql += " AND reference IN (SELECT reference FROM item_tags WHERE type = ? AND name = ?)"
+            params += [tag_type, name]
+        sql += " ORDER BY reference LIMIT ?"
+        params.append(limit)
+        return [json.loads(row["data"]) for row in self._query(sql, tuple(params))]
+
+    def get(self, kind: str, reference: str) -> Dict[str, Any] | None:
+        rows = self._query(f"SELECT data FROM {kind} WHERE reference = ?", (reference,))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    def stats(self) -> Dict[str, Any]:
+        state = {row["kind"]: row for row in self._query("SELECT * FROM sync_state")}
+        counts = {kind: self._query(f"SELECT COUNT(*) AS n FROM {kind}")[0]["n"] for kind in KINDS}
+        return {
+            kind: {
+                "records": counts[kind],
+                "updated_from": state[kind]["updated_from"] if kind in state else None,
+                "synced_at": state[kind]["synced_at"] if kind in state else None,
+            }
+            for kind in KINDS
+        } | {"syncing": self._sync_lock is not None and self._sync_lock.locked(), "last_error": self.last_error}
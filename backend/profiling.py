@@ -0,0 +1,289 @@
+"""On-demand statistical profiling of single requests.
+
+``ProfilingMiddleware`` profiles a request when it carries the profile
+header with ``config.profile_token``, or when it is picked at random at
+``config.profile_sample_rate``. With neither configured the middleware
+passes requests straight through.
+
+While any request is being profiled a ``Sampler`` thread wakes every
+``config.profile_interval`` seconds and records the stack of each running
+profiled request:
+
+- on the event loop thread, if the profiled request's middleware frame is
+  on the current stack (other requests interleaved with it are left out);
+- on ``asyncio.to_thread`` workers, if the work was started from that
+  request's context (SQLite stores, scoring, signing offloaded to threads).
+
+Each profile is saved by ``ProfileStore`` as collapsed stacks, one
+``frame;frame;frame count`` line per distinct stack, which flamegraph.pl
+and speedscope read directly, next to a small JSON description. The
+directory keeps at most ``config.profile_max_files`` profiles and
+``config.profile_max_bytes`` bytes; the oldest are deleted first. The
+response gets an ``X-Profile-Id`` header naming the saved profile.
+"""
+from contextvars import Context, ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import asyncio
+import functools
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Characters allowed in a request id, and in the profile id (also its file name) made from it
+_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+_PROFILE_ID = re.compile(r"^[0-9]+-[A-Za-z0-9_.-]{1,64}$")
+
+
+class Profile:
+    def __init__(self, profile_id: str, method: str, path: str, frame: Any, max_samples: int):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        # The middleware's own frame; stacks on the loop thread are recorded from here down
+        self.frame = frame
+        self.thread_id = threading.get_ident()
+        self.max_samples = max_samples
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.started = time.time()
+        self.duration = 0.0
+        self.status: int | None = None
+
+    def add(self, stack: str) -> None:
+        if self.samples < self.max_samples:
+            self.samples += 1
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def describe(self) -> Dict[str, Any]:
+        return {"id": self.id, "method": self.method, "path": self.path, "started": self.started,
+                "duration": round(self.duration, 6), "status": self.status, "samples": self.samples}
+
+
+# The profile of the request running in this context, so work handed to threads can be attributed to it
+_active: ContextVar[Profile | None] = ContextVar("active_profile", default=None)
+
+
+def _label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame: Any, stop: Any = None) -> List[str]:
+    """Labels from the outermost frame (``stop`` itself, if given) down to ``frame``"""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        if frame is stop:
+            break
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def _thread_profile(frame: Any) -> Tuple[Profile | None, Any]:
+    """The profile whose context a thread pool worker is running, and the frame its work starts at"""
+    child = None
+    while frame is not None:
+        if frame.f_code.co_name == "run" and frame.f_code.co_filename.endswith(os.path.join("futures", "thread.py")):
+            work = frame.f_locals.get("self")
+            fn = getattr(work, "fn", None)
+            # asyncio.to_thread submits functools.partial(context.run, func, ...)
+            if isinstance(fn, functools.partial) and isinstance(getattr(fn.func, "__self__", None), Context):
+                return fn.func.__self__.get(_active), child
+            return None, None
+        child = frame
+        frame = frame.f_back
+    return None, None
+
+
+class Sampler:
+    """Samples the stacks of active profiles from a background thread while there are any"""
+
+    def __init__(self, interval: float = config.profile_interval):
+        self.interval = interval
+        self.profiles: Dict[str, Profile] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self, profile: Profile) -> None:
+        with self._lock:
+            self.profiles[profile.id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile) -> None:
+        with self._lock:
+            self.profiles.pop(profile.id, None)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                profiles = list(self.profiles.values())
+                if not profiles:
+                    self._thread = None
+                    return
+            self.sample(profiles, own)
+
+    def sample(self, profiles: List[Profile], skip: int | None = None) -> None:
+        frames = sys._current_frames()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        by_loop_thread: Dict[int, List[Profile]] = {}
+        for profile in profiles:
+            by_loop_thread.setdefault(profile.thread_id, []).append(profile)
+        for thread_id, frame in frames.items():
+            if thread_id == skip:
+                continue
+            on_loop = by_loop_thread.get(thread_id)
+            if on_loop:
+                # A running coroutine's frames chain back through the middleware call that awaits it
+                chain = set()
+                current = frame
+                while current is not None:
+                    chain.add(id(current))
+                    current = current.f_back
+                for profile in on_loop:
+                    if id(profile.frame) in chain:
+                        profile.add(";".join(_stack(frame, stop=profile.frame)))
+                continue
+            profile, start = _thread_profile(frame)
+            if profile is not None and profile.id in self.profiles and start is not None:
+                profile.add(";".join([f"[thread {names.get(thread_id, thread_id)}]", *_stack(frame, stop=start)]))
+
+
+class ProfileStore:
+    """Directory of saved profiles: ``<id>.folded`` stacks and ``<id>.json`` descriptions"""
+
+    def __init__(self, directory: Path | str = config.profile_dir, max_files: int = config.profile_max_files,
+                 max_bytes: int = config.profile_max_bytes):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def save(self, profile: Profile) -> None:
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / f"{profile.id}.folded").write_text(profile.folded())
+            # The description last: a profile is listed once it exists
+            (self.directory / f"{profile.id}.json").write_text(json.dumps(profile.describe()))
+            self._evict()
+
+    def _entries(self) -> List[Tuple[float, str, int]]:
+        """(modified, id, bytes) per saved profile, newest first"""
+        entries = []
+        for description in self.directory.glob("*.json"):
+            profile_id = description.stem
+            try:
+                size = description.stat().st_size + (self.directory / f"{profile_id}.folded").stat().st_size
+                entries.append((description.stat().st_mtime, profile_id, size))
+            except FileNotFoundError:
+                continue
+        return sorted(entries, reverse=True)
+
+    def _evict(self) -> None:
+        total = 0
+        for kept, (_, profile_id, size) in enumerate(self._entries()):
+            total += size
+            if kept >= self.max_files or total > self.max_bytes:
+                for suffix in (".json", ".folded"):
+                    (self.directory / f"{profile_id}{suffix}").unlink(missing_ok=True)
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        if not self.directory.is_dir():
+            return []
+        profiles = []
+        for _, profile_id, _ in self._entries()[:limit]:
+            try:
+                profiles.append(json.loads((self.directory / f"{profile_id}.json").read_text()))
+            except (FileNotFoundError, ValueError):
+                continue
+        return profiles
+
+    def folded(self, profile_id: str) -> str | None:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        try:
+            return (self.directory / f"{profile_id}.folded").read_text()
+        except FileNotFoundError:
+            return None
+
+
+def authorized(token: str | None, given: str | None) -> bool:
+    return token is not None and given is not None and hmac.compare_digest(token.encode(), given.encode())
+
+
+class ProfilingMiddleware:
+    """Profiles requests asked for with the profile header, or sampled at ``sample_rate``"""
+
+    def __init__(self, app: ASGIApp, store: ProfileStore, sampler: Sampler,
+                 token: str | None = config.profile_token, sample_rate: float = config.profile_sample_rate,
+                 header: str = config.profile_header, max_seconds: float = config.profile_max_seconds):
+        self.app = app
+        self.store = store
+        self.sampler = sampler
+        self.token = token
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        self.max_samples = max(1, int(max_seconds / sampler.interval))
+
+    def wanted(self, scope: Scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.token is None:
+            return False
+        given = next((value.decode("latin-1") for name, value in scope["headers"] if name == self.header), None)
+        return authorized(self.token, given)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Off unless a token or sample rate is configured; then only the header lookup is added per request
+        if scope["type"] != "http" or (self.token is None and not self.sample_rate) or not self.wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"x-request-id"),
+                          None)
+        if request_id is None or not _ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        profile = Profile(f"{int(time.time() * 1000)}-{request_id}", scope["method"], scope["path"],
+                          sys._getframe(), self.max_samples)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-profile-id", profile.id.encode("latin-1"))]}
+            await send(message)
+
+        token = _active.set(profile)
+        started = time.perf_counter()
+        self.sampler.start(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.sampler.stop(profile)
+            _active.reset(token)
+            profile.duration = time.perf_counter() - started
+            try:
+                await asyncio.to_thread(self.store.save, profile)
+            except OSError as e:
+                logger.error(f"Could not save profile {profile.id}: {str(e)}")
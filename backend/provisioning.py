@@ -0,0 +1,118 @@
+"""Warm pool of pre-provisioned test questions and items.
+
+Creating a test's question and item costs two item-bank round trips, which
+``GET /api/tests/new`` would otherwise pay on every page load. ``WarmPool``
+keeps a stock of already-created references, hands one out in O(1) and
+refills in the background whenever the stock falls to the low watermark.
+"""
+from collections import deque
+from typing import Awaitable, Callable, Dict, List
+import asyncio
+import logging
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Creates ``count`` tests and returns the references of the ones that succeeded
+Provisioner = Callable[[int], Awaitable[List[Dict[str, str]]]]
+
+
+class WarmPool:
+    """Pool of ready-to-use ``{"test_id", "question_reference", "item_reference"}`` entries"""
+
+    def __init__(self, provision: Provisioner,
+                 size: int = config.test_pool_size,
+                 low_watermark: int = config.test_pool_low_watermark,
+                 retry_delay: float = config.test_pool_retry_delay):
+        self.provision = provision
+        self.size = size
+        self.low_watermark = low_watermark
+        self.retry_delay = retry_delay
+        self.entries: deque[Dict[str, str]] = deque()
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.last_refill_seconds: float | None = None
+        self.total_refill_seconds = 0.0
+        self._wanted: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def take(self) -> Dict[str, str] | None:
+        """Return a provisioned test, or None if the pool is empty"""
+        try:
+            entry = self.entries.popleft()
+            self.hits += 1
+        except IndexError:
+            entry = None
+            self.misses += 1
+        if self._wanted is not None and len(self.entries) <= self.low_watermark:
+            self._wanted.set()
+        return entry
+
+    def start(self) -> None:
+        if self.size > 0 and self._task is None:
+            self._wanted = asyncio.Event()
+            self._wanted.set()
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wanted = None
+
+    async def refill(self) -> int:
+        """Top the pool up to its target size; return how many entries were added"""
+        wanted = self.size - len(self.entries)
+        if wanted <= 0:
+            return 0
+
+        started = time.perf_counter()
+        entries = await self.provision(wanted)
+        elapsed = time.perf_counter() - started
+
+        self.entries.extend(entries)
+        self.refills += 1
+        self.last_refill_seconds = elapsed
+        self.total_refill_seconds += elapsed
+        logger.info(f"Refilled test pool with {len(entries)}/{wanted} test(s) in {elapsed:.3f}s")
+        return len(entries)
+
+    async def _refill_loop(self) -> None:
+        while True:
+            await self._wanted.wait()
+            self._wanted.clear()
+            try:
+                added = await self.refill()
+            except Exception as e:
+                added = 0
+                logger.error(f"Failed to refill test pool: {str(e)}")
+            if len(self.entries) < self.size and not added:
+                # Don't hammer the item bank while provisioning is failing
+                self.refill_failures += 1
+                await asyncio.sleep(self.retry_delay)
+                self._wanted.set()
+            elif len(self.entries) <= self.low_watermark:
+                self._wanted.set()
+
+    def stats(self) -> Dict[str, float | int | None]:
+        requests = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "target_size": self.size,
+            "low_watermark": self.low_watermark,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else None,
+            "refills": self.refills,
+            "refill_failures": self.refill_failures,
+            "last_refill_seconds": self.last_refill_seconds,
+            "avg_refill_seconds": self.total_refill_seconds / self.refills if self.refills else None,
+        }
@@ -0,0 +1,228 @@
+"""Local scoring of multiple choice responses against their validation.
+
+A question's ``validation`` block holds its scoring rules: with
+``scoring_type: exactMatch`` a response scores the ``score`` of the first
+listed answer (``valid_response``, then each of ``alt_responses``, or the
+entries of ``valid_responses``) whose ``value`` it matches exactly, and 0
+otherwise. MCQ values are lists of option values and order doesn't matter.
+
+``score_response`` applies those rules to one response in plain Python.
+``ScoringTable`` compiles a set of questions once and then scores many
+response sets together with NumPy:
+
+- each question's option values are numbered, so a selection becomes a
+  bitmask (``UNANSWERED`` if there is none, ``INVALID`` if it picks a value
+  the question doesn't have). ``encode`` gathers a batch's selections in
+  one pass and then looks up all their bits at once, with
+  ``np.searchsorted`` against the sorted (question, value) keys;
+- the answers become a ``(questions, answers)`` array of masks and one of
+  scores, padded with ``NO_ANSWER`` (as is an empty answer, which no
+  response matches);
+- ``score`` turns ``n`` response sets into a ``(n, questions)`` mask
+  array and picks every score with one comparison against the answer
+  masks, in chunks of at most ``chunk_cells`` compared cells.
+"""
+from itertools import chain, repeat
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+import config
+
+# Response masks that match no answer
+UNANSWERED = -1
+INVALID = -2
+# Padding in the answer mask array; never equal to a response mask
+NO_ANSWER = -3
+
+# Most options a question may have, so any selection fits in an int64 mask
+MAX_OPTIONS = 62
+
+
+class UnsupportedQuestion(ValueError):
+    pass
+
+
+def answers(validation: Dict[str, Any]) -> List[Tuple[float, List[str]]]:
+    """(score, value) for each accepted answer, in the order they are tried"""
+    if validation.get("scoring_type", "exactMatch") != "exactMatch":
+        raise UnsupportedQuestion(f"scoring_type {validation.get('scoring_type')} is not supported")
+    listed = []
+    if validation.get("valid_response") is not None:
+        listed.append(validation["valid_response"])
+    listed += validation.get("alt_responses") or []
+    listed += validation.get("valid_responses") or []
+    if not listed:
+        raise UnsupportedQuestion("validation has no valid_response")
+    result = []
+    for answer in listed:
+        value = answer.get("value") if isinstance(answer, dict) else None
+        if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+            raise UnsupportedQuestion("only answers that are lists of option values are supported")
+        result.append((float(answer.get("score", 0)), value))
+    return result
+
+
+def response_value(response: Any) -> List[str] | None:
+    """The selected option values of a response: ``{"value": [...]}``, a list, or one value"""
+    if isinstance(response, dict):
+        response = response.get("value")
+    if response is None:
+        return None
+    if isinstance(response, str):
+        return [response]
+    if isinstance(response, list) and all(isinstance(v, str) for v in response):
+        return response
+    return None
+
+
+def score_response(validation: Dict[str, Any], response: Any) -> float:
+    """Score one response against one question's validation, in plain Python"""
+    value = response_value(response)
+    if not value:
+        return 0.0
+    selected = set(value)
+    for score, answer in answers(validation):
+        if selected == set(answer):
+            return score
+    return 0.0
+
+
+def question_validation(question: Dict[str, Any]) -> Dict[str, Any]:
+    """The validation block of a question as written or as returned by the Data API"""
+    data = question.get("data") if isinstance(question.get("data"), dict) else question
+    validation = data.get("validation")
+    if not isinstance(validation, dict):
+        raise UnsupportedQuestion("question has no validation")
+    return validation
+
+
+def lookup(table: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Where each of ``keys`` is in the sorted ``table``, and whether it is there at all"""
+    at = np.searchsorted(table, keys)
+    found = at < len(table)
+    found[found] = table[at[found]] == keys[found]
+    return at, found
+
+
+class ScoringTable:
+    """Questions compiled into lookup arrays for scoring many response sets at once"""
+
+    def __init__(self, questions: Sequence[Dict[str, Any]], chunk_cells: int = config.scoring_chunk_cells):
+        self.references = [question["reference"] for question in questions]
+        self.chunk_cells = chunk_cells
+        self.index = {reference: i for i, reference in enumerate(self.references)}
+        # Per question: option value -> bit
+        self.bits: List[Dict[str, int]] = []
+        compiled = []
+        for question in questions:
+            try:
+                validation = question_validation(question)
+                accepted = answers(validation)
+            except UnsupportedQuestion as e:
+                raise UnsupportedQuestion(f"Question {question['reference']}: {e}") from None
+            data = question.get("data") if isinstance(question.get("data"), dict) else question
+            values = [option.get("value") for option in data.get("options") or [] if isinstance(option, dict)]
+            values += [v for _, answer in accepted for v in answer]
+            bits = {value: bit for bit, value in enumerate(dict.fromkeys(v for v in values if isinstance(v, str)))}
+            if len(bits) > MAX_OPTIONS:
+                raise UnsupportedQuestion(f"Question {question['reference']} has more than {MAX_OPTIONS} options")
+            self.bits.append(bits)
+            compiled.append([(score, self._mask(bits, answer)) for score, answer in accepted])
+
+        width = max((len(accepted) for accepted in compiled), default=0)
+        self.answer_masks = np.full((len(compiled), width), NO_ANSWER, dtype=np.int64)
+        self.answer_scores = np.zeros((len(compiled), width), dtype=np.float64)
+        for i, accepted in enumerate(compiled):
+            # Only the first of several answers with the same mask can be matched; empty answers never are
+            seen = {NO_ANSWER}
+            for j, (score, mask) in enumerate(accepted):
+                if mask not in seen:
+                    seen.add(mask)
+                    self.answer_masks[i, j] = mask
+                    self.answer_scores[i, j] = score
+        self.max_scores = self.answer_scores.max(axis=1, initial=0.0)
+
+        # Every option value numbered, and sorted (question, value) keys with the bit each sets
+        self.value_ids = {value: i for i, value in enumerate(dict.fromkeys(v for bits in self.bits for v in bits))}
+        keys = {
+            column * len(self.value_ids) + self.value_ids[value]: 1 << bit
+            for column, bits in enumerate(self.bits) for value, bit in bits.items()
+        }
+        self.option_keys = np.array(sorted(keys), dtype=np.int64)
+        self.option_bits = np.array([keys[key] for key in self.option_keys.tolist()], dtype=np.int64)
+
+    @staticmethod
+    def _mask(bits: Dict[str, int], value: Iterable[str]) -> int:
+        """An answer's mask; an empty answer is never matched, as an empty response scores 0"""
+        if not value:
+            return NO_ANSWER
+        mask = 0
+        for v in value:
+            bit = bits.get(v)
+            if bit is None:
+                return INVALID
+            mask |= 1 << bit
+        return mask
+
+    def encode(self, response_sets: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """``(len(response_sets), questions)`` response masks; responses to unknown questions are ignored"""
+        masks = np.full((len(response_sets), len(self.references)), UNANSWERED, dtype=np.int64)
+        # The column of each answered cell and the values it selects, and where each row's cells end
+        columns, selections, ends = [], [], []
+        column_of = self.index.get
+        for responses in response_sets:
+            for reference, response in responses.items():
+                column = column_of(reference)
+                if column is not None:
+                    value = response_value(response)
+                    if value:
+                        columns.append(column)
+                        selections.append(value)
+            ends.append(len(columns))
+        if not columns:
+            return masks
+
+        columns = np.array(columns, dtype=np.int64)
+        rows = np.repeat(np.arange(len(response_sets)), np.diff(ends, prepend=0))
+        # The cell of each selected value
+        entries = np.repeat(np.arange(len(columns)), np.fromiter(map(len, selections), np.int64, len(columns)))
+        # Numbered as in value_ids; values no question has are -1
+        value_ids = np.fromiter(map(self.value_ids.get, chain.from_iterable(selections), repeat(-1)),
+                                dtype=np.int64, count=len(entries))
+        keys = columns[entries] * len(self.value_ids) + value_ids
+        key_at, key_found = lookup(self.option_keys, keys)
+        selected = (value_ids >= 0) & key_found
+
+        cell_masks = np.zeros(len(columns), dtype=np.int64)
+        np.bitwise_or.at(cell_masks, entries[selected], self.option_bits[key_at[selected]])
+        cell_masks[entries[~selected]] = INVALID
+        masks[rows, columns] = cell_masks
+        return masks
+
+    def score_masks(self, masks: np.ndarray) -> np.ndarray:
+        """Score per response set and question for encoded responses"""
+        scores = np.zeros(masks.shape, dtype=np.float64)
+        if not masks.size or not self.answer_masks.shape[1]:
+            return scores
+        rows = max(1, self.chunk_cells // self.answer_masks.size)
+        for start in range(0, len(masks), rows):
+            chunk = masks[start:start + rows, :, None] == self.answer_masks[None, :, :]
+            # Answer masks within a question are distinct, so at most one matches
+            scores[start:start + rows] = (chunk * self.answer_scores[None, :, :]).sum(axis=2)
+        return scores
+
+    def score(self, response_sets: Sequence[Dict[str, Any]]) -> np.ndarray:
+        return self.score_masks(self.encode(response_sets))
+
+    def summarize(self, scores: np.ndarray) -> Dict[str, Dict[str, float]]:
+        """Per question mean score and share of response sets given full marks"""
+        if not len(scores):
+            return {}
+        means = scores.mean(axis=0)
+        full_marks = (scores >= self.max_scores[None, :]).mean(axis=0)
+        return {
+            reference: {"mean_score": round(float(means[i]), 6), "max_score": float(self.max_scores[i]),
+                        "full_marks_rate": round(float(full_marks[i]), 6)}
+            for i, reference in enumerate(self.references)
+        }
@@ -0,0 +1,259 @@
+"""Pre-fork production server.
+
+The parent process loads the label bundles and precompiles the init
+templates once (``main.preload``), freezes the garbage collector so those
+objects are never touched again, binds the listening socket and then forks
+``--workers`` uvicorn workers. Each worker inherits the preloaded state
+copy-on-write and accepts connections from the shared socket, so signing
+and JSON work spreads across cores without repeating startup work::
+
+    python serve.py --workers 4 --port 8000
+
+- ``SIGHUP`` reloads gracefully: the parent reloads the label bundles,
+  forks a fresh set of workers, then asks the old ones to finish their
+  in-flight requests and exit.
+- ``SIGTERM``/``SIGINT`` stop every worker gracefully, then the parent.
+- Workers report a heartbeat from their event loop into a shared memory
+  table. A worker that exits or whose loop stops beating is replaced.
+  ``GET /api/workers`` (answered by whichever worker gets the request)
+  shows the table.
+
+Per-process state (Data API connection pool, warm test pool, item cache,
+metrics) is still per worker. Background jobs are shared: every worker
+resumes jobs whose lease has run out, such as those of a crashed worker.
+"""
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import gc
+import logging
+import mmap
+import os
+import signal
+import socket
+import struct
+import time
+
+import uvicorn
+
+import main
+import metrics
+
+logger = logging.getLogger("serve")
+
+# pid, generation, started, heartbeat, requests served
+SLOT = struct.Struct("qqddq")
+
+
+class WorkerTable:
+    """Fixed-size table of worker heartbeats in anonymous shared memory
+
+    Created before forking, so the parent and every worker map the same pages.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._map = mmap.mmap(-1, SLOT.size * slots)
+
+    def write(self, slot: int, pid: int, generation: int, started: float, heartbeat: float,
+              requests: int) -> None:
+        SLOT.pack_into(self._map, slot * SLOT.size, pid, generation, started, heartbeat, requests)
+
+    def clear(self, slot: int) -> None:
+        self.write(slot, 0, 0, 0.0, 0.0, 0)
+
+    def read(self, slot: int) -> Dict[str, Any]:
+        pid, generation, started, heartbeat, requests = SLOT.unpack_from(self._map, slot * SLOT.size)
+        return {"pid": pid, "generation": generation, "started": started,
+                "heartbeat": heartbeat, "requests": requests}
+
+
+def requests_served() -> int:
+    return int(sum(metrics.requests_total.values.values()))
+
+
+class Supervisor:
+    """Forks, watches, replaces and reloads the worker processes"""
+
+    def __init__(self, workers: int, host: str, port: int, heartbeat_interval: float = 1.0,
+                 heartbeat_timeout: float = 30.0, graceful_timeout: float = 30.0, log_level: str = "info"):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.generation = 0
+        # Two slots per worker, so old and new generations can overlap during a reload
+        self.table = WorkerTable(workers * 2)
+        # pid -> (slot, generation, spawned at)
+        self.children: Dict[int, tuple[int, int, float]] = {}
+        self.socket: socket.socket | None = None
+        self._stopping = False
+        self._reloading = False
+
+    def bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def slot_for(self, index: int, generation: int) -> int:
+        return index + (generation % 2) * self.workers
+
+    def spawn(self, index: int) -> int:
+        slot = self.slot_for(index, self.generation)
+        self.table.clear(slot)
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._run_worker(index, slot)
+                code = 0
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+            finally:
+                os._exit(code)
+        self.children[pid] = (slot, self.generation, time.monotonic())
+        logger.info(f"Started worker {index} (pid {pid}, generation {self.generation})")
+        return pid
+
+    def _run_worker(self, index: int, slot: int) -> None:
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        # Background jobs are shared through leases: each worker resumes only jobs nobody else holds
+        asyncio.run(self._serve(slot))
+
+    async def _serve(self, slot: int) -> None:
+        config = uvicorn.Config(main.app, lifespan="on", log_level=self.log_level,
+                                timeout_graceful_shutdown=self.graceful_timeout)
+        server = uvicorn.Server(config)
+        heartbeat = asyncio.create_task(self._heartbeat(slot))
+        try:
+            await server.serve(sockets=[self.socket])
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, slot: int) -> None:
+        # Beating from the event loop means a blocked loop shows up as a stale heartbeat
+        pid, generation, started = os.getpid(), self.generation, time.time()
+        while True:
+            self.table.write(slot, pid, generation, started, time.time(), requests_served())
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def health(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        workers = []
+        for slot in range(self.table.slots):
+            entry = self.table.read(slot)
+            if not entry["pid"]:
+                continue
+            age = now - entry["heartbeat"] if entry["heartbeat"] else None
+            workers.append({
+                "pid": entry["pid"],
+                "generation": entry["generation"],
+                "healthy": age is not None and age < self.heartbeat_timeout,
+                "heartbeat_age": round(age, 3) if age is not None else None,
+                "uptime": round(now - entry["started"], 3) if entry["started"] else None,
+                "requests": entry["requests"],
+            })
+        return workers
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot, generation, _ = self.children.pop(pid, (None, None, None))
+            if slot is None:
+                continue
+            self.table.clear(slot)
+            if generation == self.generation and not self._stopping:
+                logger.warning(f"Worker pid {pid} exited with status {status}; replacing it")
+                self.spawn(slot % self.workers)
+
+    def _check_heartbeats(self) -> None:
+        now_wall, now = time.time(), time.monotonic()
+        for pid, (slot, generation, spawned) in list(self.children.items()):
+            if generation != self.generation:
+                continue
+            heartbeat = self.table.read(slot)["heartbeat"]
+            stale = now_wall - heartbeat if heartbeat else now - spawned
+            if stale > self.heartbeat_timeout:
+                logger.warning(f"Worker pid {pid} missed heartbeats for {stale:.0f}s; killing it")
+                os.kill(pid, signal.SIGKILL)
+
+    def reload(self) -> None:
+        logger.info("Reloading: preloading state and starting new workers")
+        old = [pid for pid, (_, generation, _) in self.children.items() if generation == self.generation]
+        main.preload()
+        gc.freeze()
+        self.generation += 1
+        for index in range(self.workers):
+            self.spawn(index)
+        for pid in old:
+            os.kill(pid, signal.SIGTERM)
+
+    def stop(self) -> None:
+        self._stopping = True
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self.children:
+            logger.warning(f"Worker pid {pid} did not stop in time; killing it")
+            os.kill(pid, signal.SIGKILL)
+
+    def run(self) -> None:
+        main.preload()
+        main.app.add_api_route("/api/workers", self.health, methods=["GET"],
+                               summary="Heartbeat, uptime and requests served per worker")
+        # Keep the collector from touching (and so copying) the preloaded objects in every worker
+        gc.freeze()
+        self.socket = self.bind()
+        logger.info(f"Listening on http://{self.host}:{self.port} with {self.workers} workers")
+
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reloading", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stopping", True))
+
+        for index in range(self.workers):
+            self.spawn(index)
+        while not self._stopping:
+            if self._reloading:
+                self._reloading = False
+                self.reload()
+            self._reap()
+            self._check_heartbeats()
+            time.sleep(0.2)
+        self.stop()
+        self.socket.close()
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Serve the backend with pre-forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--heartbeat-timeout", type=float, default=30.0,
+                        help="Replace a worker whose event loop hasn't beaten for this many seconds")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="Seconds a stopping worker may spend finishing in-flight requests")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(args.log_level.upper())
+    Supervisor(args.workers, args.host, args.port, heartbeat_timeout=args.heartbeat_timeout,
+               graceful_timeout=args.graceful_timeout, log_level=args.log_level).run()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,52 @@
+"""Common ground for the backend's local SQLite files.
+
+The job store, content index, item bank mirror and idempotency store each
+keep one connection to their file, shared by the threads that
+``asyncio.to_thread`` runs their methods on and guarded by a lock.
+``SQLiteStore`` opens it the same way for all of them: in WAL mode (so
+readers don't block the writer) with ``synchronous=NORMAL``, and with a
+``busy_timeout`` so a write that meets another process's lock (pre-forked
+workers share each file) waits for it instead of failing with "database is
+locked".
+"""
+from pathlib import Path
+import sqlite3
+import threading
+
+import config
+
+
+class SQLiteStore:
+    """A lazily opened, lock-guarded connection to one SQLite file
+
+    Subclasses set ``schema`` and may override ``migrate`` to update files
+    created by an older schema.
+    """
+
+    schema = ""
+
+    def __init__(self, path: Path | str):
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        # Under the lock, so threads that race to open share one connection
+        with self._lock:
+            if self._db is None:
+                db = sqlite3.connect(self.path, check_same_thread=False)
+                db.row_factory = sqlite3.Row
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+                db.execute(f"PRAGMA busy_timeout={int(config.sqlite_busy_timeout * 1000)}")
+                db.executescript(self.schema)
+                self.migrate(db)
+                self._db = db
+
+    def migrate(self, db: sqlite3.Connection) -> None:
+        pass
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,82 @@
+"""Precompiled Items API init requests.
+
+An Items API init request is mostly static: the activity template, regions,
+configuration and label bundle never change between page loads. An
+``InitTemplate`` serializes those parts once, leaving holes for the
+per-request fields (``user_id``, ``session_id``, ...). Rendering fills the
+holes, signs the result the same way ``learnosity_sdk.request.Init`` does
+and returns the JSON body as bytes, ready to send without a parse /
+re-serialize round trip.
+"""
+from typing import Any, Dict, Iterable, List
+import json
+import re
+
+from learnosity_sdk.request import Init
+from learnosity_sdk.request.init import format_utc_time
+
+
+def _encode(value: Any) -> str:
+    # Must match how the SDK serializes the request string it signs
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+class InitTemplate:
+    """A signed Items API request with its static parts serialized once"""
+
+    _PLACEHOLDER = "__init_template_field_{}__"
+
+    def __init__(self, request: Dict[str, Any], fields: Iterable[str],
+                 security: Dict[str, str], secret: str):
+        self.fields = tuple(fields)
+        placeholders = {field: self._PLACEHOLDER.format(field) for field in self.fields}
+        missing = set(self.fields) - set(request)
+        if missing:
+            raise ValueError(f"Template request has no field(s): {', '.join(sorted(missing))}")
+
+        # Let the SDK build the request string (including its telemetry
+        # metadata) so the static parts are byte-for-byte what it would sign
+        self._init = Init("items", security, secret, request={**request, **placeholders})
+        self.security = {
+            key: value for key, value in self._init.security.items()
+            if key in security and key not in ("timestamp", "signature")
+        }
+
+        pattern = "|".join(re.escape(_encode(placeholder)) for placeholder in placeholders.values())
+        by_placeholder = {_encode(placeholder): field for field, placeholder in placeholders.items()}
+        self._parts: List[str] = []
+        self._order: List[str] = []
+        position = 0
+        for match in re.finditer(pattern, self._init.request_string):
+            self._parts.append(self._init.request_string[position:match.start()])
+            self._order.append(by_placeholder[match.group()])
+            position = match.end()
+        self._parts.append(self._init.request_string[position:])
+
+    def request_string(self, values: Dict[str, Any]) -> str:
+        pieces = [self._parts[0]]
+        for field, part in zip(self._order, self._parts[1:]):
+            pieces.append(_encode(values[field]))
+            pieces.append(part)
+        return "".join(pieces)
+
+    def render(self, timestamp: str | None = None, envelope: Dict[str, Any] | None = None,
+               **values: Any) -> bytes:
+        """Fill in the per-request fields and return the signed init JSON as bytes
+
+        ``envelope`` adds unsigned top-level keys alongside ``security`` and ``request``.
+        """
+        request_string = self.request_string(values)
+
+        security = dict(self.security)
+        security["timestamp"] = timestamp or format_utc_time()
+        # As in Init, Items API requests take the user_id from the request if security has none
+        if "user_id" not in security and "user_id" in values:
+            security["user_id"] = values["user_id"]
+
+        signed = [security[key] for key in Init.security_keys if key in security]
+        signed.append(request_string)
+        security["signature"] = self._init.hash_list(signed)
+
+        extra = "".join(f",{_encode(key)}:{_encode(value)}" for key, value in (envelope or {}).items())
+        return f'{{"security":{_encode(security)},"request":{request_string}{extra}}}'.encode("utf-8")
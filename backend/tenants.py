@@ -0,0 +1,293 @@
+"""Multi-tenant Learnosity credentials.
+
+Each institution is a ``Tenant`` with its own consumer key and secret.
+``TenantMiddleware`` picks the tenant for a request from the
+``X-Tenant-ID`` header (the default tenant, built from ``config.py``'s
+consumer key, when it's absent) and exposes it through ``current_tenant``
+to everything the request runs, including threads started with
+``asyncio.to_thread``.
+
+``TenantDataApi`` stands in for a single ``AsyncDataApi``: every call is
+routed to the current tenant's own client, so each tenant signs with its
+own credentials and has its own connection pool, adaptive concurrency
+limit and circuit breaker. On top of the per-tenant limits, all tenants
+share ``capacity`` concurrent Data API calls through ``FairQueue``, which
+hands free slots out by weighted fair queuing: a tenant with a deep backlog
+(a bulk import, say) gets its weighted share, and another tenant's calls
+(an exam start) go ahead of that backlog instead of behind it.
+
+Tenants come from ``config.tenants_path``, a JSON file such as::
+
+    {"tenants": [{"id": "acme", "consumer_key": "...", "consumer_secret": "...",
+                  "weight": 2, "max_concurrency": 50}]}
+
+A tenant may give ``consumer_secret_env``, the name of an environment
+variable holding its secret, instead of the secret itself.
+"""
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+
+import httpx
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from data_api import AsyncDataApi
+from upstream import AdaptiveLimiter, CircuitBreaker, UpstreamControl
+import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Tenant:
+    id: str
+    consumer_key: str
+    consumer_secret: str = field(repr=False)
+    # Share of the Data API capacity relative to other tenants with calls waiting
+    weight: float = 1.0
+    # Most concurrent Data API calls this tenant's adaptive limit may grow to
+    max_concurrency: int = config.data_api_concurrency_max
+
+
+DEFAULT_TENANT = Tenant(config.default_tenant_id, config.consumer_key, config.consumer_secret)
+
+# The tenant the running request belongs to
+current_tenant: ContextVar[Tenant] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+@contextmanager
+def use_tenant(tenant: Tenant) -> Iterator[Tenant]:
+    """Run a block (e.g. a background job) on behalf of ``tenant``"""
+    token = current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        current_tenant.reset(token)
+
+
+def namespace() -> str:
+    """Prefix for keys of per-tenant local state; empty for the default tenant, so its keys are unchanged"""
+    tenant = current_tenant.get()
+    return "" if tenant.id == DEFAULT_TENANT.id else f"{tenant.id}:"
+
+
+class UnknownTenant(Exception):
+    pass
+
+
+class TenantRegistry:
+    def __init__(self, path: Path | str | None = config.tenants_path, default: Tenant = DEFAULT_TENANT):
+        self.default = default
+        self.tenants: Dict[str, Tenant] = {default.id: default}
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def load(self, path: Path | str) -> None:
+        with open(path) as f:
+            entries = json.load(f)["tenants"]
+        for entry in entries:
+            entry = dict(entry)
+            secret_env = entry.pop("consumer_secret_env", None)
+            if secret_env is not None:
+                entry["consumer_secret"] = os.environ[secret_env]
+            self.add(Tenant(**entry))
+        logger.info(f"Loaded {len(entries)} tenant(s) from {path}")
+
+    def add(self, tenant: Tenant) -> None:
+        if tenant.weight <= 0:
+            raise ValueError(f"Tenant {tenant.id} must have a positive weight")
+        self.tenants[tenant.id] = tenant
+
+    def get(self, tenant_id: str | None) -> Tenant:
+        if tenant_id is None:
+            return self.default
+        try:
+            return self.tenants[tenant_id]
+        except KeyError:
+            raise UnknownTenant(f"Unknown tenant {tenant_id}") from None
+
+    def __iter__(self) -> Iterator[Tenant]:
+        return iter(self.tenants.values())
+
+
+class TenantMiddleware:
+    """Sets ``current_tenant`` from the tenant header for the rest of the request"""
+
+    def __init__(self, app: ASGIApp, registry: TenantRegistry, header: str = config.tenant_header):
+        self.app = app
+        self.registry = registry
+        self.header = header.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tenant_id = next((value.decode("latin-1") for name, value in scope["headers"] if name == self.header), None)
+        try:
+            tenant = self.registry.get(tenant_id)
+        except UnknownTenant as e:
+            await JSONResponse({"detail": str(e)}, status_code=404)(scope, receive, send)
+            return
+        with use_tenant(tenant):
+            await self.app(scope, receive, send)
+
+
+class FairQueue:
+    """Weighted fair queuing of a fixed number of slots between tenants
+
+    Each call gets a virtual finish time: its tenant's previous finish time
+    (or the current virtual time, if the tenant was idle) plus 1/weight.
+    Free slots go to the waiting call with the earliest finish time, so
+    busy tenants share capacity in proportion to their weights and a tenant
+    that was idle doesn't wait behind another tenant's backlog.
+    """
+
+    def __init__(self, capacity: int = config.tenant_total_concurrency):
+        self.capacity = capacity
+        self.in_use = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        # (finish, sequence, start, tenant id, future)
+        self._waiting: List[tuple[float, int, float, str, Any]] = []
+        self._sequence = itertools.count()
+        self.in_flight: Dict[str, int] = {}
+
+    def _tags(self, tenant: Tenant) -> tuple[float, float]:
+        start = max(self._virtual_time, self._last_finish.get(tenant.id, 0.0))
+        finish = start + 1.0 / tenant.weight
+        self._last_finish[tenant.id] = finish
+        return start, finish
+
+    async def acquire(self, tenant: Tenant) -> None:
+        start, finish = self._tags(tenant)
+        if self.in_use < self.capacity and not self._waiting:
+            self._grant(tenant.id, start)
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (finish, next(self._sequence), start, tenant.id, future)
+        heapq.heappush(self._waiting, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller went away: pass the slot on
+                self.release(tenant)
+            elif entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+            raise
+
+    def _grant(self, tenant_id: str, start: float) -> None:
+        self.in_use += 1
+        self.in_flight[tenant_id] = self.in_flight.get(tenant_id, 0) + 1
+        self._virtual_time = max(self._virtual_time, start)
+
+    def release(self, tenant: Tenant) -> None:
+        self.in_use -= 1
+        self.in_flight[tenant.id] -= 1
+        while self._waiting:
+            _, _, start, tenant_id, future = heapq.heappop(self._waiting)
+            if future.done():
+                continue
+            self._grant(tenant_id, start)
+            future.set_result(None)
+            return
+
+    @asynccontextmanager
+    async def slot(self, tenant: Tenant) -> AsyncIterator[None]:
+        await self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    def stats(self) -> Dict[str, Any]:
+        waiting: Dict[str, int] = {}
+        for _, _, _, tenant_id, future in self._waiting:
+            if not future.done():
+                waiting[tenant_id] = waiting.get(tenant_id, 0) + 1
+        return {"capacity": self.capacity, "in_use": self.in_use,
+                "in_flight": {k: v for k, v in self.in_flight.items() if v}, "waiting": waiting}
+
+
+class TenantDataApi:
+    """Routes ``AsyncDataApi`` calls to the current tenant's own client
+
+    Anything not defined here (``request``, ``encode``, ``sign``,
+    ``security``, ...) is looked up on the current tenant's client, so
+    code written against one ``AsyncDataApi`` works unchanged.
+    """
+
+    def __init__(self, registry: TenantRegistry, domain: str, base_url: str = config.data_api_url,
+                 capacity: int = config.tenant_total_concurrency):
+        self.registry = registry
+        self.domain = domain
+        self.base_url = base_url
+        self.fair_queue = FairQueue(capacity)
+        self._transport: httpx.AsyncBaseTransport | None = None
+        self._clients: Dict[str, AsyncDataApi] = {}
+
+    @property
+    def transport(self) -> httpx.AsyncBaseTransport | None:
+        return self._transport
+
+    @transport.setter
+    def transport(self, transport: httpx.AsyncBaseTransport | None) -> None:
+        # Applies to every tenant; clients pick it up when they next open their pool
+        self._transport = transport
+        for client in self._clients.values():
+            client.transport = transport
+
+    def for_tenant(self, tenant: Tenant | None = None) -> AsyncDataApi:
+        tenant = tenant or current_tenant.get()
+        client = self._clients.get(tenant.id)
+        if client is None:
+            fair_queue = self.fair_queue
+            limiter = AdaptiveLimiter(
+                initial=min(config.data_api_concurrency_initial, tenant.max_concurrency),
+                minimum=min(config.data_api_concurrency_min, tenant.max_concurrency),
+                maximum=tenant.max_concurrency,
+                tenant=tenant.id,
+            )
+            client = AsyncDataApi(
+                {"consumer_key": tenant.consumer_key, "domain": self.domain},
+                tenant.consumer_secret,
+                base_url=self.base_url,
+                transport=self._transport,
+                upstream=UpstreamControl(limiter, CircuitBreaker(tenant=tenant.id),
+                                         gate=lambda: fair_queue.slot(tenant)),
+            )
+            self._clients[tenant.id] = client
+        return client
+
+    def open(self) -> httpx.AsyncClient:
+        return self.for_tenant(self.registry.default).open()
+
+    async def close(self) -> None:
+        for client in self._clients.values():
+            await client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fair_queue": self.fair_queue.stats(),
+            "tenants": {
+                tenant_id: {
+                    "concurrency_limit": int(client.upstream.limiter.limit),
+                    "in_flight": client.upstream.limiter.in_flight,
+                    "circuit_open": client.upstream.breaker.is_open,
+                }
+                for tenant_id, client in self._clients.items()
+            },
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.for_tenant(), name)
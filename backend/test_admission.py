@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from admission import AdmissionController, Overloaded
+
+
+def test_queue_then_reject_when_full():
+    async def run():
+        controller = AdmissionController("test", limit=2, queue_size=1, queue_timeout=1.0)
+        await controller.acquire()
+        await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.stats()["queued"] == 1
+
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.retry_after >= 1
+
+        controller.release()
+        await queued
+        assert controller.in_flight == 2 and controller.stats()["queued"] == 0
+        controller.release()
+        controller.release()
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.in_flight == 0
+    assert controller.admitted == 3 and controller.rejected == 1
+
+
+def test_waiters_are_dropped_at_their_deadline():
+    async def run():
+        controller = AdmissionController("test", limit=1, queue_size=10, queue_timeout=0.01)
+        await controller.acquire()
+        with pytest.raises(Overloaded):
+            await controller.acquire()
+
+        # Once requests are known to be slow, a request that couldn't start in time is refused without waiting
+        controller.service_time = 5.0
+        with pytest.raises(Overloaded):
+            await controller.acquire()
+        controller.release()
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.rejected == 2 and controller.in_flight == 0
+
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    async def run():
+        controller = AdmissionController("test", limit=1, queue_size=10, queue_timeout=1.0)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.stats()["queued"] == 0
+        controller.release()
+        return controller
+
+    assert asyncio.run(run()).in_flight == 0
+
+
+def test_saturated_provisioning_sheds_fast_and_leaves_cheap_endpoints_alone(monkeypatch):
+    monkeypatch.setattr(main.tests_admission, "limit", 0)
+    monkeypatch.setattr(main.tests_admission, "queue_size", 0)
+    with TestClient(main.app) as client:
+        response = client.get("/api/tests/new")
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+
+        assert client.get("/api/items").status_code == 200
+        assert client.get("/api/admission").json()["tests_new"]["rejected"] >= 1
@@ -0,0 +1,91 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from batch import BatchWriter, chunked
+from data_api import AsyncDataApi
+
+
+def fake_item_bank(requests_seen, fail_reference=None):
+    """Data API stand-in that acknowledges each record it is sent"""
+    def handler(request: httpx.Request):
+        form = {k: v[0] for k, v in parse_qs(request.content.decode()).items()}
+        records = json.loads(form["request"])["items"]
+        requests_seen.append([record["reference"] for record in records])
+        if any(record["reference"] == fail_reference for record in records):
+            raise httpx.ConnectError("connection reset")
+        return httpx.Response(200, json={
+            "meta": {"status": True, "records": len(records)},
+            "data": [{"reference": record["reference"]} for record in records],
+        })
+    return httpx.MockTransport(handler)
+
+
+@pytest.fixture
+def client():
+    requests_seen = []
+    main.data_api.transport = fake_item_bank(requests_seen, fail_reference="item_bad")
+    with TestClient(main.app) as test_client:
+        test_client.requests_seen = requests_seen
+        yield test_client
+
+
+def test_chunked():
+    assert chunked(list(range(5)), 2) == [[0, 1], [2, 3], [4]]
+
+
+def test_writer_packs_records_into_chunks():
+    requests_seen = []
+    data_api = AsyncDataApi({"consumer_key": "k", "domain": "localhost"}, "s",
+                            transport=fake_item_bank(requests_seen))
+    writer = BatchWriter(data_api, "itembank/items", "items", chunk_size=50, concurrency=2)
+    records = [{"reference": f"item_{i}"} for i in range(120)]
+
+    results = asyncio.run(writer.write(records))
+
+    assert sorted(len(chunk) for chunk in requests_seen) == [20, 50, 50]
+    assert [result["reference"] for result in results] == [record["reference"] for record in records]
+    assert all(result["status_code"] == 200 for result in results)
+    assert results[7]["data"]["data"] == [{"reference": "item_7"}]
+
+
+def test_add_items_maps_failures_per_item(client, monkeypatch):
+    monkeypatch.setattr(main.item_writer, "chunk_size", 2)
+    items = [
+        {"name": "Item", "reference": reference, "questions": ["q1"]}
+        for reference in ("item_a", "item_b", "item_bad", "item_c")
+    ]
+
+    response = client.post("/api/items/add", json={"items": items})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is False
+    assert [result["reference"] for result in body["results"]] == ["item_a", "item_b", "item_bad", "item_c"]
+    assert body["results"][0]["status_code"] == 200
+    assert "error" in body["results"][2] and "error" in body["results"][3]
+    assert len(client.requests_seen) == 2
+
+
+def test_add_questions_reports_rejected_writes(monkeypatch):
+    def handler(request: httpx.Request):
+        form = {k: v[0] for k, v in parse_qs(request.content.decode()).items()}
+        records = json.loads(form["request"])["questions"]
+        return httpx.Response(400, json={"meta": {"status": False, "records": len(records)}})
+
+    main.data_api.transport = httpx.MockTransport(handler)
+    question = {"reference": "q_rejected", "type": "mcq", "data": {
+        "stimulus": "Capital of France?", "type": "mcq",
+        "options": [{"label": "Paris", "value": "0"}, {"label": "Rome", "value": "1"}],
+        "validation": {"valid_response": {"score": 1, "value": ["0"]}}}}
+    with TestClient(main.app) as client:
+        response = client.post("/api/questions/add?create_item=false", json={"questions": [question]})
+
+    body = response.json()
+    assert body["success"] is False
+    assert body["results"][0]["status_code"] == 400
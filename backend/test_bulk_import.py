@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from bulk_import import ndjson_lines, stream_import
+
+
+async def chunks_of(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def test_ndjson_lines_reassembles_split_lines():
+    async def collect():
+        return [line async for line in ndjson_lines(chunks_of(b'{"a":1}\n{"b":2}\n{"c":3}', 4))]
+
+    assert asyncio.run(collect()) == [b'{"a":1}', b'{"b":2}', b'{"c":3}']
+
+
+def test_ndjson_lines_rejects_oversized_lines():
+    async def collect():
+        return [line async for line in ndjson_lines(chunks_of(b"x" * 100, 10), max_line_bytes=50)]
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect())
+
+
+def test_items_wait_for_earlier_question_chunks():
+    events = []
+
+    async def write_questions(payloads):
+        await asyncio.sleep(0.01)
+        events.append("questions")
+        return [{"status_code": 200} for _ in payloads]
+
+    async def write_items(payloads):
+        events.append("items")
+        return [{"status_code": 200} for _ in payloads]
+
+    def parse(record):
+        return record["kind"], record
+
+    body = b"\n".join([b'{"kind":"question","reference":"q1"}', b'{"kind":"item","reference":"i1"}'])
+
+    async def run():
+        return [json.loads(line) async for line in stream_import(
+            chunks_of(body, 1000), parse, {"question": write_questions, "item": write_items},
+            order=("question", "item"), chunk_size=1,
+        )]
+
+    results = asyncio.run(run())
+    assert events == ["questions", "items"]
+    assert results[-1] == {"summary": {"records": 2, "written": 2, "failed": 0, "invalid": 0}}
+
+
+def test_import_endpoint_streams_per_record_results(fake_item_bank):
+    lines = []
+    for n in range(120):
+        lines.append({
+            "reference": f"import_q_{n}", "type": "mcq",
+            "data": {"stimulus": "?", "type": "mcq", "options": [{"label": "A", "value": "0"}],
+                     "validation": {"scoring_type": "exactMatch", "valid_response": {"score": 1, "value": ["0"]}}},
+        })
+        lines.append({"name": f"Item {n}", "reference": f"import_i_{n}", "questions": [f"import_q_{n}"]})
+    body = "\n".join(json.dumps(line) for line in lines) + '\n{"reference": "bad"}\nnot json\n'
+
+    with TestClient(main.app) as client:
+        response = client.post("/api/import", content=body.encode(), headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert results[-1]["summary"] == {"records": 242, "written": 240, "failed": 0, "invalid": 2}
+    assert {r["line"] for r in results if "error" in r} == {241, 242}
+    assert len(fake_item_bank.records["questions"]) == 120 and len(fake_item_bank.records["items"]) == 120
+    # 120 questions and 120 items in chunks of 50
+    assert fake_item_bank.requests == 6
+
+
+def test_import_holds_a_writes_slot_while_streaming(monkeypatch):
+    in_flight = []
+
+    async def write(payloads, on_chunk=None):
+        in_flight.append(main.writes_admission.in_flight)
+        return [{"reference": payload["reference"], "status_code": 200} for payload in payloads]
+
+    monkeypatch.setattr(main.deduped_question_writer, "write_fresh", write)
+    question = {"reference": "import_slot", "type": "mcq",
+                "data": {"stimulus": "?", "type": "mcq", "options": [{"label": "A", "value": "0"}],
+                         "validation": {"valid_response": {"score": 1, "value": ["0"]}}}}
+    with TestClient(main.app) as client:
+        response = client.post("/api/import", content=json.dumps(question).encode(),
+                               headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 200 and in_flight == [1]
+        assert main.writes_admission.in_flight == 0
+
+        # Every slot taken and no room to queue
+        monkeypatch.setattr(main.writes_admission, "in_flight", main.writes_admission.limit)
+        monkeypatch.setattr(main.writes_admission, "queue_size", 0)
+        response = client.post("/api/import", content=json.dumps(question).encode(),
+                               headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 503
@@ -0,0 +1,61 @@
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+from learnosity_sdk.request import Init
+
+import bench
+import config
+import main
+from bulk_questions import item_payloads, parse_questions
+from fake_data_api import FakeItemBank, create_app
+
+
+def test_parse_questions_matches_the_model_path():
+    questions = [bench.sample_question(f"q_{n}") for n in range(3)]
+    questions[0]["extra"] = "dropped"
+    body = json.dumps({"questions": questions}).encode()
+
+    models = main.AddQuestionRequest.model_validate_json(body).questions
+    assert parse_questions(body) == [main.build_question_payload(question) for question in models]
+    assert item_payloads(parse_questions(body)) == [
+        main.build_item_payload(main.ItemData(
+            name=f"Item for {question.reference}",
+            reference=f"item_{question.reference}",
+            description=f"Auto-generated item for question {question.reference}",
+            status="published",
+            questions=[question.reference],
+        ))
+        for question in models
+    ]
+
+
+def test_encoded_requests_are_signed_like_the_sdk():
+    data_api = main.data_api
+    request_string = data_api.encode({"questions": [bench.sample_question("q_é")]})
+    form = data_api.sign_encoded(request_string, "set")
+    security = json.loads(form["security"])
+
+    expected = Init("data", {**data_api.security, "timestamp": security["timestamp"]},
+                    data_api.secret, json.loads(request_string), "set")
+    assert form["request"] == expected.request_string
+    assert security == expected.security
+
+
+def test_bulk_endpoint_writes_signed_questions_and_items(monkeypatch):
+    monkeypatch.setattr(main.question_writer, "chunk_size", 2)
+    fake = FakeItemBank(secret=config.consumer_secret)
+    main.data_api.transport = httpx.ASGITransport(app=create_app(fake))
+    with TestClient(main.app) as client:
+        questions = [bench.sample_question(f"bulk_q_{n}") for n in range(5)]
+        response = client.post("/api/questions/add/bulk", json={"questions": questions})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["success"] is True
+        assert [r["reference"] for r in body["results"]] == [f"bulk_q_{n}" for n in range(5)]
+        assert all(r["status_code"] == 200 for r in body["results"] + body["item_results"])
+        assert set(fake.records["questions"]) == {f"bulk_q_{n}" for n in range(5)}
+        assert set(fake.records["items"]) == {f"item_bulk_q_{n}" for n in range(5)}
+
+        invalid = client.post("/api/questions/add/bulk", json={"questions": [{"reference": "x"}]})
+        assert invalid.status_code == 422
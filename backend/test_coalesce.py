@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from coalesce import BatchLoader
+
+
+def test_lookups_in_one_window_share_one_batch():
+    batches = []
+
+    async def load_many(keys):
+        batches.append(keys)
+        return {key: key.upper() for key in keys}
+
+    async def run():
+        loader = BatchLoader(load_many, window=0.005, max_batch=4)
+        values = await asyncio.gather(*(loader.load(key) for key in ["a", "b", "a", "c"]))
+        more = await loader.load_all(["d", "e", "f", "g", "h"])
+        return loader, values, more
+
+    loader, values, more = asyncio.run(run())
+    assert values == ["A", "B", "A", "C"]
+    assert more == ["D", "E", "F", "G", "H"]
+    # The repeated key takes one slot; a full batch goes without waiting for the window
+    assert batches == [["a", "b", "c"], ["d", "e", "f", "g"], ["h"]]
+    assert loader.stats()["loads"] == 9 and loader.stats()["largest_batch"] == 4
+
+
+def test_failures_reach_every_caller_in_the_batch():
+    async def load_many(keys):
+        if "boom" in keys:
+            raise RuntimeError("upstream down")
+        return {}
+
+    async def run():
+        loader = BatchLoader(load_many, window=0)
+        failed = await asyncio.gather(loader.load("boom"), loader.load("other"), return_exceptions=True)
+        missing = await asyncio.gather(loader.load("absent"), return_exceptions=True)
+        return failed, missing
+
+    failed, missing = asyncio.run(run())
+    assert all(isinstance(error, RuntimeError) for error in failed)
+    assert isinstance(missing[0], KeyError)
+
+
+@pytest.fixture
+def fake(fake_item_bank):
+    for n in range(5):
+        fake_item_bank.records["items"][f"multi_{n}"] = {"reference": f"multi_{n}", "questions": []}
+    for n in range(6):
+        main.item_cache.invalidate(f"multi_{n}")
+    return fake_item_bank
+
+
+def test_multi_get_is_one_upstream_call_and_fills_the_cache(fake):
+    references = [f"multi_{n}" for n in range(6)]
+    with TestClient(main.app) as client:
+        query = "&".join(f"reference={reference}" for reference in references)
+        items = client.get(f"/api/items/get?{query}").json()["items"]
+        assert fake.requests == 1
+
+        assert [item["item_reference"] for item in items] == references
+        assert all(item["status_code"] == 200 for item in items)
+        assert [item["data"]["data"] for item in items[:5]] == [[fake.records["items"][ref]] for ref in references[:5]]
+        # Missing items look the same as when fetched on their own
+        assert items[5]["data"]["data"] == [] and items[5]["data"]["meta"]["records"] == 0
+
+        single = client.get("/api/items/get/multi_2").json()
+        assert single == items[2] and fake.requests == 1
+
+        assert client.get("/api/items/get").status_code == 422
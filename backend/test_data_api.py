@@ -0,0 +1,82 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import httpx
+from learnosity_sdk.request import Init
+
+from data_api import AsyncDataApi, parse_response
+from upstream import AdaptiveLimiter, UpstreamControl
+
+security = {"consumer_key": "test_key", "domain": "localhost"}
+secret = "test_secret"
+
+
+def test_request_is_signed_like_sdk():
+    """The async client posts the same signed form fields as the SDK's DataApi"""
+    captured = {}
+
+    def handler(request: httpx.Request):
+        captured["url"] = str(request.url)
+        captured["headers"] = request.headers
+        captured["form"] = {k: v[0] for k, v in parse_qs(request.content.decode()).items()}
+        return httpx.Response(200, json={"meta": {"status": True}, "data": []})
+
+    client = AsyncDataApi(security, secret, base_url="https://data.example.com/latest",
+                          transport=httpx.MockTransport(handler))
+
+    async def run():
+        try:
+            return await client.request("itembank/items", {"items": ["item_1"]}, "get")
+        finally:
+            await client.close()
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert parse_response(response) == {"meta": {"status": True}, "data": []}
+    assert captured["url"] == "https://data.example.com/latest/itembank/items"
+    assert captured["headers"]["X-Learnosity-Action"] == "get_/itembank/items"
+    assert captured["headers"]["X-Learnosity-Consumer"] == "test_key"
+
+    form = captured["form"]
+    sent_security = json.loads(form["security"])
+    expected = Init(
+        "data", {**security, "timestamp": sent_security["timestamp"]}, secret,
+        json.loads(form["request"]), "get"
+    )
+    assert form["action"] == "get"
+    assert sent_security["signature"] == expected.security["signature"]
+
+
+def test_concurrent_requests_share_one_pool():
+    """Many requests can be in flight at once over the same client"""
+    in_flight = 0
+    peak = 0
+
+    async def handler(request: httpx.Request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={"meta": {"status": True}})
+
+    client = AsyncDataApi(security, secret, transport=httpx.MockTransport(handler),
+                          upstream=UpstreamControl(AdaptiveLimiter(initial=50)))
+
+    async def run():
+        client.open()
+        try:
+            await asyncio.gather(*(
+                client.request("itembank/items", {"items": [f"item_{i}"]}) for i in range(50)
+            ))
+        finally:
+            await client.close()
+
+    asyncio.run(run())
+    assert peak == 50
+
+
+def test_parse_response_falls_back_to_text():
+    assert parse_response(httpx.Response(500, text="upstream error")) == "upstream error"
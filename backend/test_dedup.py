@@ -0,0 +1,146 @@
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+import bench
+import main
+from dedup import ContentIndex, DedupWriter, content_digest
+
+
+@pytest.fixture
+def fake(dedup, fake_item_bank):
+    return fake_item_bank
+
+
+def copy_of(question, reference):
+    return {**question, "reference": reference}
+
+
+def test_digest_ignores_only_reference_and_key_order():
+    question = bench.sample_question("q_1")
+    reordered = {"data": dict(reversed(list(question["data"].items()))), "type": "mcq", "reference": "q_2"}
+    assert content_digest("questions", question) == content_digest("questions", reordered)
+    # Benchmark samples are distinct, so deduplication never collapses them
+    assert content_digest("questions", question) != content_digest("questions", bench.sample_question("q_2"))
+
+    item = {"reference": "i_1", "name": "One", "questions": ["q_1"], "definition": {"widgets": []}}
+    assert content_digest("items", item) == content_digest("items", {**item, "reference": "i_2"})
+    assert content_digest("items", item) != content_digest("items", {**item, "name": "Two"})
+    assert content_digest("items", item) != content_digest("items", {**item, "status": "archived"})
+    assert content_digest("items", item) != content_digest("items", {**item, "questions": ["q_2"]})
+
+
+def test_new_test_reuses_the_sample_question_and_item(fake):
+    with TestClient(main.app) as client:
+        first = client.get("/api/tests/new").json()
+        requests_after_first = fake.requests
+        second = client.get("/api/tests/new").json()
+
+        assert len(fake.records["questions"]) == 1 and len(fake.records["items"]) == 1
+        assert fake.requests == requests_after_first
+        assert first["request"]["items"] == second["request"]["items"] == list(fake.records["items"])
+        assert first["request"]["session_id"] != second["request"]["session_id"]
+
+        client.get("/api/tests/new?dedupe=false")
+        assert len(fake.records["items"]) == 2
+
+
+def test_duplicate_questions_reuse_references_and_remap_items(fake):
+    with TestClient(main.app) as client:
+        original = bench.sample_question("q_original")
+        client.post("/api/questions/add", json={"questions": [original]})
+        response = client.post("/api/questions/add", json={"questions": [copy_of(original, "q_copy")]}).json()
+
+        assert response["duplicates"] == {"q_copy": "q_original"}
+        assert response["question_response"] is None
+        assert response["item_results"][0]["duplicate_of"] == "item_q_original"
+        assert set(fake.records["questions"]) == {"q_original"}
+        assert set(fake.records["items"]) == {"item_q_original"}
+
+        # An item listing the skipped question is written against the existing one
+        client.post("/api/items/add", json={"items": [{
+            "name": "New", "reference": "item_new", "questions": ["q_copy"],
+            "definition": {"template": "static", "widgets": [{"reference": "q_copy", "widget_type": "response"}]},
+        }]})
+        written = fake.records["items"]["item_new"]
+        assert written["questions"] == ["q_original"]
+        assert written["definition"]["widgets"][0]["reference"] == "q_original"
+
+        # Reads of a skipped item reference return the item it duplicates
+        read = client.get("/api/items/get/item_q_copy").json()
+        assert read["item_reference"] == "item_q_original" and read["status_code"] == 200
+
+        client.post("/api/questions/add?dedupe=false&create_item=false",
+                    json={"questions": [copy_of(original, "q_forced")]})
+        assert "q_forced" in fake.records["questions"]
+
+
+def test_duplicates_of_a_failed_write_in_the_same_batch_fail_too(tmp_path):
+    index = ContentIndex(tmp_path / "content.sqlite3")
+
+    async def write(records, on_chunk=None):
+        return [{"error": "boom", "reference": record["reference"]} for record in records]
+
+    async def run():
+        writer = DedupWriter(write, index, "questions")
+        question = bench.sample_question("q_a")
+        return await writer.write([question, copy_of(question, "q_b")])
+
+    results = asyncio.run(run())
+    assert [result["reference"] for result in results] == ["q_a", "q_b"]
+    assert all("error" in result for result in results)
+    # Nothing was written, so nothing is remembered
+    assert index.partition("questions", [copy_of(bench.sample_question("q_a"), "q_c")])[1] == {}
+    index.close()
+
+
+def test_rewriting_a_reference_is_an_update_not_a_duplicate(fake):
+    item = {"name": "First", "reference": "item_update", "questions": ["q_1"],
+            "definition": {"template": "static", "widgets": [{"reference": "q_1", "widget_type": "response"}]}}
+    with TestClient(main.app) as client:
+        client.post("/api/items/add", json={"items": [item]})
+        requests_before = fake.requests
+
+        # The same content again under the same reference is written, not answered with itself
+        [same] = client.post("/api/items/add", json={"items": [item]}).json()["results"]
+        assert "duplicate_of" not in same and fake.requests > requests_before
+
+        # Renamed: different content, written in place
+        [renamed] = client.post("/api/items/add", json={"items": [{**item, "name": "Second"}]}).json()["results"]
+        assert "duplicate_of" not in renamed
+        assert fake.records["items"]["item_update"]["name"] == "Second"
+
+
+def test_rewritten_references_drop_their_old_content(fake):
+    old = bench.sample_question("q_rewritten")
+    new = {**old, "data": {**old["data"], "stimulus": "What is the capital of France?"}}
+    with TestClient(main.app) as client:
+        client.post("/api/questions/add/bulk?create_item=false", json={"questions": [old]})
+        client.post("/api/questions/add/bulk?create_item=false&dedupe=false", json={"questions": [new]})
+
+        # q_rewritten no longer holds the old content, so a copy of it is written
+        [result] = client.post("/api/questions/add/bulk?create_item=false",
+                               json={"questions": [copy_of(old, "q_old_content")]}).json()["results"]
+        assert "duplicate_of" not in result and "q_old_content" in fake.records["questions"]
+
+        [result] = client.post("/api/questions/add/bulk?create_item=false",
+                               json={"questions": [copy_of(new, "q_new_content")]}).json()["results"]
+        assert result["duplicate_of"] == "q_rewritten"
+
+
+def test_indexes_keyed_by_digest_are_migrated(tmp_path):
+    path = tmp_path / "content.sqlite3"
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE content (kind TEXT NOT NULL, digest TEXT NOT NULL, reference TEXT NOT NULL, "
+               "created_at REAL NOT NULL, PRIMARY KEY (kind, digest))")
+    question = bench.sample_question("q_1")
+    digest = content_digest("questions", question)
+    db.execute("INSERT INTO content VALUES (?, ?, ?, ?)", ("questions", digest, "q_1", 1))
+    db.commit()
+    db.close()
+
+    index = ContentIndex(path)
+    assert index.partition("questions", [copy_of(question, "q_2")])[1] == {0: "q_1"}
+    index.close()
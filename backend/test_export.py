@@ -0,0 +1,114 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+import main
+from export import ExportError, export_to_file
+from fake_data_api import FakeItemBank, create_app
+
+
+def seeded_bank():
+    item_bank = FakeItemBank()
+    for n in range(7):
+        # Neighbouring items share a question
+        questions = [f"q_{n}", f"q_{n + 1}"]
+        item_bank.records["items"][f"item_{n}"] = {"reference": f"item_{n}", "questions": questions}
+    for n in range(8):
+        item_bank.records["questions"][f"q_{n}"] = {"reference": f"q_{n}", "type": "mcq", "data": {"n": n}}
+    return item_bank
+
+
+def failing_after(item_bank, item_pages):
+    """Transport that serves ``item_pages`` item pages, then fails every request"""
+    inner = httpx.ASGITransport(app=create_app(item_bank))
+    served = 0
+
+    async def handler(request):
+        nonlocal served
+        if request.url.path.endswith("/itembank/items"):
+            served += 1
+            if served > item_pages:
+                return httpx.Response(400, json={"meta": {"status": False}})
+        return await inner.handle_async_request(request)
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(config, "export_page_size", 3)
+    item_bank = seeded_bank()
+    main.data_api.transport = httpx.ASGITransport(app=create_app(item_bank))
+    return item_bank
+
+
+def lines(text):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_export_streams_questions_then_items_per_page(fake):
+    with TestClient(main.app) as client:
+        records = lines(client.get("/api/export").text)
+
+    references = [record["reference"] for record in records]
+    assert references[:7] == ["q_0", "q_1", "q_2", "q_3", "item_0", "item_1", "item_2"]
+    assert [r for r in references if r.startswith("item_")] == [f"item_{n}" for n in range(7)]
+    assert {r for r in references if r.startswith("q_")} == {f"q_{n}" for n in range(8)}
+    # Page two repeats q_3, which page one's item_2 also uses
+    assert references.count("q_3") == 2
+    assert records[0] == fake.records["questions"]["q_0"]
+
+
+def test_checkpoints_resume_and_gzip(fake):
+    with TestClient(main.app) as client:
+        full = client.get("/api/export").text
+        with_checkpoints = lines(client.get("/api/export?checkpoints=true").text)
+        checkpoints = [record["checkpoint"] for record in with_checkpoints if "checkpoint" in record]
+        assert len(checkpoints) == 2
+
+        resumed = client.get(f"/api/export?after={checkpoints[0]}").text
+        first_page = full.splitlines()[:len(full.splitlines()) - len(resumed.splitlines())]
+        assert "\n".join(first_page) + "\n" + resumed == full
+
+        compressed = client.get("/api/export", headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["content-encoding"] == "gzip" and compressed.text == full
+
+
+def test_failure_ends_the_stream_with_where_to_resume(fake):
+    main.data_api.transport = failing_after(fake, 1)
+    with TestClient(main.app) as client:
+        records = lines(client.get("/api/export").text)
+    assert [r["reference"] for r in records if "reference" in r][-1] == "item_2"
+    assert records[-1]["resume_from"] == "3" and "error" in records[-1]
+
+
+def test_cli_export_resumes_from_its_checkpoint(fake, tmp_path):
+    output = str(tmp_path / "bank.ndjson.gz")
+    with TestClient(main.app) as client:
+        expected = client.get("/api/export").content
+
+    async def run(transport, resume):
+        main.data_api.transport = transport
+        try:
+            return await export_to_file(main.data_api, output, compress=True, resume=resume, page_size=3)
+        finally:
+            await main.data_api.close()
+
+    with pytest.raises(ExportError):
+        asyncio.run(run(failing_after(fake, 2), resume=False))
+    checkpoint = json.loads((tmp_path / "bank.ndjson.gz.checkpoint").read_text())
+    assert checkpoint["pages"] == 2 and checkpoint["next"] == "6"
+
+    # Bytes written after the checkpoint are dropped on resume
+    with open(output, "ab") as f:
+        f.write(b"partial")
+    done = asyncio.run(run(httpx.ASGITransport(app=create_app(fake)), resume=True))
+
+    assert done["pages"] == 3 and done["next"] is None
+    assert gzip.decompress((tmp_path / "bank.ndjson.gz").read_bytes()) == expected
+    assert not (tmp_path / "bank.ndjson.gz.checkpoint").exists()
@@ -0,0 +1,86 @@
+import asyncio
+
+import httpx
+
+import bench
+from data_api import AsyncDataApi, parse_response
+from fake_data_api import FakeItemBank, create_app
+from upstream import UpstreamControl
+
+security = {"consumer_key": "test_key", "domain": "localhost"}
+
+
+def client_for(item_bank, secret="test_secret"):
+    # No retries, so the fake's own responses (e.g. 429s) come straight back
+    return AsyncDataApi(security, secret, base_url="http://fake/latest",
+                        transport=httpx.ASGITransport(app=create_app(item_bank)),
+                        upstream=UpstreamControl(attempts=1))
+
+
+def test_set_then_get_round_trip_with_signature_check():
+    item_bank = FakeItemBank(secret="test_secret")
+
+    async def run():
+        client = client_for(item_bank)
+        try:
+            written = await client.request("itembank/items", {"items": [{"reference": "item_1", "name": "é"}]}, "set")
+            read = await client.request("itembank/items", {"items": ["item_1", "missing"]}, "get")
+        finally:
+            await client.close()
+        return written, read
+
+    written, read = asyncio.run(run())
+    assert written.status_code == 200
+    [record] = parse_response(read)["data"]
+    assert record.pop("dt_updated")
+    assert record == {"reference": "item_1", "name": "é"}
+
+
+def test_bad_signature_is_rejected():
+    async def run():
+        client = client_for(FakeItemBank(secret="test_secret"), secret="wrong_secret")
+        try:
+            return await client.request("itembank/items", {"items": ["item_1"]}, "get")
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()).status_code == 403
+
+
+def test_rate_limit_and_paging():
+    item_bank = FakeItemBank(rate_limit=2)
+    for n in range(5):
+        item_bank.records["items"][f"item_{n}"] = {"reference": f"item_{n}"}
+
+    async def run():
+        client = client_for(item_bank)
+        try:
+            first = await client.request("itembank/items", {"limit": 3})
+            second = await client.request("itembank/items", {"limit": 3, "next": parse_response(first)["meta"]["next"]})
+            limited = await client.request("itembank/items", {"limit": 3})
+        finally:
+            await client.close()
+        return first, second, limited
+
+    first, second, limited = asyncio.run(run())
+    assert len(parse_response(first)["data"]) == 3
+    assert len(parse_response(second)["data"]) == 2 and "next" not in parse_response(second)["meta"]
+    assert limited.status_code == 429 and limited.headers["Retry-After"] == "1"
+
+
+def test_updated_from_filter_and_sort():
+    item_bank = FakeItemBank()
+    item_bank.records["items"] = {
+        "b": {"reference": "b", "dt_updated": "2026-01-02 00:00:00"},
+        "a": {"reference": "a", "dt_updated": "2026-01-03 00:00:00"},
+        "c": {"reference": "c", "dt_updated": "2026-01-01 00:00:00"},
+    }
+    page = item_bank.get("items", {"updated": {"from": "2026-01-02 00:00:00"}, "sort_field": "updated"})
+    assert [record["reference"] for record in page["data"]] == ["b", "a"]
+
+
+def test_percentile():
+    values = [float(n) for n in range(1, 101)]
+    assert bench.percentile(values, 0.5) == 50
+    assert bench.percentile(values, 0.99) == 99
+    assert bench.percentile([], 0.5) is None
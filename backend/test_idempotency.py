@@ -0,0 +1,163 @@
+import asyncio
+import sqlite3
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from fake_data_api import FakeItemBank, create_app
+from idempotency import IdempotencyMiddleware, IdempotencyStore
+
+ITEM = {"items": [{"name": "Once", "reference": "item_once", "questions": ["q1"]}]}
+
+
+@pytest.fixture
+def fake():
+    item_bank = FakeItemBank(latency=0.05)
+    main.data_api.transport = httpx.ASGITransport(app=create_app(item_bank))
+    return item_bank
+
+
+def test_retry_gets_the_stored_response_without_writing_again(fake):
+    with TestClient(main.app) as client:
+        first = client.post("/api/items/add", json=ITEM, headers={"Idempotency-Key": "k1"})
+        requests_after_first = fake.requests
+        retry = client.post("/api/items/add", json=ITEM, headers={"Idempotency-Key": "k1"})
+
+        assert retry.status_code == first.status_code == 200
+        assert retry.content == first.content
+        assert retry.headers["Idempotent-Replayed"] == "true" and "Idempotent-Replayed" not in first.headers
+        assert fake.requests == requests_after_first
+
+        other = client.post("/api/items/add?dedupe=false", json=ITEM, headers={"Idempotency-Key": "k1"})
+        assert other.status_code == 422
+
+        client.post("/api/items/add", json=ITEM)
+        assert fake.requests > requests_after_first
+
+
+def test_concurrent_attempts_join_the_running_one(fake):
+    async def run():
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(
+                    client.get("/api/tests/new", params={"dedupe": "false"}, headers={"Idempotency-Key": "exam-1"})
+                    for _ in range(3)
+                ))
+
+    responses = asyncio.run(run())
+    assert len({response.content for response in responses}) == 1
+    assert sum("Idempotent-Replayed" in response.headers for response in responses) == 2
+    # One question and one item, written once
+    assert fake.requests == 2
+
+
+def test_server_errors_are_not_stored():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"meta": {"status": False}})
+
+    main.data_api.transport = httpx.MockTransport(handler)
+    with TestClient(main.app) as client:
+        attempts = []
+        for _ in range(2):
+            response = client.get("/api/tests/new?dedupe=false", headers={"Idempotency-Key": "k2"})
+            assert response.status_code == 500
+            attempts.append(len(calls))
+    # The retry ran the whole write sequence again
+    assert attempts[1] == 2 * attempts[0] > 0
+
+
+def test_store_expires_reclaims_and_bounds_entries(tmp_path):
+    store = IdempotencyStore(tmp_path / "keys.sqlite3", ttl=60, max_entries=2, lock_timeout=60)
+    assert store.claim("a", "f") == ("claimed", None)
+    assert store.claim("a", "f") == ("running", None)
+    assert store.claim("a", "other") == ("mismatch", None)
+
+    store.complete("a", (200, [("content-type", "application/json")], b"{}"))
+    assert store.claim("a", "f") == ("done", (200, [("content-type", "application/json")], b"{}"))
+
+    # A key whose process died mid-request can be claimed again
+    store.lock_timeout = 0
+    store.claim("b", "f")
+    assert store.claim("b", "f") == ("claimed", None)
+
+    store.ttl = 0
+    store.complete("b", (200, [], b""))
+    assert store.claim("b", "f") == ("claimed", None)
+
+    store.ttl = 60
+    for key in "cde":
+        store.claim(key, "f")
+        store.complete(key, (200, [], b""))
+    store.purge()
+    assert [store.claim(key, "f")[0] for key in "cde"] == ["claimed", "done", "done"]
+    store.close()
+
+
+def test_workers_sharing_a_store_run_a_key_once(tmp_path):
+    runs = []
+
+    async def slow_app(scope, receive, send):
+        runs.append(scope["path"])
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": f"run {len(runs)}".encode()})
+
+    store = IdempotencyStore(tmp_path / "keys.sqlite3")
+    # Separate middleware instances stand in for separate worker processes
+    workers = [IdempotencyMiddleware(slow_app, store, [("POST", "/write")], poll_interval=0.01) for _ in range(2)]
+
+    async def run():
+        clients = [httpx.AsyncClient(transport=httpx.ASGITransport(app=worker), base_url="http://test")
+                   for worker in workers]
+        responses = await asyncio.gather(*(
+            client.post("/write", content=b"body", headers={"Idempotency-Key": "shared"}) for client in clients
+        ))
+        for client in clients:
+            await client.aclose()
+        return responses
+
+    responses = asyncio.run(run())
+    store.close()
+    assert runs == ["/write"]
+    assert [response.text for response in responses] == ["run 1", "run 1"]
+
+
+def test_waiters_are_released_when_saving_the_response_fails(tmp_path, monkeypatch):
+    runs = []
+
+    async def slow_app(scope, receive, send):
+        runs.append(scope["path"])
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"done"})
+
+    def locked(key, stored):
+        raise sqlite3.OperationalError("database is locked")
+
+    store = IdempotencyStore(tmp_path / "keys.sqlite3")
+    monkeypatch.setattr(store, "complete", locked)
+    middleware = IdempotencyMiddleware(slow_app, store, [("POST", "/write")], wait_timeout=0.3, poll_interval=0.01)
+
+    async def post(client):
+        try:
+            return await client.post("/write", content=b"body", headers={"Idempotency-Key": "locked"})
+        except sqlite3.OperationalError as e:
+            return e
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test") as client:
+            return await asyncio.wait_for(asyncio.gather(post(client), post(client)), 2)
+
+    responses = asyncio.run(run())
+    store.close()
+    # The waiter wasn't left hanging on the failed run: it went back to the store, found the key
+    # still claimed there, and gave up after wait_timeout
+    assert runs == ["/write"]
+    assert [getattr(response, "status_code", None) for response in responses].count(409) == 1
+    assert middleware._inflight == {}
@@ -0,0 +1,125 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+from item_cache import ItemCache
+
+
+def test_concurrent_misses_share_one_load():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"reference": "item_1"}
+
+    async def run():
+        cache = ItemCache(maxsize=10, ttl=60)
+        results = await asyncio.gather(*(cache.get("item_1", load) for _ in range(20)))
+        again = await cache.get("item_1", load)
+        return cache, results, again
+
+    cache, results, again = asyncio.run(run())
+    assert calls == 1
+    assert all(result is results[0] for result in results) and again is results[0]
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["coalesced"] == 19
+    assert cache.stats()["hits"] == 1
+
+
+def test_cancelled_caller_leaves_the_shared_load_running():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def run():
+        cache = ItemCache()
+        first = asyncio.create_task(cache.get("item_1", load))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get("item_1", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        value = await second
+        return first, value, cache.lookup("item_1")
+
+    first, value, cached = asyncio.run(run())
+    assert first.cancelled()
+    assert value == "value" and cached == (True, "value") and calls == 1
+
+
+def test_lru_eviction_and_ttl():
+    cache = ItemCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.lookup("a")
+    cache.set("c", 3)
+    assert cache.lookup("b") == (False, None)
+    assert cache.lookup("a") == (True, 1)
+    assert cache.stats()["evictions"] == 1
+
+    expired = ItemCache(maxsize=2, ttl=0)
+    expired.set("a", 1)
+    assert expired.lookup("a") == (False, None)
+    assert expired.stats()["expirations"] == 1
+
+
+def test_invalidation_during_load_is_not_cached():
+    async def run():
+        cache = ItemCache()
+
+        async def load():
+            cache.invalidate("item_1")
+            return "stale"
+
+        assert await cache.get("item_1", load) == "stale"
+        return cache.lookup("item_1")
+
+    assert asyncio.run(run()) == (False, None)
+
+
+def test_failed_loads_are_not_cached():
+    async def run():
+        cache = ItemCache()
+
+        async def load():
+            raise RuntimeError("upstream down")
+
+        for _ in range(2):
+            try:
+                await cache.get("item_1", load)
+            except RuntimeError:
+                pass
+        return cache.stats()
+
+    assert asyncio.run(run())["misses"] == 2
+
+
+def test_get_item_is_cached_until_written():
+    main.item_cache.invalidate("item_hot")
+    upstream_calls = []
+
+    def handler(request: httpx.Request):
+        upstream_calls.append(request.headers["X-Learnosity-Action"])
+        return httpx.Response(200, json={"meta": {"status": True}, "data": [{"reference": "item_hot"}]})
+
+    main.data_api.transport = httpx.MockTransport(handler)
+    with TestClient(main.app) as client:
+        assert client.get("/api/items/get/item_hot").json()["status_code"] == 200
+        client.get("/api/items/get/item_hot")
+        assert upstream_calls == ["get_/itembank/items"]
+
+        client.post("/api/items/add", json={"items": [
+            {"name": "Hot", "reference": "item_hot", "questions": ["q1"]}
+        ]})
+        client.get("/api/items/get/item_hot")
+        stats = client.get("/api/items/cache").json()
+
+    assert upstream_calls == ["get_/itembank/items", "set_/itembank/items", "get_/itembank/items"]
+    assert stats["invalidations"] >= 1
@@ -0,0 +1,199 @@
+import asyncio
+import sqlite3
+import time
+
+from fastapi.testclient import TestClient
+
+import config
+import main
+from jobs import JobQueue, JobStore
+
+
+def wait_for(client, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_background_items_add_reports_progress_and_results(monkeypatch, fake_item_bank):
+    monkeypatch.setattr(main.item_writer, "chunk_size", 2)
+    with TestClient(main.app) as client:
+        items = [{"name": f"Item {n}", "reference": f"job_item_{n}", "questions": []} for n in range(5)]
+        response = client.post("/api/items/add?background=true", json={"items": items})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        assert response.json()["status_url"] == f"/api/jobs/{job_id}"
+
+        job = wait_for(client, job_id)
+        assert job["status"] == "succeeded"
+        assert job["progress"] == {"done": 5, "total": 5}
+        assert job["result"]["success"] is True
+        assert [r["reference"] for r in job["result"]["results"]] == [f"job_item_{n}" for n in range(5)]
+        assert set(fake_item_bank.records["items"]) == {f"job_item_{n}" for n in range(5)}
+
+        assert client.get("/api/jobs/unknown").status_code == 404
+
+
+def test_unfinished_jobs_resume_after_restart(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    ran = []
+
+    async def handler(payload, progress):
+        ran.append(payload["n"])
+        progress(1, 1)
+        return {"n": payload["n"]}
+
+    async def run():
+        # Queued while no workers are running, as if the process stopped first
+        job_id = await JobQueue({"echo": handler}, store).submit("echo", {"n": 7})
+        store.close()
+
+        queue = JobQueue({"echo": handler}, JobStore(tmp_path / "jobs.sqlite3"), workers=1)
+        await queue.start()
+        for _ in range(100):
+            job = await queue.get(job_id)
+            if job["status"] == "succeeded":
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert ran == [7]
+    assert job["result"] == {"n": 7}
+    assert job["progress"] == {"done": 1, "total": 1}
+
+
+def test_failed_job_records_error(tmp_path):
+    async def handler(payload, progress):
+        raise RuntimeError("boom")
+
+    async def run():
+        queue = JobQueue({"fail": handler}, JobStore(tmp_path / "jobs.sqlite3"), workers=1)
+        await queue.start()
+        job_id = await queue.submit("fail", {})
+        for _ in range(100):
+            job = await queue.get(job_id)
+            if job["status"] == "failed":
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job["status"] == "failed"
+    assert job["error"] == "boom"
+
+
+def test_progress_is_served_live_and_saved_in_batches(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "job_progress_interval", 60)
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    writes = []
+    update = store.update
+    monkeypatch.setattr(store, "update", lambda job_id, **fields: (writes.append(fields), update(job_id, **fields)))
+    release = asyncio.Event()
+
+    async def handler(payload, progress):
+        for done in range(1, 101):
+            progress(done, 100)
+        await release.wait()
+        return {}
+
+    async def run():
+        queue = JobQueue({"count": handler}, store, workers=1)
+        await queue.start()
+        job_id = await queue.submit("count", {})
+        while (await queue.get(job_id))["progress"]["done"] < 100:
+            await asyncio.sleep(0.01)
+        live = await queue.get(job_id)
+        saved = store.get(job_id)
+        release.set()
+        while (await queue.get(job_id))["status"] != "succeeded":
+            await asyncio.sleep(0.01)
+        job = await queue.get(job_id)
+        await queue.stop()
+        return live, saved, job
+
+    live, saved, job = asyncio.run(run())
+    assert live["progress"] == {"done": 100, "total": 100}
+    assert saved["progress"] == {"done": 0, "total": 0}
+    assert job["progress"] == {"done": 100, "total": 100}
+    # Only the result, with the final progress: no write per chunk
+    assert [sorted(fields) for fields in writes] == [["done", "result", "status", "total"]]
+
+
+def test_only_expired_leases_are_resumed(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    ran = []
+    release = asyncio.Event()
+
+    async def handler(payload, progress):
+        ran.append(payload["n"])
+        await release.wait()
+        return {"n": payload["n"]}
+
+    async def run():
+        live = JobQueue({"echo": handler}, JobStore(path), workers=1, lease=30)
+        await live.start()
+        running = await live.submit("echo", {"n": 1})
+        # A job held by a worker that crashed: its lease ran out a while ago
+        crashed = JobStore(path).create("echo", {"n": 2}, owner="crashed-worker", lease=-60)
+        while ran != [1]:
+            await asyncio.sleep(0.01)
+
+        other = JobQueue({"echo": handler}, JobStore(path), workers=2, lease=30)
+        await other.start()
+        while ran != [1, 2]:
+            await asyncio.sleep(0.01)
+        release.set()
+        jobs = {}
+        for job_id in (running, crashed):
+            while (await other.get(job_id))["status"] != "succeeded":
+                await asyncio.sleep(0.01)
+            jobs[job_id] = await other.get(job_id)
+        await asyncio.gather(live.stop(), other.stop())
+        return jobs[running], jobs[crashed]
+
+    running, crashed = asyncio.run(run())
+    # The live worker's job ran once, in that worker; the crashed worker's job was taken over
+    assert ran == [1, 2]
+    assert running["result"] == {"n": 1} and crashed["result"] == {"n": 2}
+
+
+def test_stopping_releases_leases_for_the_next_queue(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+
+    async def handler(payload, progress):
+        await asyncio.sleep(60)
+
+    async def run():
+        queue = JobQueue({"slow": handler}, JobStore(path), workers=1, lease=30)
+        await queue.start()
+        job_id = await queue.submit("slow", {})
+        while (await queue.get(job_id))["status"] != "running":
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return job_id, JobStore(path).unclaimed()
+
+    job_id, unclaimed = asyncio.run(run())
+    assert unclaimed == [job_id]
+
+
+def test_stores_created_before_leases_are_migrated(tmp_path):
+    db = sqlite3.connect(tmp_path / "jobs.sqlite3")
+    db.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+               "payload TEXT NOT NULL, result TEXT, error TEXT, done INTEGER NOT NULL DEFAULT 0, "
+               "total INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+    db.execute("INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) "
+               "VALUES ('old', 'echo', 'running', '{}', 1, 1)")
+    db.commit()
+    db.close()
+
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    assert store.unclaimed() == ["old"]
+    assert store.claim("old", "me", 30) and store.unclaimed() == []
+    store.close()
@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+from labels import LabelBundles
+
+
+def test_bundled_labels_load_without_network():
+    bundles = LabelBundles()
+    bundles.load()
+
+    assert "es" in bundles.locales
+    assert bundles.get("es")["actionsubmit"] == "enviar"
+    assert bundles.get("es-ES") is bundles.get("es")
+    assert bundles.get("es_es", "assess-api") is bundles.get("es")
+    assert bundles.get("fr") is None
+
+
+def test_refresh_uses_conditional_requests():
+    seen_headers = []
+
+    def handler(request: httpx.Request):
+        seen_headers.append(request.headers)
+        if request.headers.get("If-None-Match") == '"v2"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"actionsubmit": "entregar"}, headers={"ETag": '"v2"'})
+
+    bundles = LabelBundles(transport=httpx.MockTransport(handler))
+    bundles.load()
+    version = bundles.version
+
+    assert asyncio.run(bundles.refresh()) == 1
+    assert bundles.get("es")["actionsubmit"] == "entregar"
+    assert bundles.version == version + 1
+
+    assert asyncio.run(bundles.refresh()) == 0
+    assert seen_headers[-1]["If-None-Match"] == '"v2"'
+    assert bundles.version == version + 1
+
+
+def test_items_picks_locale_per_request():
+    with TestClient(main.app) as client:
+        # Spanish is the default locale
+        response = client.get("/api/items", params={"labels": "inline"})
+        assert response.headers["content-encoding"] == "gzip"
+        spanish = response.json()
+        assert spanish["request"]["config"]["labelBundle"]["actionsubmit"] == "enviar"
+
+        english = client.get("/api/items", params={"locale": "en", "labels": "inline"}).json()
+        assert "labelBundle" not in english["request"]["config"]
+
+
+def test_items_references_hashed_bundle():
+    with TestClient(main.app) as client:
+        # Referenced by default
+        init = client.get("/api/items").json()
+        assert "labelBundle" not in init["request"]["config"]
+        reference = init["labelBundle"]
+        assert reference["locale"] == "es" and reference["href"].endswith(f".{reference['hash']}.json")
+
+        compressed = client.get(reference["href"], headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert "immutable" in compressed.headers["cache-control"]
+        assert compressed.json()["actionsubmit"] == "enviar"
+
+        identity = client.get(reference["href"], headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in identity.headers
+        assert identity.json() == compressed.json()
+
+        revalidated = client.get(reference["href"], headers={"If-None-Match": f'"{reference["hash"]}"'})
+        assert revalidated.status_code == 304
+
+        stale = client.get(f"/api/labels/es/assess-api.{'0' * 16}.json")
+        assert stale.status_code == 404
+
+
+def test_asset_negotiation_respects_q_zero():
+    bundles = LabelBundles()
+    asset = bundles.asset("es")
+    assert asset.negotiate("gzip;q=0, identity")[1] is None
+    assert asset.negotiate("deflate, gzip")[1] == "gzip"
@@ -0,0 +1,121 @@
+import json
+import logging
+import queue
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import config
+import metrics
+from logs import DroppingQueueHandler, JsonFormatter, LogContextMiddleware, Payload, RequestSampling
+from metrics import TimedRoute
+
+
+class Counted:
+    renders = 0
+
+    def __str__(self):
+        Counted.renders += 1
+        return "counted"
+
+
+class Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(self.format(record))
+
+
+def test_payload_is_rendered_only_when_emitted():
+    logger = logging.getLogger("test_logs.lazy")
+    collect = Collect()
+    logger.addHandler(collect)
+    logger.propagate = False
+    try:
+        logger.setLevel(logging.WARNING)
+        Counted.renders = 0
+        logger.info("Request data: %s", Payload({"value": Counted()}))
+        assert Counted.renders == 0 and collect.records == []
+
+        logger.setLevel(logging.INFO)
+        logger.info("Request data: %s", Payload({"value": Counted()}))
+        assert Counted.renders == 1
+        assert collect.records == ['Request data: {"value":"counted"}']
+    finally:
+        logger.removeHandler(collect)
+        logger.propagate = True
+
+
+def test_large_payloads_are_truncated_with_a_hash():
+    body = {"questions": ["x" * 100] * 100}
+    rendered = str(Payload(body, max_chars=50))
+    full = json.dumps(body, separators=(",", ":"))
+    assert rendered.startswith(full[:50] + "... [")
+    assert f"[{len(full)} chars, sha256:" in rendered
+    assert len(rendered) < 100
+    assert str(Payload(body, max_chars=50)) == rendered
+    assert str(Payload("short")) == "short"
+
+
+def test_queue_handler_drops_when_full():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    before = metrics.log_records_dropped_total.values.get((), 0)
+    for n in range(3):
+        handler.handle(logging.LogRecord("t", logging.INFO, __file__, 1, f"record {n}", None, None))
+    assert handler.queue.qsize() == 1
+    assert metrics.log_records_dropped_total.values[()] == before + 2
+
+
+def test_json_formatter():
+    record = logging.LogRecord("main", logging.INFO, __file__, 1, "Adding %d item(s)", (3,), None)
+    record.route = "/api/items/add"
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Adding 3 item(s)" and entry["level"] == "INFO"
+    assert entry["logger"] == "main" and entry["route"] == "/api/items/add"
+
+
+def sampled_app():
+    app = FastAPI()
+    app.router.route_class = TimedRoute
+    logger = logging.getLogger("test_logs.sampled")
+
+    @app.get("/chatty")
+    async def chatty():
+        logger.info("first")
+        logger.info("second")
+        logger.warning("problem")
+        return {}
+
+    @app.get("/quiet")
+    async def quiet():
+        logger.info("kept")
+        return {}
+
+    app.add_middleware(LogContextMiddleware)
+    return app, logger
+
+
+def test_requests_are_sampled_per_route_as_a_whole(monkeypatch):
+    app, logger = sampled_app()
+    collect = Collect()
+    collect.addFilter(RequestSampling())
+    logger.addHandler(collect)
+    logger.setLevel(logging.INFO)
+    monkeypatch.setattr(config, "log_sample_rates", {"/chatty": 0.5})
+    draws = iter([0.9, 0.1])
+    monkeypatch.setattr("logs.random.random", lambda: next(draws))
+    try:
+        with TestClient(app) as client:
+            # Dropped: only the warning gets through
+            client.get("/chatty")
+            assert collect.records == ["problem"]
+            # Kept: every record of the request
+            client.get("/chatty")
+            assert collect.records == ["problem", "first", "second", "problem"]
+            # Routes without a rate keep everything, with no draw
+            client.get("/quiet")
+            assert collect.records[-1] == "kept"
+    finally:
+        logger.removeHandler(collect)
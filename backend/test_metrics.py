@@ -0,0 +1,37 @@
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+
+def test_metrics_endpoint_reports_requests_stages_and_upstream():
+    main.item_cache.invalidate("item_metrics")
+    main.data_api.transport = httpx.MockTransport(
+        lambda request: httpx.Response(429, json={"meta": {"status": False}})
+    )
+    with TestClient(main.app) as client:
+        client.get("/api/items")
+        client.get("/api/items/get/item_metrics")
+        body = client.get("/metrics").text
+
+    assert 'http_requests_total{method="GET",route="/api/items",status="200"}' in body
+    assert 'stage_duration_seconds_count{stage="items_signing",route="/api/items"}' in body
+    assert 'stage_duration_seconds_count{stage="validation",route="/api/items"}' in body
+    assert 'stage_duration_seconds_count{stage="encoding",route="/api/items"}' in body
+    assert 'upstream_responses_total{endpoint="itembank/items",action="get",status="429"}' in body
+    assert 'upstream_request_duration_seconds_count{endpoint="itembank/items",action="get"}' in body
+    assert "http_requests_in_flight" in body
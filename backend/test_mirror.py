@@ -0,0 +1,90 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from fake_data_api import FakeItemBank, create_app
+
+
+def item(reference, status="published", tags=None):
+    return {"reference": reference, "status": status, "questions": [], "tags": tags or {}}
+
+
+@pytest.fixture
+def fake(monkeypatch, item_mirror):
+    monkeypatch.setattr(item_mirror, "page_size", 2)
+    item_bank = FakeItemBank()
+    item_bank.records["items"].update({
+        "math_1": {**item("math_1", tags={"subject": ["math"], "level": ["1"]}), "dt_updated": "2026-01-01 00:00:00"},
+        "math_2": {**item("math_2", "unpublished", {"subject": ["math"]}), "dt_updated": "2026-01-02 00:00:00"},
+        "art_1": {**item("art_1", tags={"subject": ["art"], "level": ["1"]}), "dt_updated": "2026-01-03 00:00:00"},
+    })
+    item_bank.records["questions"]["q_1"] = {"reference": "q_1", "type": "mcq", "data": {},
+                                             "dt_updated": "2026-01-01 00:00:00"}
+    sent = []
+
+    async def handler(request):
+        sent.append(request)
+        return await inner.handle_async_request(request)
+
+    inner = httpx.ASGITransport(app=create_app(item_bank))
+    main.data_api.transport = httpx.MockTransport(handler)
+    return item_bank, sent
+
+
+def test_sync_then_list_filter_and_look_up(fake):
+    with TestClient(main.app) as client:
+        assert client.post("/api/mirror/sync").json() == {"fetched": {"items": 3, "questions": 1}}
+
+        listed = client.get("/api/mirror/items").json()
+        assert [i["reference"] for i in listed["items"]] == ["art_1", "math_1", "math_2"]
+        assert listed["next"] is None
+
+        def references(query):
+            return [i["reference"] for i in client.get(f"/api/mirror/items?{query}").json()["items"]]
+
+        assert references("status=published") == ["art_1", "math_1"]
+        assert references("tag=subject:math") == ["math_1", "math_2"]
+        assert references("tag=subject:math&tag=level:1") == ["math_1"]
+        assert references("reference_prefix=math_&status=unpublished") == ["math_2"]
+
+        page = client.get("/api/mirror/items?limit=2").json()
+        assert page["next"] == "math_1"
+        assert references(f"limit=2&after={page['next']}") == ["math_2"]
+        assert client.get("/api/mirror/items?tag=subject").status_code == 422
+
+        assert client.get("/api/mirror/items/math_1").json()["tags"] == {"subject": ["math"], "level": ["1"]}
+        assert client.get("/api/mirror/questions/q_1").json()["type"] == "mcq"
+        assert client.get("/api/mirror/items/missing").status_code == 404
+
+        status = client.get("/api/mirror/status").json()
+        assert status["items"]["records"] == 3
+        assert status["items"]["updated_from"] == "2026-01-03 00:00:00"
+        assert status["last_error"] is None
+
+
+def test_second_sync_fetches_only_updated_records(fake):
+    item_bank, sent = fake
+    with TestClient(main.app) as client:
+        client.post("/api/mirror/sync")
+        client.post("/api/items/add", json={"items": [{
+            "name": "Art", "reference": "art_1", "status": "archived", "questions": [],
+        }]})
+        sent.clear()
+
+        fetched = client.post("/api/mirror/sync").json()["fetched"]
+        # The last record of the previous sync comes back too: the filter is inclusive
+        assert fetched["items"] == 1
+        requests = [r for r in sent if r.url.path.endswith("/itembank/items")]
+        assert len(requests) == 1 and b"updated" in requests[0].content
+
+        assert client.get("/api/mirror/items/art_1").json()["status"] == "archived"
+        assert [i["reference"] for i in client.get("/api/mirror/items?status=archived").json()["items"]] == ["art_1"]
+
+
+def test_failed_sync_is_reported(fake):
+    item_bank, sent = fake
+    main.data_api.transport = httpx.MockTransport(lambda request: httpx.Response(400, json={"meta": {}}))
+    with TestClient(main.app) as client:
+        assert client.post("/api/mirror/sync").status_code == 502
+        assert "400" in client.get("/api/mirror/status").json()["last_error"]
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import config
+import main
+from profiling import Profile, ProfileStore, ProfilingMiddleware, Sampler
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def busy_thread(seconds):
+    busy_loop(seconds)
+
+
+def profiled_app(store, sampler, **options):
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        busy_loop(0.05)
+        await asyncio.to_thread(busy_thread, 0.05)
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware, store=store, sampler=sampler, **options)
+    return app
+
+
+def test_profiles_only_requests_with_the_token(tmp_path):
+    store = ProfileStore(tmp_path)
+    sampler = Sampler(interval=0.001)
+    with TestClient(profiled_app(store, sampler, token="secret")) as client:
+        plain = client.get("/work")
+        assert "x-profile-id" not in plain.headers
+        wrong = client.get("/work", headers={config.profile_header: "guess"})
+        assert "x-profile-id" not in wrong.headers
+        assert store.list() == []
+
+        response = client.get("/work", headers={config.profile_header: "secret", "X-Request-ID": "req-1"})
+        assert response.json() == {"ok": True}
+        profile_id = response.headers["x-profile-id"]
+        assert profile_id.endswith("-req-1")
+
+    [described] = store.list()
+    assert described["id"] == profile_id and described["path"] == "/work" and described["status"] == 200
+    assert described["samples"] > 0
+    folded = store.folded(profile_id)
+    lines = folded.splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    # Time on the event loop and in the worker thread are both attributed to the request
+    assert any("busy_loop" in line and not line.startswith("[thread") for line in lines)
+    assert any(line.startswith("[thread") and "busy_thread" in line for line in lines)
+
+
+def test_sampled_requests_are_profiled_without_a_header(tmp_path):
+    store = ProfileStore(tmp_path)
+    with TestClient(profiled_app(store, Sampler(interval=0.001), sample_rate=1.0)) as client:
+        assert "x-profile-id" in client.get("/work").headers
+    assert len(store.list()) == 1
+
+
+def test_off_by_default_starts_no_sampler(tmp_path):
+    sampler = Sampler()
+    with TestClient(profiled_app(ProfileStore(tmp_path), sampler, token=None, sample_rate=0.0)) as client:
+        client.get("/work", headers={config.profile_header: "anything"})
+    assert sampler._thread is None and not os.listdir(tmp_path)
+
+
+def test_store_keeps_newest_profiles_within_bounds(tmp_path):
+    store = ProfileStore(tmp_path, max_files=2, max_bytes=10_000)
+    for n in range(3):
+        profile = Profile(f"{n}-r{n}", "GET", "/", sys._getframe(), max_samples=10)
+        profile.add("a;b")
+        store.save(profile)
+        # Distinct modification times, oldest first
+        for suffix in (".json", ".folded"):
+            os.utime(tmp_path / f"{profile.id}{suffix}", (n, n))
+    store._evict()
+    assert [p["id"] for p in store.list()] == ["2-r2", "1-r1"]
+    assert store.folded("0-r0") is None and store.folded("2-r2") == "a;b 1\n"
+    assert store.folded("../secret") is None
+
+    small = ProfileStore(tmp_path, max_files=10, max_bytes=1)
+    small._evict()
+    assert small.list() == []
+
+
+@pytest.fixture
+def profile_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(main.profile_store, "directory", tmp_path)
+    profile = Profile("1-abc", "GET", "/api/items", sys._getframe(), max_samples=10)
+    profile.add("main;endpoint")
+    main.profile_store.save(profile)
+    return main.profile_store
+
+
+def test_admin_endpoints_list_and_serve_profiles(monkeypatch, profile_store):
+    with TestClient(main.app) as client:
+        assert [p["id"] for p in client.get("/api/profiles").json()["profiles"]] == ["1-abc"]
+        response = client.get("/api/profiles/1-abc")
+        assert response.text == "main;endpoint 1\n"
+        assert client.get("/api/profiles/1-missing").status_code == 404
+
+        monkeypatch.setattr(config, "profile_token", "secret")
+        assert client.get("/api/profiles").status_code == 403
+        assert client.get("/api/profiles", headers={config.profile_header: "secret"}).status_code == 200
@@ -0,0 +1,140 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import httpx
+from fastapi.testclient import TestClient
+
+import bench
+import main
+from provisioning import WarmPool
+
+
+def test_pool_refills_at_low_watermark():
+    provisioned = []
+
+    async def provision(count):
+        provisioned.append(count)
+        return [{"test_id": str(i), "question_reference": f"q{i}", "item_reference": f"i{i}"}
+                for i in range(count)]
+
+    async def run():
+        pool = WarmPool(provision, size=4, low_watermark=1, retry_delay=0)
+        pool.start()
+        await asyncio.sleep(0.01)
+        assert pool.stats()["size"] == 4
+
+        taken = [pool.take() for _ in range(3)]
+        assert all(entry is not None for entry in taken)
+        await asyncio.sleep(0.01)
+        await pool.stop()
+        return pool
+
+    pool = asyncio.run(run())
+    stats = pool.stats()
+    assert provisioned == [4, 3]
+    assert stats["size"] == 4
+    assert stats["hits"] == 3 and stats["misses"] == 0
+    assert stats["refills"] == 2
+    assert stats["avg_refill_seconds"] is not None
+
+
+def test_empty_pool_counts_a_miss():
+    async def provision(count):
+        return []
+
+    pool = WarmPool(provision, size=0, low_watermark=0)
+    assert pool.take() is None
+    assert pool.stats()["hit_rate"] == 0
+
+
+def test_tests_whose_question_failed_are_not_pooled(monkeypatch):
+    monkeypatch.setattr(main.question_writer, "chunk_size", 1)
+    failed, items_written = [], []
+
+    def handler(request):
+        form = {k: v[0] for k, v in parse_qs(request.content.decode()).items()}
+        packet = json.loads(form["request"])
+        records = packet.get("questions") or packet["items"]
+        if "questions" in packet and not failed:
+            failed.append(records[0]["reference"])
+            return httpx.Response(400, json={"meta": {"status": False}})
+        if "items" in packet:
+            items_written.extend(records)
+        return httpx.Response(200, json={"meta": {"status": True, "records": len(records)}, "data": []})
+
+    main.data_api.transport = httpx.MockTransport(handler)
+    pool = WarmPool(main.provision_tests, size=3, low_watermark=0)
+    assert asyncio.run(pool.refill()) == 2
+
+    assert len(failed) == 1 and failed[0] not in {entry["question_reference"] for entry in pool.entries}
+    assert {item["reference"] for item in items_written} == {entry["item_reference"] for entry in pool.entries}
+    assert all(failed[0] not in item["questions"] for item in items_written)
+
+
+def test_new_test_signs_pooled_item_without_upstream_calls(monkeypatch):
+    async def fail(*args, **kwargs):
+        raise AssertionError("Data API should not be called on a pool hit")
+
+    monkeypatch.setattr(main.data_api.for_tenant(), "request", fail)
+    main.test_pool.entries.append({
+        "test_id": "0123456789abcdef",
+        "question_reference": "test_question_pooled",
+        "item_reference": "test_item_pooled",
+    })
+
+    with TestClient(main.app) as client:
+        response = client.get("/api/tests/new")
+        stats = client.get("/api/tests/pool").json()
+
+    assert response.status_code == 200
+    request = response.json()["request"]
+    assert request["items"] == ["test_item_pooled"]
+    assert request["activity_id"] == "test_01234567"
+    assert stats["hits"] >= 1
+
+
+def test_spec_shuffles_reproducibly_and_keeps_answers_valid():
+    template = main.QuestionTemplate(type="mcq", data=bench.sample_question("q")["data"])
+    spec = main.TestSpec(count=6, templates=[template], shuffle=True, seed=7)
+
+    questions, items, references = main.assemble_test(spec, "abc")
+    again = main.assemble_test(spec, "abc")
+    assert [q.data.options for q in questions] == [q.data.options for q in again[0]]
+    assert references == again[2] != [f"test_item_abc_{n}" for n in range(6)]
+    assert sorted(references) == sorted(item.reference for item in items)
+    for question in questions:
+        values = {option["value"] for option in question.data.options}
+        assert set(question.data.validation["valid_response"]["value"]) <= values
+
+    _, _, drawn = main.assemble_test(main.TestSpec(count=2, pool=["a", "b", "c", "a"], shuffle=True, seed=1), "x")
+    assert len(set(drawn)) == 2 and set(drawn) <= {"a", "b", "c"}
+
+
+def test_post_new_test_writes_every_question_in_batches_and_signs_once(monkeypatch, fake_item_bank):
+    monkeypatch.setattr(main.question_writer, "chunk_size", 10)
+    monkeypatch.setattr(main.item_writer, "chunk_size", 10)
+    fake = fake_item_bank
+    with TestClient(main.app) as client:
+        response = client.post("/api/tests/new", json={"count": 30, "shuffle": True, "seed": 3})
+        assert response.status_code == 200
+        items = response.json()["request"]["items"]
+        assert len(items) == 30 and set(items) == set(fake.records["items"])
+        assert len(fake.records["questions"]) == 30
+        # Three question chunks and three item chunks
+        assert fake.requests == 6
+
+        pooled = client.post("/api/tests/new", json={"count": 2, "pool": items[:5]})
+        assert pooled.json()["request"]["items"] == items[:2] and fake.requests == 6
+
+        assert client.post("/api/tests/new", json={"count": 9, "pool": ["a"]}).status_code == 422
+        assert client.post("/api/tests/new", json={"count": 1000}).status_code == 422
+
+
+def test_spec_tests_get_every_question_with_dedup_enabled(dedup, fake_item_bank):
+    fake = fake_item_bank
+    with TestClient(main.app) as client:
+        for spec in ({"count": 30}, {"count": 30, "shuffle": True, "seed": 1}):
+            items = client.post("/api/tests/new", json=spec).json()["request"]["items"]
+            assert len(items) == spec["count"] and len(set(items)) == spec["count"]
+        assert len(fake.records["questions"]) == 60
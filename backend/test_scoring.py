@@ -0,0 +1,120 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from scoring import INVALID, UNANSWERED, ScoringTable, UnsupportedQuestion, score_response
+
+
+def mcq(reference, correct, alternatives=(), options="ABCD"):
+    return {
+        "reference": reference,
+        "type": "mcq",
+        "data": {
+            "options": [{"label": value, "value": value} for value in options],
+            "validation": {
+                "scoring_type": "exactMatch",
+                "valid_response": {"score": 2, "value": correct},
+                "alt_responses": [{"score": score, "value": value} for score, value in alternatives],
+            },
+        },
+    }
+
+
+QUESTIONS = [
+    mcq("q_single", ["B"]),
+    mcq("q_multi", ["A", "C"], alternatives=[(1, ["A"]), (1, ["C"])]),
+    mcq("q_repeated_alt", ["D"], alternatives=[(1, ["D"])]),
+]
+
+
+def test_score_response_rules():
+    validation = QUESTIONS[1]["data"]["validation"]
+    assert score_response(validation, ["C", "A"]) == 2
+    assert score_response(validation, {"value": ["A"]}) == 1
+    assert score_response(validation, "C") == 1
+    assert score_response(validation, ["A", "B"]) == 0
+    assert score_response(validation, None) == 0
+    assert score_response(validation, []) == 0
+    # The first matching answer wins
+    assert score_response(QUESTIONS[2]["data"]["validation"], ["D"]) == 2
+
+
+def test_table_matches_python_scoring():
+    rng = random.Random(0)
+    choices = [None, [], ["A"], ["B"], ["C"], ["D"], ["A", "C"], ["C", "A"], ["B", "D"], ["E"], {"value": ["A", "C"]}]
+    response_sets = [
+        {question["reference"]: rng.choice(choices) for question in QUESTIONS if rng.random() < 0.9}
+        for _ in range(500)
+    ]
+    # A small chunk size, so scoring runs in several chunks
+    table = ScoringTable(QUESTIONS, chunk_cells=64)
+    scores = table.score(response_sets)
+
+    expected = [
+        [score_response(question["data"]["validation"], responses.get(question["reference"])) for question in QUESTIONS]
+        for responses in response_sets
+    ]
+    assert scores.tolist() == expected
+    assert table.max_scores.tolist() == [2, 2, 2]
+
+
+def test_valid_responses_list_and_unknown_questions():
+    question = {"reference": "q", "data": {"options": [], "validation": {
+        "valid_responses": [{"score": 1, "value": ["x"]}, {"score": 3, "value": ["y", "z"]}],
+    }}}
+    table = ScoringTable([question])
+    scores = table.score([{"q": ["z", "y"]}, {"q": ["x"], "other": ["x"]}, {}])
+    assert scores.tolist() == [[3], [1], [0]]
+    assert table.summarize(scores)["q"] == {"mean_score": round(4 / 3, 6), "max_score": 3.0,
+                                            "full_marks_rate": round(1 / 3, 6)}
+
+
+def test_values_are_looked_up_per_question():
+    table = ScoringTable([mcq("q_ab", ["A"], options="AB"), mcq("q_cd", ["C"], options="CD")])
+    masks = table.encode([{"q_ab": ["B", "A"], "q_cd": ["A"]}, {"q_ab": ["A", "Z"], "q_cd": "D"}, {"q_cd": []}])
+    assert masks.tolist() == [[0b11, INVALID], [INVALID, 0b10], [UNANSWERED, UNANSWERED]]
+
+def test_empty_answers_never_match():
+    question = {"reference": "q", "data": {"options": [{"value": "A"}], "validation": {
+        "valid_response": {"score": 1, "value": []}, "alt_responses": [{"score": 2, "value": ["A"]}],
+    }}}
+    response_sets = [{}, {"q": []}, {"q": None}, {"q": ["A"]}]
+    table = ScoringTable([question])
+    expected = [[score_response(question["data"]["validation"], responses.get("q"))] for responses in response_sets]
+    assert table.score(response_sets).tolist() == expected == [[0], [0], [0], [2]]
+    assert table.max_scores.tolist() == [2]
+
+def test_unsupported_questions_are_rejected():
+    partial = mcq("q_partial", ["A"])
+    partial["data"]["validation"]["scoring_type"] = "partialMatch"
+    with pytest.raises(UnsupportedQuestion, match="q_partial"):
+        ScoringTable([partial])
+    with pytest.raises(UnsupportedQuestion, match="q_text"):
+        ScoringTable([{"reference": "q_text", "data": {"validation": {"valid_response": {"score": 1, "value": "x"}}}}])
+
+
+def test_score_endpoint_with_inline_and_mirrored_questions(item_mirror):
+    item_mirror.store("questions", [QUESTIONS[1]])
+    with TestClient(main.app) as client:
+        response = client.post("/api/scoring/score", json={
+            "questions": [QUESTIONS[0]],
+            "question_references": ["q_multi"],
+            "responses": [
+                {"id": "s1", "responses": {"q_single": ["B"], "q_multi": ["A", "C"]}},
+                {"id": "s2", "responses": {"q_single": ["A"], "q_multi": ["C"]}},
+            ],
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert [(r["id"], r["score"], r["max_score"]) for r in body["results"]] == [("s1", 4, 4), ("s2", 1, 4)]
+        assert body["results"][1]["questions"] == {"q_single": 0, "q_multi": 1}
+        assert body["questions"]["q_single"]["full_marks_rate"] == 0.5
+
+        missing = client.post("/api/scoring/score", json={"question_references": ["nope"], "responses": []})
+        assert missing.status_code == 404
+
+        unsupported = dict(QUESTIONS[0], data={"validation": {"scoring_type": "partialMatch"}})
+        response = client.post("/api/scoring/score", json={"questions": [unsupported], "responses": []})
+        assert response.status_code == 422
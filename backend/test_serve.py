@@ -0,0 +1,27 @@
+import os
+import time
+
+from serve import Supervisor, WorkerTable
+
+
+def test_worker_table_is_shared_with_forked_children():
+    table = WorkerTable(2)
+    pid = os.fork()
+    if pid == 0:
+        table.write(1, os.getpid(), 3, 1.0, 2.0, 42)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert table.read(1) == {"pid": pid, "generation": 3, "started": 1.0, "heartbeat": 2.0, "requests": 42}
+    assert table.read(0)["pid"] == 0
+
+
+def test_health_flags_stale_heartbeats():
+    supervisor = Supervisor(workers=2, host="127.0.0.1", port=0, heartbeat_timeout=5)
+    now = time.time()
+    supervisor.table.write(0, 101, 0, now - 60, now, 10)
+    supervisor.table.write(1, 102, 0, now - 60, now - 30, 5)
+
+    health = {worker["pid"]: worker for worker in supervisor.health()}
+    assert set(health) == {101, 102}
+    assert health[101]["healthy"] and health[101]["requests"] == 10
+    assert not health[102]["healthy"]
@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from sqlite_store import SQLiteStore
+
+
+class Notes(SQLiteStore):
+    schema = "CREATE TABLE IF NOT EXISTS notes (text TEXT NOT NULL);"
+
+
+def test_racing_opens_share_one_configured_connection(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "sqlite_busy_timeout", 2.5)
+    store = Notes(tmp_path / "notes.sqlite3")
+
+    def open_and_get(_):
+        store.open()
+        return store._db
+
+    with ThreadPoolExecutor(8) as pool:
+        connections = set(map(id, pool.map(open_and_get, range(32))))
+    assert len(connections) == 1
+    assert store._db.execute("PRAGMA busy_timeout").fetchone()[0] == 2500
+    assert store._db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    store.close()
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from learnosity_sdk.request import Init
+
+import main
+from templates import InitTemplate
+
+security = {"user_id": "abc", "consumer_key": "test_key", "domain": "localhost"}
+secret = "test_secret"
+
+request = {
+    "user_id": None,
+    "session_id": None,
+    "activity_id": "activity_001",
+    "items": None,
+    "config": {"regions": "horizontal", "labelBundle": {"actionsubmit": "enviar", "quote": "\"¿Listo?\""}},
+}
+
+
+def test_render_matches_sdk_signature():
+    template = InitTemplate(request, ("user_id", "session_id", "items"), security, secret)
+    values = {"user_id": "user-1", "session_id": "session-1", "items": ["item_ñ", "item_2"]}
+
+    rendered = json.loads(template.render(timestamp="20260101-0000", **values))
+    expected = Init(
+        "items", {**security, "timestamp": "20260101-0000"}, secret, request={**request, **values}
+    ).generate(encode=False)
+
+    assert rendered == expected
+
+
+def test_user_id_is_taken_from_request_when_security_has_none():
+    no_user = {"consumer_key": "test_key", "domain": "localhost"}
+    template = InitTemplate(request, ("user_id", "session_id", "items"), no_user, secret)
+    values = {"user_id": "user-1", "session_id": "session-1", "items": []}
+
+    rendered = json.loads(template.render(timestamp="20260101-0000", **values))
+    expected = Init(
+        "items", {**no_user, "timestamp": "20260101-0000"}, secret, request={**request, **values}
+    ).generate(encode=False)
+
+    assert rendered["security"] == expected["security"]
+
+
+def test_unknown_field_is_rejected():
+    with pytest.raises(ValueError):
+        InitTemplate(request, ("name",), security, secret)
+
+
+def test_items_endpoint_returns_signed_bytes():
+    with TestClient(main.app) as client:
+        first = client.get("/api/items", params={"labels": "inline"})
+        second = client.get("/api/items", params={"labels": "inline"})
+
+    assert first.headers["content-type"] == "application/json"
+    first, second = first.json(), second.json()
+    assert first["request"]["session_id"] != second["request"]["session_id"]
+    assert first["security"]["signature"] != second["security"]["signature"]
+    assert first["request"]["config"]["labelBundle"]["actionsubmit"] == "enviar"
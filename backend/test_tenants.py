@@ -0,0 +1,157 @@
+from urllib.parse import parse_qs
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from tenants import FairQueue, Tenant, TenantRegistry, namespace, use_tenant
+
+ACME = Tenant("acme", "acme_key", "acme_secret", weight=1.0, max_concurrency=4)
+
+
+async def grant_order(queue, waiting):
+    """Queue ``waiting`` tenants' calls behind a full queue, then return the order they're granted in"""
+    holder = Tenant("holder", "k", "s")
+    for _ in range(queue.capacity):
+        await queue.acquire(holder)
+    order = []
+
+    async def call(tenant):
+        async with queue.slot(tenant):
+            order.append(tenant.id)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(call(tenant)) for tenant in waiting]
+    await asyncio.sleep(0)
+    for _ in range(queue.capacity):
+        queue.release(holder)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_idle_tenant_goes_ahead_of_a_backlog():
+    bulk = Tenant("bulk", "k", "s")
+    exam = Tenant("exam", "k", "s")
+
+    async def run():
+        queue = FairQueue(capacity=1)
+        return await grant_order(queue, [bulk] * 10 + [exam])
+
+    order = asyncio.run(run())
+    # The exam call arrived last but only waits for one of the bulk calls
+    assert order.index("exam") <= 1
+
+
+def test_busy_tenants_share_by_weight():
+    heavy = Tenant("heavy", "k", "s", weight=2.0)
+    light = Tenant("light", "k", "s", weight=1.0)
+
+    async def run():
+        queue = FairQueue(capacity=1)
+        return await grant_order(queue, [light] * 12 + [heavy] * 12)
+
+    order = asyncio.run(run())
+    assert order[:9].count("heavy") == 6 and order[:9].count("light") == 3
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    tenant = Tenant("t", "k", "s")
+
+    async def run():
+        queue = FairQueue(capacity=1)
+        await queue.acquire(tenant)
+        waiter = asyncio.create_task(queue.acquire(tenant))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        queue.release(tenant)
+        return queue.stats()
+
+    assert asyncio.run(run()) == {"capacity": 1, "in_use": 0, "in_flight": {}, "waiting": {}}
+
+
+def test_registry_loads_secrets_from_the_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("ACME_SECRET", "from_env")
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"tenants": [{"id": "acme", "consumer_key": "acme_key",
+                                             "consumer_secret_env": "ACME_SECRET", "weight": 3}]}))
+    registry = TenantRegistry(path)
+    assert registry.get("acme").consumer_secret == "from_env"
+    assert registry.get("acme").weight == 3
+    assert registry.get(None) is registry.default
+    assert "from_env" not in repr(registry.get("acme"))
+
+
+def test_namespace_is_empty_for_the_default_tenant():
+    assert namespace() == ""
+    with use_tenant(ACME):
+        assert namespace() == "acme:"
+
+
+@pytest.fixture
+def acme(monkeypatch):
+    """Register ACME and answer item gets with the consumer key that signed them"""
+    monkeypatch.setattr(main.tenant_registry, "tenants", {**main.tenant_registry.tenants, ACME.id: ACME})
+    monkeypatch.setattr(main.data_api, "_clients", {})
+    consumers = []
+
+    def handler(request):
+        consumer = request.headers["X-Learnosity-Consumer"]
+        consumers.append(consumer)
+        references = json.loads(parse_qs(request.content.decode())["request"][0])["items"]
+        return httpx.Response(200, json={"meta": {"status": True, "records": len(references)},
+                                         "data": [{"reference": ref, "consumer": consumer} for ref in references]})
+
+    main.data_api.transport = httpx.MockTransport(handler)
+    main.item_cache.invalidate("shared_item")
+    main.item_cache.invalidate("acme:shared_item")
+    return consumers
+
+
+def test_requests_are_signed_and_cached_per_tenant(acme):
+    with TestClient(main.app) as client:
+        default = client.get("/api/items/get/shared_item").json()
+        tenant = client.get("/api/items/get/shared_item", headers={"X-Tenant-ID": "acme"}).json()
+        client.get("/api/items/get/shared_item", headers={"X-Tenant-ID": "acme"})
+
+        assert default["data"]["data"][0]["consumer"] == main.tenant_registry.default.consumer_key
+        assert tenant["data"]["data"][0]["consumer"] == "acme_key"
+        # One fetch per tenant; the repeat came from acme's own cache entry
+        assert acme == [main.tenant_registry.default.consumer_key, "acme_key"]
+
+        stats = client.get("/api/tenants").json()
+        assert stats["tenants"]["acme"]["concurrency_limit"] <= ACME.max_concurrency
+        assert "default" in stats["tenants"] and stats["fair_queue"]["in_use"] == 0
+        assert "acme_secret" not in json.dumps(stats)
+
+        body = client.get("/metrics").text
+        assert 'upstream_concurrency_limit{tenant="default"}' in body
+        assert 'upstream_concurrency_limit{tenant="acme"}' in body
+
+
+def test_unknown_tenant_is_404(acme):
+    with TestClient(main.app) as client:
+        response = client.get("/api/items/get/shared_item", headers={"X-Tenant-ID": "nobody"})
+        assert response.status_code == 404
+        assert acme == []
+
+
+def test_mirror_is_the_default_tenants_only(acme):
+    acme_headers = {"X-Tenant-ID": "acme"}
+    with TestClient(main.app) as client:
+        assert client.get("/api/mirror/status").status_code == 200
+        assert client.get("/api/mirror/status", headers=acme_headers).status_code == 404
+        assert client.post("/api/mirror/sync", headers=acme_headers).status_code == 404
+        assert client.get("/api/mirror/items", headers=acme_headers).status_code == 404
+        assert client.get("/api/mirror/questions/q_1", headers=acme_headers).status_code == 404
+
+        response = client.post("/api/scoring/score", headers=acme_headers, json={
+            "question_references": ["q_1"], "responses": [{"id": "s1", "responses": {"q_1": ["A"]}}],
+        })
+        assert response.status_code == 404 and "default tenant" in response.json()["detail"]
+        # Nothing was synced from acme's item bank
+        assert acme == []
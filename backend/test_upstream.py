@@ -0,0 +1,150 @@
+import asyncio
+from time import monotonic
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from data_api import AsyncDataApi
+from upstream import AdaptiveLimiter, CircuitBreaker, UpstreamControl, UpstreamUnavailable, retry_after
+
+security = {"consumer_key": "test_key", "domain": "localhost"}
+
+
+def client_for(handler, **options):
+    return AsyncDataApi(security, "test_secret", base_url="http://fake/latest",
+                        transport=httpx.MockTransport(handler),
+                        upstream=UpstreamControl(base_delay=0, **options))
+
+
+def test_limiter_caps_concurrency_and_backs_off():
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=8, latency_target=1.0)
+    in_flight = 0
+    peak = 0
+
+    async def call():
+        nonlocal in_flight, peak
+        async with limiter:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(20)))
+
+    asyncio.run(run())
+    assert peak == 4
+
+    started = monotonic()
+    limiter.record(started, 0.01, overloaded=True)
+    assert limiter.limit == 2
+    # A call sent before that decrease doesn't halve the limit again
+    limiter.record(started, 0.01, overloaded=True)
+    assert limiter.limit == 2
+    limiter.record(monotonic(), 5.0, overloaded=False)
+    assert limiter.limit == 1
+    limiter.record(monotonic(), 0.01, overloaded=False)
+    assert limiter.limit == 2
+
+
+def test_gets_are_retried_honouring_retry_after():
+    statuses = iter([429, 503, 200])
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(next(statuses), headers={"Retry-After": "0"}, json={})
+
+    async def run():
+        client = client_for(handler)
+        try:
+            return await client.request("itembank/items", {"items": ["item_1"]}, "get")
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()).status_code == 200
+    assert calls == 3
+
+
+def test_sets_are_retried_only_on_429():
+    def run_with(status):
+        calls = 0
+
+        def handler(request):
+            nonlocal calls
+            calls += 1
+            return httpx.Response(status if calls == 1 else 200, headers={"Retry-After": "0"}, json={})
+
+        async def run():
+            client = client_for(handler)
+            try:
+                return (await client.request("itembank/items", {"items": []}, "set")).status_code
+            finally:
+                await client.close()
+
+        return asyncio.run(run()), calls
+
+    assert run_with(429) == (200, 2)
+    assert run_with(500) == (500, 1)
+
+
+def test_long_retry_after_is_not_waited_for():
+    def handler(request):
+        return httpx.Response(429, headers={"Retry-After": "120"}, json={})
+
+    async def run():
+        client = client_for(handler)
+        try:
+            return await client.request("itembank/items", {}, "get")
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()).status_code == 429
+
+
+def test_retry_after_parses_seconds_and_dates():
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "3"})) == 3
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "soon"})) is None
+    assert retry_after(httpx.Response(429)) is None
+
+
+def test_circuit_opens_fails_fast_and_closes_after_probe():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+    breaker.failure()
+    breaker.check()
+    breaker.failure()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.check()
+
+    # Once the reset timeout passes, exactly one probe is let through
+    breaker._retry_at = monotonic()
+    breaker.check()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.check()
+    breaker.success()
+    breaker.check()
+    assert not breaker.is_open
+
+
+def test_open_circuit_returns_503_with_retry_after(monkeypatch):
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503, json={})
+
+    monkeypatch.setattr(main.data_api.for_tenant(), "upstream",
+                        UpstreamControl(breaker=CircuitBreaker(threshold=1, reset_timeout=30), base_delay=0))
+    main.data_api.transport = httpx.MockTransport(handler)
+    with TestClient(main.app) as client:
+        response = client.get("/api/items/get/item_down")
+        assert response.status_code == 503
+        assert 1 <= int(response.headers["Retry-After"]) <= 30
+
+        client.get("/api/items/get/item_down")
+        assert calls == 1
@@ -0,0 +1,223 @@
+"""Flow control for Data API traffic.
+
+Every Data API call goes through one ``UpstreamControl``, which combines:
+
+- ``AdaptiveLimiter``: an AIMD limit on concurrent calls. It grows by about
+  one per window of successful, fast calls and halves when upstream answers
+  429/5xx, fails, or gets slower than the latency target, so a struggling
+  item bank sees less load instead of a growing pile of blocked calls.
+- retries with full-jitter exponential backoff, honouring ``Retry-After``.
+  Gets are retried on 429, 5xx and transport errors; other actions only on
+  429, which upstream answers without doing the work.
+- ``CircuitBreaker``: after a run of consecutive failures, calls fail fast
+  with ``UpstreamUnavailable`` until a probe call succeeds.
+"""
+from collections import deque
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from time import monotonic
+from typing import AsyncContextManager, Awaitable, Callable, Deque
+import asyncio
+import datetime
+import logging
+import random
+
+import httpx
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling the Data API while the circuit is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Data API unavailable; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """Async concurrency limit adjusted by additive increase, multiplicative decrease"""
+
+    def __init__(self, initial: int = config.data_api_concurrency_initial,
+                 minimum: int = config.data_api_concurrency_min,
+                 maximum: int = config.data_api_concurrency_max,
+                 latency_target: float = config.data_api_latency_target,
+                 decrease_ratio: float = 0.5, tenant: str = config.default_tenant_id):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease_ratio = decrease_ratio
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        # Each tenant's client has its own limiter, reported under the tenant's label
+        self.tenant = tenant
+        metrics.upstream_concurrency_limit.set(self.limit, tenant)
+
+    async def __aenter__(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # We were handed a slot just as we were cancelled; pass it on
+                self._release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._release()
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def record(self, started: float, latency: float, overloaded: bool) -> None:
+        """Adjust the limit after a call that started at ``started`` (monotonic)"""
+        if overloaded or latency > self.latency_target:
+            # Only calls sent after the last decrease reflect the reduced limit
+            if started >= self._last_decrease:
+                self.limit = max(self.minimum, self.limit * self.decrease_ratio)
+                self._last_decrease = monotonic()
+                logger.info(f"Data API concurrency limit for {self.tenant} lowered to {int(self.limit)}")
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._wake()
+        metrics.upstream_concurrency_limit.set(self.limit, self.tenant)
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures; lets one probe through every ``reset_timeout``"""
+
+    def __init__(self, threshold: int = config.data_api_breaker_threshold,
+                 reset_timeout: float = config.data_api_breaker_reset,
+                 tenant: str = config.default_tenant_id):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.tenant = tenant
+        self._retry_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._retry_at is not None
+
+    def check(self) -> None:
+        """Raise ``UpstreamUnavailable`` unless a call may go ahead"""
+        if self._retry_at is None:
+            return
+        now = monotonic()
+        if now < self._retry_at:
+            raise UpstreamUnavailable(self._retry_at - now)
+        # Half open: this call is the probe; everyone else waits for the next window
+        self._retry_at = now + self.reset_timeout
+
+    def success(self) -> None:
+        if self._retry_at is not None:
+            logger.info(f"Data API circuit for {self.tenant} closed")
+            metrics.upstream_circuit_open.set(0, self.tenant)
+        self.failures = 0
+        self._retry_at = None
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold:
+            if self._retry_at is None:
+                logger.warning(f"Data API circuit for {self.tenant} opened "
+                               f"after {self.failures} consecutive failures")
+                metrics.upstream_circuit_open.set(1, self.tenant)
+            self._retry_at = monotonic() + self.reset_timeout
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """Seconds to wait according to a ``Retry-After`` header, if it has a usable one"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class UpstreamControl:
+    """Concurrency limit, retries and circuit breaker around each Data API call"""
+
+    def __init__(self, limiter: AdaptiveLimiter | None = None, breaker: CircuitBreaker | None = None,
+                 attempts: int = config.data_api_retry_attempts,
+                 base_delay: float = config.data_api_retry_base_delay,
+                 max_delay: float = config.data_api_retry_max_delay,
+                 gate: Callable[[], AsyncContextManager[None]] | None = None):
+        self.limiter = limiter or AdaptiveLimiter()
+        # Optional extra admission for each attempt, e.g. a slot shared with other clients
+        self.gate = gate or nullcontext
+        self.breaker = breaker or CircuitBreaker()
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, send: Callable[[], Awaitable[httpx.Response]],
+                   endpoint: str, action: str) -> httpx.Response:
+        idempotent = action == "get"
+        attempt = 0
+        while True:
+            try:
+                self.breaker.check()
+            except UpstreamUnavailable:
+                metrics.upstream_rejected_total.inc(endpoint, action)
+                raise
+
+            async with self.limiter, self.gate():
+                started = monotonic()
+                try:
+                    response = await send()
+                except httpx.TransportError:
+                    self.limiter.record(started, monotonic() - started, overloaded=True)
+                    self.breaker.failure()
+                    if not idempotent or attempt + 1 >= self.attempts:
+                        raise
+                    delay = self.backoff(attempt)
+                else:
+                    status = response.status_code
+                    self.limiter.record(started, monotonic() - started, overloaded=status == 429 or status >= 500)
+                    if status >= 500:
+                        self.breaker.failure()
+                    else:
+                        self.breaker.success()
+                    retryable = status == 429 or (idempotent and status >= 500)
+                    if not retryable or attempt + 1 >= self.attempts:
+                        return response
+                    delay = retry_after(response)
+                    if delay is None:
+                        delay = self.backoff(attempt)
+                    elif delay > self.max_delay:
+                        # Waiting that long would outlast the caller; let them see the response
+                        return response
+
+            attempt += 1
+            metrics.upstream_retries_total.inc(endpoint, action)
+            await asyncio.sleep(delay)
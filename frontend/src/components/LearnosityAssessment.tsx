@@ -20,13 +20,25 @@ const LearnosityAssessment: React.FC = () => {
   useEffect(() => {
     const initializeLearnosity = async () => {
       const maxRetries = 5;
-      const retryDelay = 2000; // 2 seconds
-      
+      const baseDelay = 2000; // 2 seconds, doubled after each failure
+      const maxDelay = 30000;
+      // One key for every attempt, so a retry gets the test the first attempt created
+      const idempotencyKey = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
       for (let attempt = 1; attempt <= maxRetries; attempt++) {
+        // Set when the backend says how long to back off (503 under load)
+        let retryAfterMs: number | null = null;
+
         try {
           // Fetch configuration from FastAPI backend - using new test endpoint
-          const response = await fetch('http://localhost:8000/api/tests/new');
+          const response = await fetch('http://localhost:8000/api/tests/new', {
+            headers: { 'Idempotency-Key': idempotencyKey },
+          });
           if (!response.ok) {
+            const retryAfter = Number(response.headers.get('Retry-After'));
+            if (retryAfter > 0) {
+              retryAfterMs = retryAfter * 1000;
+            }
             throw new Error(`HTTP ${response.status}: Failed to fetch Learnosity configuration`);
           }
           
@@ -48,8 +60,10 @@ const LearnosityAssessment: React.FC = () => {
             return;
           }
           
-          // Wait before retrying
-          await new Promise(resolve => setTimeout(resolve, retryDelay));
+          // Wait before retrying: as long as the server asked, otherwise back off exponentially.
+          // Random jitter keeps a whole class of students from retrying in lockstep.
+          const delay = retryAfterMs ?? Math.min(maxDelay, baseDelay * 2 ** (attempt - 1));
+          await new Promise(resolve => setTimeout(resolve, delay + Math.random() * delay * 0.5));
         }
       }
     };